@@ -0,0 +1,174 @@
+"""
+限流策略对比：每个请求增加的延迟，以及多进程并发下的准确性
+
+1. 延迟：同一个 Flask 路由分别不限流、用 flask_limiter 默认的 fixed-window（内存），
+   以及 fixed-window / sliding-log / sliding-log-lease（Redis），用 test client 串行请求
+   `--requests` 次（限额足够大，不会被拒绝），报告每个请求的 p50 / p99 以及比不限流多出的时间。
+2. 准确性：`--processes` 个“进程”（各自独立的限流器实例，就像 gunicorn 的 worker）
+   每个 `--threads` 个线程，对同一个键 `--limit` per second 限流。先打一个请求开启窗口，
+   等到窗口快结束时所有线程一起狂发，持续半个窗口 —— 正好跨过固定窗口的边界。
+   报告放行总数、任意连续 1 秒内最多放行多少（应当 <= limit），以及访问 Redis 的次数。
+
+默认用进程内的 fakeredis（`pip install fakeredis lupa`），`--redis-url` 用真实 Redis
+（会删掉用到的键）。fakeredis 执行 Lua 脚本很慢，真实 Redis 上脚本的延迟要低得多。
+
+用法：
+    python benchmarks/bench_rate_limiter.py --requests 5000 --processes 4 --threads 8
+    python benchmarks/bench_rate_limiter.py --redis-url redis://localhost:6379/15
+"""
+import argparse
+import bisect
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_limiter import Limiter
+from limits import parse
+from limits.storage import MemoryStorage, storage_from_string
+from limits.strategies import STRATEGIES
+
+import sliding_log_limiter
+
+BENCH_PREFIX = "BENCH"
+
+
+def make_storage(args, fake_redis):
+    if fake_redis is None:
+        return storage_from_string(args.redis_url, key_prefix=BENCH_PREFIX)
+    return storage_from_string("redis://localhost:6379", key_prefix=BENCH_PREFIX,
+                               connection_pool=fake_redis.connection_pool)
+
+
+def reset(storage):
+    redis_client = storage.get_connection()
+    for key in redis_client.scan_iter(match=f"{BENCH_PREFIX}:*", count=1000):
+        redis_client.delete(key)
+
+
+def make_app(strategy, storage):
+    app = Flask(__name__)
+    if strategy is None:
+        @app.route("/")
+        def index():
+            return "ok"
+        return app
+
+    limiter = Limiter(app=app, key_func=lambda: "bench", strategy=strategy, storage_uri="memory://")
+    # 换成准备好的 storage（Redis 或 fakeredis），策略实例也重建
+    limiter._storage = storage
+    limiter._limiter = STRATEGIES[strategy](storage)
+
+    @app.route("/")
+    @limiter.limit("1000000 per minute")
+    def index():
+        return "ok"
+
+    return app
+
+
+def request_times(app, n):
+    client = app.test_client()
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        assert client.get("/").status_code == 200
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99)]
+
+
+def check_latency(args, fake_redis):
+    print(f"每个请求的耗时（{args.requests} 个串行请求，微秒）：")
+    print(f"  {'strategy':<28} {'p50':>8} {'p99':>8} {'p50 added':>10}")
+    base = None
+    configs = [("none", None, None), ("fixed-window (memory)", "fixed-window", MemoryStorage())]
+    configs += [(f"{strategy} (redis)", strategy, make_storage(args, fake_redis))
+                for strategy in ("fixed-window", "sliding-log", "sliding-log-lease")]
+    for label, strategy, storage in configs:
+        p50, p99 = request_times(make_app(strategy, storage), args.requests)
+        base = p50 if base is None else base
+        print(f"  {label:<28} {p50 * 1e6:>8.0f} {p99 * 1e6:>8.0f} {(p50 - base) * 1e6:>10.0f}")
+        if storage is not None and not isinstance(storage, MemoryStorage):
+            reset(storage)
+
+
+def max_in_window(times, window):
+    times.sort()
+    return max((bisect.bisect_right(times, t + window) - i for i, t in enumerate(times)), default=0)
+
+
+def flood(limiter, item, admitted, attempts, until):
+    local, n = [], 0
+    while time.monotonic() < until:
+        n += 1
+        if limiter.hit(item, "flood"):
+            local.append(time.monotonic())
+    admitted.extend(local)
+    attempts.append(n)
+
+
+def check_accuracy(args, fake_redis):
+    item = parse(f"{args.limit} per second")
+    print(f"\n准确性：{args.processes} 个进程 x {args.threads} 个线程，限额 {args.limit} per second，"
+          f"在窗口边界附近狂发 0.5 秒：")
+    print(f"  {'strategy':<28} {'admitted':>9} {'max in 1s':>10} {'redis calls':>12}")
+    configs = [("fixed-window (memory)", "fixed-window", None),
+               ("fixed-window (redis)", "fixed-window", make_storage(args, fake_redis)),
+               ("sliding-log (redis)", "sliding-log", make_storage(args, fake_redis)),
+               ("sliding-log-lease (redis)", "sliding-log-lease", make_storage(args, fake_redis))]
+    results = {}
+    for label, strategy, storage in configs:
+        # 每个“进程”一个独立的限流器；memory:// 时每个进程还各有一份计数
+        limiters = [STRATEGIES[strategy](storage or MemoryStorage()) for _ in range(args.processes)]
+        admitted, attempts = [], [1]
+        if limiters[0].hit(item, "flood"): # 开启固定窗口
+            admitted.append(time.monotonic())
+        time.sleep(0.9)
+        until = time.monotonic() + 0.5
+        threads = [threading.Thread(target=flood, args=(lim, item, admitted, attempts, until))
+                   for lim in limiters for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        busiest = max_in_window(admitted, 1.0)
+        if storage is None:
+            remote = "-"
+        elif strategy == "sliding-log-lease":
+            remote = sum(lim.remote_calls for lim in limiters)
+        else:
+            remote = sum(attempts) # 每个请求一次脚本调用
+        print(f"  {label:<28} {len(admitted):>9} {busiest:>10} {remote:>12}")
+        results[label] = busiest
+        if storage is not None:
+            reset(storage)
+    lease_slack = args.processes * sliding_log_limiter.LeasedSlidingLogRateLimiter.lease_size(item)
+    assert results["sliding-log (redis)"] <= args.limit, "sliding-log let more than the limit through"
+    assert results["sliding-log-lease (redis)"] <= args.limit + lease_slack, "leases let too much through"
+    print(f"  （sliding-log-lease 最多可能多放行 {lease_slack} 个：每个进程手里没用完的一批租约）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter latency / accuracy benchmark.")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=200, help="requests per second in the accuracy check")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    fake_redis = None
+    if not args.redis_url:
+        import fakeredis
+        fake_redis = fakeredis.FakeRedis(max_connections=1024)
+    check_latency(args, fake_redis)
+    check_accuracy(args, fake_redis)
+
+
+if __name__ == "__main__":
+    main()
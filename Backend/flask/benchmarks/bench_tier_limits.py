@@ -0,0 +1,112 @@
+"""
+/api/premium 按用户等级限流：自检每个等级的限额都生效，以及等级查询对用户库的压力
+
+1. 自检（assert）：premium 用户每分钟 30 次、free 用户、未知等级和查无此人的用户 3 次、
+   未登录按 IP 3 次；查无此人的 id 和未登录共用 IP 的限额，换请求头绕不过去；
+   用户升级后 invalidate() 立即生效；查无此人的用户被负缓存，重复请求不再查用户库。
+2. 压测：`--users` 个热点用户各发 `--requests` 个请求，用户库每次查询耗时 `--lookup-ms`，
+   对比不缓存（ttl=0）和 TierCache 的吞吐量与用户库查询次数。
+
+默认用 memory:// 存储限流计数，`--redis-url` 用 Redis（会清掉用到的限流键）。
+
+用法：
+    python benchmarks/bench_tier_limits.py --users 20 --requests 200 --lookup-ms 2
+    python benchmarks/bench_tier_limits.py --redis-url redis://localhost:6379/15
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def get(client, user_id=None):
+    return client.get('/api/premium', headers={"X-User-Id": user_id} if user_id else {})
+
+
+def allowed(client, user_id, n):
+    return sum(get(client, user_id).status_code == 200 for _ in range(n))
+
+
+def check_tiers(backend):
+    from user_tiers import TIER_LIMITS, tier_limit
+
+    client = backend.app.test_client()
+    backend.limiter.reset()
+    assert allowed(client, "alice", 40) == 30, "premium limit not enforced"
+    assert allowed(client, "bob", 10) == 3, "free limit not enforced"
+    assert allowed(client, None, 10) == 3, "anonymous limit not enforced"
+
+    backend.limiter.reset()
+    lookups = backend.user_tiers.lookups
+    assert allowed(client, "mallory", 10) == 3, "unknown users should get the free limit"
+    assert backend.user_tiers.lookups == lookups + 1, "unknown user looked up more than once"
+    # 用户库里没有的 id 按 IP 限流：换请求头拿不到新的限额
+    assert sum(get(client, f"rotating-{i}").status_code == 200 for i in range(10)) == 0, \
+        "rotating X-User-Id values got fresh buckets"
+
+    backend.limiter.reset()
+    backend.USER_STORE["carol"] = "gold"  # 用户库里有、TIER_LIMITS 里没配的等级
+    assert tier_limit("gold") == TIER_LIMITS["free"]
+    assert allowed(client, "carol", 10) == 3, "unknown tier should get the free limit"
+    del backend.USER_STORE["carol"]
+
+    backend.USER_STORE["bob"] = "premium"  # 升级
+    backend.user_tiers.invalidate("bob")
+    assert get(client, "bob").get_json()["tier"] == "premium"
+    backend.limiter.reset()
+    assert allowed(client, "bob", 40) == 30, "upgrade not applied"
+    backend.USER_STORE["bob"] = "free"
+    backend.user_tiers.invalidate("bob")
+    print("自检通过：premium 30 / free 3 / 未知用户 3 / 未知等级 3 / 未登录 3 per minute，"
+          "换 X-User-Id 不能绕过限流，升级立即生效")
+
+
+def run_load(backend, tiers, args, label):
+    backend.user_tiers = tiers
+    backend.limiter.reset()
+    client = backend.app.test_client()
+    users = [f"hot-{i}" for i in range(args.users)]
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        for user_id in users:
+            get(client, user_id)
+    elapsed = time.perf_counter() - start
+    n = args.requests * len(users)
+    print(f"  {label:<10} {n:>8} {n / elapsed:>10.0f} {tiers.lookups:>10} {tiers.lookups / n:>12.3f}")
+    return tiers.lookups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiered rate limit self-check and benchmark.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per user")
+    parser.add_argument("--lookup-ms", type=float, default=2.0, help="user store latency")
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    os.environ["RATELIMIT_STORAGE_URI"] = args.redis_url or "memory://"
+    import flask_limiter_test as backend
+    from user_tiers import TierCache
+
+    check_tiers(backend)
+
+    for i in range(args.users):
+        backend.USER_STORE[f"hot-{i}"] = "premium" if i % 2 else "free"
+
+    def slow_lookup(user_id):
+        time.sleep(args.lookup_ms / 1000)
+        return backend.lookup_user_tier(user_id)
+
+    print(f"\n{args.users} 个热点用户各 {args.requests} 个请求，用户库查询 {args.lookup_ms} ms：")
+    print(f"  {'tier cache':<10} {'requests':>8} {'req/s':>10} {'lookups':>10} {'per request':>12}")
+    run_load(backend, TierCache(slow_lookup, ttl=0, negative_ttl=0), args, "none")
+    lookups = run_load(backend, TierCache(slow_lookup), args, "TierCache")
+    assert lookups == args.users, f"{lookups} user store lookups for {args.users} hot users"
+    print(f"  缓存有效期内每个热点用户只查一次用户库")
+    backend.limiter.reset()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
-from flask import Flask, jsonify
+import os
+
+from flask import Flask, g, jsonify, request
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
+import sliding_log_limiter  # 注册 "sliding-log" / "sliding-log-lease" 限流策略
+from user_tiers import DEFAULT_TIER, TierCache, tier_limit
+
 app = Flask(__name__)
 
 # 初始化限流器，使用客户端 IP 作为标识
+# 计数放在 Redis 里，gunicorn 的多个 worker 进程共享同一份限额；
+# 滑动窗口日志没有固定窗口交界处的 2 倍突发（见 sliding_log_limiter.py）。
+# 这里的限额都是每分钟几次到几十次，用不上本地租约（每窗口 40 次以上才有），所以默认 "sliding-log"
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,  # 默认使用客户端 IP
-    default_limits=["100 per hour", "10 per minute"]  # 全局默认限制
+    default_limits=["100 per hour", "10 per minute"],  # 全局默认限制
+    storage_uri=os.getenv("RATELIMIT_STORAGE_URI", "redis://localhost:6379"),
+    strategy=os.getenv("RATELIMIT_STRATEGY", "sliding-log"),
+    in_memory_fallback_enabled=True,  # Redis 不可用时退回进程内限流
 )
 
 # 路由1：普通限流（使用全局默认限制）
@@ -17,20 +28,40 @@ limiter = Limiter(
 def public_api():
     return jsonify({"message": "Public API"})
 
-# 路由2：根据条件动态限流
+# 路由2：根据用户等级动态限流
+# 在视图里调用 limiter.limit(...) 不会生效，限额要由回调在检查限流时给出
+USER_STORE = {"alice": "premium", "bob": "free"}  # 模拟用户库
+
+def lookup_user_tier(user_id):
+    """模拟查询用户库，查无此人返回 None"""
+    # 实际应用中这里会查数据库 / 用户服务
+    return USER_STORE.get(user_id)
+
+# 等级查询带 TTL 缓存（查不到的用户也缓存），热点用户不会每个请求都查一次用户库
+user_tiers = TierCache(lookup_user_tier)
+
+def current_user():
+    """已登录用户的 id（用户库里查得到），否则 None；限流键和等级都按它来，一个请求里只查一次"""
+    if 'user' not in g:
+        # 示例中用请求头表示登录身份，实际应用中从会话 / token 里取；
+        # 用户库里没有的 id 不算登录，随便换请求头拿不到新的限额
+        user_id = request.headers.get('X-User-Id')
+        tier = user_tiers.find(user_id)
+        g.user, g.tier = (user_id, tier) if tier is not None else (None, DEFAULT_TIER)
+    return g.user
+
+def user_key():
+    user = current_user()
+    return f"user:{user}" if user else get_remote_address()
+
+def current_tier():
+    current_user()
+    return g.tier
+
 @app.route('/api/premium')
+@limiter.limit(lambda: tier_limit(current_tier()), key_func=user_key)  # 高级用户 30 次 / 分钟，其他 3 次 / 分钟
 def premium_api():
-    # 动态设置不同用户组的限制
-    if is_premium_user():
-        limiter.limit("30 per minute")  # 高级用户限制
-    else:
-        limiter.limit("3 per minute")   # 普通用户限制
-    return jsonify({"message": "Premium API"})
-
-def is_premium_user():
-    """模拟检查用户权限的逻辑"""
-    # 实际应用中这里会有用户验证逻辑
-    return True  # 示例中直接返回 True
+    return jsonify({"message": "Premium API", "tier": current_tier()})
 
 # 路由3：豁免限流的白名单
 @app.route('/api/internal')
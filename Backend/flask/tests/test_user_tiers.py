@@ -0,0 +1,84 @@
+"""
+按用户等级限流（user_tiers.py 和 flask_limiter_test.py 里的 /api/premium）的测试
+
+运行：
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["RATELIMIT_STORAGE_URI"] = "memory://"
+
+import flask_limiter_test as backend
+from user_tiers import DEFAULT_TIER, TIER_LIMITS, TierCache, tier_limit
+
+
+@pytest.fixture
+def client():
+    backend.limiter.reset()
+    backend.user_tiers = TierCache(backend.lookup_user_tier)
+    yield backend.app.test_client()
+    backend.limiter.reset()
+
+
+def allowed(client, n, user_id=None):
+    headers = {"X-User-Id": user_id} if user_id else {}
+    return sum(client.get("/api/premium", headers=headers).status_code == 200 for _ in range(n))
+
+
+def test_tier_limit_falls_back_to_default_tier():
+    assert tier_limit("premium") == TIER_LIMITS["premium"]
+    assert tier_limit("gold") == TIER_LIMITS[DEFAULT_TIER]
+    assert tier_limit(None) == TIER_LIMITS[DEFAULT_TIER]
+
+
+def test_limits_per_tier(client):
+    assert allowed(client, 40, "alice") == 30
+    assert allowed(client, 10, "bob") == 3
+    assert allowed(client, 10) == 3
+
+
+def test_unknown_tier_gets_default_limit(client, monkeypatch):
+    monkeypatch.setitem(backend.USER_STORE, "carol", "gold")
+    response = client.get("/api/premium", headers={"X-User-Id": "carol"})
+    assert response.status_code == 200
+    assert response.get_json()["tier"] == "gold"
+    assert allowed(client, 10, "carol") == 2
+
+
+def test_unknown_user_ids_share_the_ip_bucket(client):
+    assert allowed(client, 2) == 2
+    # 查无此人的 id 不算登录：换请求头也只剩这个 IP 的 1 次
+    assert sum(allowed(client, 1, f"rotating-{i}") for i in range(10)) == 1
+    # 登录用户有自己的限额
+    assert allowed(client, 5, "bob") == 3
+
+
+def test_tier_cache_negative_caching_and_invalidate():
+    store = {"alice": "premium"}
+    lookups = []
+    tiers = TierCache(lambda user_id: lookups.append(user_id) or store.get(user_id))
+    assert [tiers.get("mallory") for _ in range(3)] == [DEFAULT_TIER] * 3
+    assert tiers.find("mallory") is None
+    assert lookups == ["mallory"]
+    assert tiers.get("alice") == "premium"
+    store["alice"] = "free"
+    assert tiers.get("alice") == "premium"
+    tiers.invalidate("alice")
+    assert tiers.get("alice") == "free"
+    assert tiers.get(None) == DEFAULT_TIER and tiers.find(None) is None
+
+
+def test_tier_cache_evicts_oldest_entries_at_maxsize():
+    lookups = []
+    tiers = TierCache(lambda user_id: lookups.append(user_id) or None, maxsize=3)
+    for user_id in ["u1", "u2", "u3", "u4", "u5"]:
+        tiers.get(user_id)
+    assert list(tiers._entries) == ["u3", "u4", "u5"]
+    tiers.get("u5")
+    tiers.get("u1")  # 已被淘汰，重新查询
+    assert lookups == ["u1", "u2", "u3", "u4", "u5", "u1"]
+    assert list(tiers._entries) == ["u4", "u5", "u1"]
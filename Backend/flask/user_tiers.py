@@ -0,0 +1,79 @@
+"""
+用户等级（tier）查询和按等级限流
+
+- TierCache：在用户库查询外面包一层进程内的 TTL 缓存。查到的等级缓存 ttl 秒，查不到的
+  用户（未登录、已删除）也缓存 negative_ttl 秒（负缓存），热点用户在缓存有效期内只查一次
+  用户库；同一时间只有一个线程去查，不会一起击穿。最多缓存 maxsize 个用户，超出时淘汰
+  最早写入的，随机的 X-User-Id 再多也撑不大。
+- TIER_LIMITS：每个等级的限流字符串，导入时解析一遍校验格式。flask_limiter 每个请求仍会
+  parse_many 一次回调返回的字符串（没有公开接口传入解析好的 RateLimitItem），只是几微秒。
+- tier_limit(tier)：等级对应的限流字符串，未知等级（用户库里有、这里没配的）按 DEFAULT_TIER。
+
+用法：
+    tiers = TierCache(lookup_user_tier)
+    @limiter.limit(lambda: tier_limit(tiers.get(user_id)), key_func=...)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from limits import parse_many
+
+# 等级 -> 限流字符串；查不到等级的用户、未知等级都按 DEFAULT_TIER 处理
+TIER_LIMITS = {
+    "premium": "30 per minute",  # 高级用户限制
+    "free": "3 per minute",      # 普通用户限制
+}
+DEFAULT_TIER = "free"
+
+# 启动时解析一遍：写错的限流字符串在这里就报错，而不是第一个请求进来时才报
+for _limit in TIER_LIMITS.values():
+    parse_many(_limit)
+del _limit
+
+
+def tier_limit(tier):
+    """等级的限流字符串（回调每次返回同一个预先写好的字符串）。"""
+    return TIER_LIMITS.get(tier, TIER_LIMITS[DEFAULT_TIER])
+
+
+class TierCache:
+    """`lookup(user_id)` 返回等级或 None（查无此人）；结果按 ttl / negative_ttl 缓存。"""
+
+    def __init__(self, lookup, ttl=60.0, negative_ttl=10.0, maxsize=10000):
+        self.lookup = lookup
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.lookups = 0  # 实际查询用户库的次数
+        self._entries = OrderedDict()  # user_id -> (tier 或 None, 过期时间)，按写入先后排列
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """用户的等级，查不到时为 DEFAULT_TIER。"""
+        tier = self.find(user_id)
+        return tier if tier is not None else DEFAULT_TIER
+
+    def find(self, user_id):
+        """用户的等级，查无此人（或 user_id 为 None）时为 None。"""
+        if user_id is None:
+            return None
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            with self._lock:
+                entry = self._entries.get(user_id)
+                now = time.monotonic()
+                if entry is None or entry[1] <= now:  # 等锁时别的线程可能已经查过了
+                    self.lookups += 1
+                    tier = self.lookup(user_id)
+                    entry = (tier, now + (self.ttl if tier is not None else self.negative_ttl))
+                    self._entries[user_id] = entry
+                    self._entries.move_to_end(user_id)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)  # 淘汰最早写入的
+        return entry[0]
+
+    def invalidate(self, user_id):
+        """用户升级 / 降级后调用，下一个请求重新查询。"""
+        self._entries.pop(user_id, None)
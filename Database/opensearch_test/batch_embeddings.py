@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+Batched, concurrent embedding generation for OpenAI-compatible APIs (Qwen / DashScope, OpenAI, ...).
+
+Instead of one `embeddings.create` call per text, texts are packed into requests of up to
+`max_batch_items` items / `max_batch_tokens` estimated tokens, and several requests run at
+once with `AsyncOpenAI` under a semaphore. Rate-limit (429) and transient server errors are
+retried with exponential backoff (honouring `Retry-After`). Results come back in input order.
+
+Usage:
+    from batch_embeddings import embed_texts
+    vectors = embed_texts(["text a", "text b"], model="text-embedding-v4")
+"""
+
+import asyncio
+import os
+import random
+
+import openai
+from openai import AsyncOpenAI
+
+# DashScope's text-embedding-v4 accepts at most 10 inputs per request.
+DEFAULT_MAX_BATCH_ITEMS = 10
+DEFAULT_MAX_BATCH_TOKENS = 8000
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError,
+                    openai.InternalServerError)
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token, CJK counted per character)."""
+    cjk = sum(1 for ch in text if '一' <= ch <= '鿿')
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def make_batches(texts, max_batch_items=DEFAULT_MAX_BATCH_ITEMS, max_batch_tokens=DEFAULT_MAX_BATCH_TOKENS):
+    """Packs texts greedily into batches; returns a list of (start_index, [texts])."""
+    batches = []
+    start, current, tokens = 0, [], 0
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        if current and (len(current) >= max_batch_items or tokens + cost > max_batch_tokens):
+            batches.append((start, current))
+            start, current, tokens = i, [], 0
+        current.append(text)
+        tokens += cost
+    if current:
+        batches.append((start, current))
+    return batches
+
+
+def _retry_delay(error, attempt, base_delay, max_delay):
+    """Exponential backoff with jitter; a server-sent Retry-After wins if present."""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), max_delay)
+        except ValueError:
+            pass
+    return min(base_delay * 2 ** attempt, max_delay) * (0.5 + random.random() / 2)
+
+
+async def aembed_texts(texts, model, client=None,
+                       max_batch_items=DEFAULT_MAX_BATCH_ITEMS,
+                       max_batch_tokens=DEFAULT_MAX_BATCH_TOKENS,
+                       concurrency=DEFAULT_CONCURRENCY,
+                       max_retries=DEFAULT_MAX_RETRIES,
+                       base_delay=0.5, max_delay=20.0):
+    """Embeds `texts` with batched, concurrent requests; returns vectors in input order."""
+    owns_client = client is None
+    if owns_client:
+        # Retries are handled below, per batch.
+        client = AsyncOpenAI(base_url=os.getenv("QWEN_BASE_URL"), api_key=os.getenv("QWEN_API_KEY"), max_retries=0)
+    # OpenAI recommends replacing newlines with spaces for better performance
+    texts = [text.replace("\n", " ") for text in texts]
+    results = [None] * len(texts)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_batch(start, batch):
+        for attempt in range(max_retries + 1):
+            async with semaphore:
+                try:
+                    response = await client.embeddings.create(input=batch, model=model, encoding_format="float")
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if attempt == max_retries:
+                        raise
+                    delay = _retry_delay(e, attempt, base_delay, max_delay)
+            # Back off outside the semaphore so other batches can use the slot.
+            await asyncio.sleep(delay)
+        for item in response.data:
+            results[start + item.index] = item.embedding
+
+    try:
+        await asyncio.gather(*(
+            run_batch(start, batch)
+            for start, batch in make_batches(texts, max_batch_items, max_batch_tokens)
+        ))
+    finally:
+        if owns_client:
+            await client.close()
+    return results
+
+
+def embed_texts(texts, model, **kwargs):
+    """Synchronous wrapper around `aembed_texts` for scripts without an event loop."""
+    return asyncio.run(aembed_texts(texts, model, **kwargs))
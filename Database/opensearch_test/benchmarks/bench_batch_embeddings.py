@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""
+Embedding throughput: one request per text vs. batched, concurrent requests.
+
+Runs against the local fake embeddings server (no API key needed) and reports docs/sec,
+number of HTTP requests and 429s for each batch size / concurrency combination. Every run
+also checks that the vectors come back in input order.
+
+Usage:
+    python benchmarks/bench_batch_embeddings.py --docs 500 --batch-sizes 1 10 25 --concurrency 1 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from openai import AsyncOpenAI, OpenAI
+
+from batch_embeddings import embed_texts
+from fake_embeddings_server import FakeEmbeddingsServer, fake_vector
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput vs. batch size and concurrency.")
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 25])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--max-in-flight", type=int, default=6, help="server-side limit before answering 429")
+    args = parser.parse_args()
+
+    texts = [f"document {i}: the quick brown fox jumps over the lazy dog" for i in range(args.docs)]
+
+    with FakeEmbeddingsServer(dimension=args.dimension, max_in_flight=args.max_in_flight) as server:
+        expected = [fake_vector(text, args.dimension) for text in texts]
+
+        # Baseline: the original one-text-per-call loop.
+        client = OpenAI(base_url=server.base_url, api_key="fake")
+        start = time.perf_counter()
+        for text in texts:
+            client.embeddings.create(input=[text], model="fake", encoding_format="float")
+        baseline = time.perf_counter() - start
+        print(f"{'mode':<22} {'docs/s':>8} {'requests':>9} {'429s':>6}")
+        print(f"{'serial, 1 per call':<22} {args.docs / baseline:>8.1f} {server.stats['requests']:>9} "
+              f"{server.stats['rate_limited']:>6}")
+
+        for batch_size in args.batch_sizes:
+            for concurrency in args.concurrency:
+                server.reset_stats()
+                async_client = AsyncOpenAI(base_url=server.base_url, api_key="fake", max_retries=0)
+                start = time.perf_counter()
+                vectors = embed_texts(texts, model="fake", client=async_client, max_batch_items=batch_size,
+                                      concurrency=concurrency, max_retries=50, base_delay=0.05)
+                elapsed = time.perf_counter() - start
+                assert len(vectors) == len(expected) and all(abs(a - b) < 1e-6 for want, got in zip(expected, vectors) for a, b in zip(want, got)), \
+                    "vectors out of order"
+                label = f"batch {batch_size}, conc {concurrency}"
+                print(f"{label:<22} {args.docs / elapsed:>8.1f} {server.stats['requests']:>9} "
+                      f"{server.stats['rate_limited']:>6}")
+
+
+if __name__ == "__main__":
+    main()
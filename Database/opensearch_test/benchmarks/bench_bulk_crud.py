@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""
+Throughput of single-document CRUD calls vs. the batch helpers in `opensearch_crud`.
+
+Against `FakeOpenSearchServer` by default (a few ms per round trip, like a cluster on the
+LAN), or a real cluster with `--live`. Each phase creates, reads, updates and deletes the
+same N documents once with the single-document functions and once with
+`create_documents` / `read_documents` / `update_documents` / `delete_documents`, and checks
+that both leave the index in the same state. `--reject-rate` makes the fake server answer a
+share of bulk items with 429 to exercise the per-item retries.
+
+Usage:
+    python benchmarks/bench_bulk_crud.py --docs 2000
+    python benchmarks/bench_bulk_crud.py --live --docs 20000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import opensearch_crud
+from fake_opensearch_server import FakeOpenSearchServer
+from opensearch_client import get_client
+
+
+def documents(n):
+    return ((str(i), {"title": f"Book {i}", "author": f"Author {i % 97}", "year": 1900 + i % 120})
+            for i in range(n))
+
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    # The single-document functions print every call.
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<10} {elapsed:>8.2f} s {n / elapsed:>10.0f} docs/s")
+    return result
+
+
+def run_single(index, n):
+    crud = opensearch_crud
+    print("single-document calls:")
+    timed("create", n, lambda: [crud.create_document(index, doc_id, doc) for doc_id, doc in documents(n)])
+    sources = timed("read", n, lambda: [crud.read_document(index, str(i)) for i in range(n)])
+    timed("update", n, lambda: [crud.update_document(index, str(i), {"year": 2000}) for i in range(n)])
+    timed("delete", n, lambda: [crud.delete_document(index, str(i)) for i in range(n)])
+    return sources
+
+
+def run_bulk(index, n, workers):
+    crud = opensearch_crud
+    print(f"batch helpers ({workers} workers):")
+    created = timed("create", n, lambda: crud.create_documents(index, documents(n), workers=workers))
+    reads = timed("read", n, lambda: crud.read_documents(index, (str(i) for i in range(n)), workers=workers))
+    updated = timed("update", n, lambda: crud.update_documents(
+        index, ((str(i), {"year": 2000}) for i in range(n)), workers=workers))
+    deleted = timed("delete", n, lambda: crud.delete_documents(index, (str(i) for i in range(n)), workers=workers))
+    for label, results in (("create", created), ("update", updated), ("delete", deleted)):
+        failed = [r for r in results if not r.ok]
+        assert len(results) == n and not failed, f"{label}: {len(failed)} failed, e.g. {failed[:3]}"
+    assert [r.id for r in reads] == [str(i) for i in range(n)], "reads out of order"
+    return [r.source for r in reads]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single vs. bulk OpenSearch CRUD benchmark.")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--reject-rate", type=float, default=0.0)
+    parser.add_argument("--live", action="store_true", help="use the cluster from OPENSEARCH_HOST/PORT")
+    parser.add_argument("--index", default="bench-bulk-crud")
+    args = parser.parse_args()
+
+    server = None
+    if not args.live:
+        server = FakeOpenSearchServer(base_latency=args.latency_ms / 1000, reject_rate=args.reject_rate).start()
+        opensearch_crud.client = get_client(hosts=[server.host], http_compress=False)
+
+    print(f"{args.docs} documents, {'live cluster' if args.live else f'fake server, {args.latency_ms} ms/request'}")
+    single = run_single(args.index, args.docs)
+    if server:
+        server.reset_stats()
+    bulk = run_bulk(args.index, args.docs, args.workers)
+    assert single == bulk, "single and bulk reads differ"
+    if server:
+        print(f"  bulk phase: {server.stats['requests']} requests, {server.stats['rejected']} items rejected and retried")
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
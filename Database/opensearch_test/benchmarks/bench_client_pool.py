@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""
+Connection churn and payload size: default `OpenSearch(...)` vs. the shared pooled client.
+
+A local keep-alive HTTP server (in its own process) stands in for OpenSearch and counts the
+TCP connections it accepts and the request bytes it receives. N threads then run searches
+and `_bulk` requests through each client. The default client keeps a single idle connection
+per node, so concurrent threads keep opening connections that urllib3 then discards
+("Connection pool is full"); those discards are counted too. On localhost gzip costs more
+CPU than it saves in transfer time; over a real network the smaller bulk bodies win, and
+OPENSEARCH_HTTP_COMPRESS=false turns it off.
+
+Usage:
+    python benchmarks/bench_client_pool.py --threads 32 --requests 50
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from opensearchpy import OpenSearch
+
+from opensearch_client import get_client
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, latency, connections, bytes_received):
+        self.latency = latency
+        self.connections = connections # multiprocessing.Value, shared with the benchmark
+        self.bytes_received = bytes_received
+        super().__init__(("127.0.0.1", 0), Handler)
+
+    def get_request(self):
+        with self.connections.get_lock():
+            self.connections.value += 1
+        return super().get_request()
+
+
+def serve(latency, connections, bytes_received, port):
+    server = CountingServer(latency, connections, bytes_received)
+    port.value = server.server_address[1]
+    server.serve_forever()
+
+
+class DiscardCounter(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def emit(self, record):
+        if "discarding connection" in record.getMessage():
+            self.count += 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        with self.server.bytes_received.get_lock():
+            self.server.bytes_received.value += length
+        time.sleep(self.server.latency)
+        if "_bulk" in self.path:
+            payload = {"took": 1, "errors": False, "items": []}
+        else:
+            payload = {"took": 1, "hits": {"total": {"value": 0, "relation": "eq"}, "hits": []}}
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = _handle
+
+
+def run(label, client, counters, discards, threads, requests):
+    bulk_body = "".join(
+        json.dumps({"index": {"_index": "bench", "_id": i}}) + "\n"
+        + json.dumps({"text": "the quick brown fox jumps over the lazy dog " * 10, "n": i}) + "\n"
+        for i in range(200)
+    )
+
+    def worker(_):
+        for i in range(requests):
+            if i % 5 == 0:
+                client.bulk(body=bulk_body)
+            else:
+                client.search(index="bench", body={"query": {"match": {"text": "fox"}}})
+
+    connections, bytes_received = counters
+    connections.value = bytes_received.value = 0
+    discards.count = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    total = threads * requests
+    print(f"  {label:<26} {total / elapsed:>8.0f} req/s {connections.value:>7} connections "
+          f"{discards.count:>7} discarded {bytes_received.value / 2 ** 20:>8.1f} MiB sent")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenSearch client pool / compression benchmark.")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    # urllib3 logs a warning for every connection discarded from a full pool.
+    discards = DiscardCounter()
+    urllib3_log = logging.getLogger("urllib3.connectionpool")
+    urllib3_log.addHandler(discards)
+    urllib3_log.propagate = False
+
+    counters = (multiprocessing.Value("l", 0), multiprocessing.Value("l", 0))
+    port = multiprocessing.Value("i", 0)
+    server = multiprocessing.Process(target=serve, args=(args.latency_ms / 1000, *counters, port), daemon=True)
+    server.start()
+    while not port.value:
+        time.sleep(0.01)
+    host = {"host": "127.0.0.1", "port": port.value}
+
+    print(f"{args.threads} threads x {args.requests} requests (every 5th a 200-doc _bulk)")
+    start = time.perf_counter()
+    default = OpenSearch(hosts=[host])
+    print(f"  default client construction: {(time.perf_counter() - start) * 1000:.1f} ms")
+    run("default OpenSearch(...)", default, counters, discards, args.threads, args.requests)
+    shared = get_client(hosts=[host], pool_maxsize=args.threads)
+    run("shared pooled client", shared, counters, discards, args.threads, args.requests)
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+Hot-key read latency with and without the `document_cache` in front of `opensearch_crud`.
+
+A Zipf-distributed mix of `read_document()` calls and a small share of `update_document()`
+calls runs against `FakeOpenSearchServer` (2 ms per round trip by default) with the cache
+off, with a large local cache, with a local cache too small for the working set (byte bound
+and evictions at work), and with a Redis second tier when `--redis-url` is given. Every read
+is compared with the last value written, so a stale read fails the run. A final check plays
+the race the version floors exist for: a read that started before an update finishes after
+it and must not put the old document back.
+
+Usage:
+    python benchmarks/bench_document_cache.py --docs 10000 --ops 20000
+    python benchmarks/bench_document_cache.py --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import opensearch_crud
+from document_cache import DocumentCache
+from fake_opensearch_server import FakeOpenSearchServer
+from opensearch_client import get_client
+
+INDEX = "bench-document-cache"
+
+
+def zipf_keys(n_docs, n_ops, s, seed):
+    weights = [1.0 / (rank ** s) for rank in range(1, n_docs + 1)]
+    rng = random.Random(seed)
+    ids = list(range(n_docs))
+    rng.shuffle(ids) # Hot keys spread over the id space
+    return [f"doc-{ids[rank]}" for rank in rng.choices(range(n_docs), weights=weights, k=n_ops)]
+
+
+def run(label, cache, keys, write_share, seed):
+    opensearch_crud.document_cache = cache
+    rng = random.Random(seed)
+    expected = {}
+    reads, latencies = 0, []
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for n, doc_id in enumerate(keys):
+            if rng.random() < write_share:
+                expected[doc_id] = n
+                opensearch_crud.update_document(INDEX, doc_id, {"version": n})
+                continue
+            t0 = time.perf_counter()
+            source = opensearch_crud.read_document(INDEX, doc_id)
+            latencies.append(time.perf_counter() - t0)
+            reads += 1
+            assert source["version"] == expected.get(doc_id, -1), f"{label}: stale read of {doc_id}"
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50, p99 = (latencies[int(len(latencies) * q)] * 1000 for q in (0.5, 0.99))
+    hit_rate = f"{cache.hit_rate():>6.1%}" if cache else "     -"
+    print(f"  {label:<26} {len(keys) / elapsed:>8.0f} ops/s  read p50 {p50:>6.3f} ms  p99 {p99:>6.3f} ms"
+          f"  hit rate {hit_rate}")
+    if cache:
+        print(f"  {'':<26} {cache.stats}, {cache.size_bytes / 2 ** 20:.1f} MiB cached")
+    # Reset the documents for the next configuration.
+    opensearch_crud.document_cache = None
+    opensearch_crud.update_documents(INDEX, ((doc_id, {"version": -1}) for doc_id in expected))
+
+
+def check_in_flight_read(cache):
+    """An old read must not be cached after a newer write, in either tier."""
+    cache.put(INDEX, "race", {"version": 1}, seq_no=10, primary_term=1)
+    old = cache.get(INDEX, "race")
+    cache.record_write(INDEX, "race", seq_no=11, primary_term=1) # update lands
+    assert cache.get(INDEX, "race") is None
+    assert not cache.put(INDEX, "race", old.source, old.seq_no, old.primary_term) # late read
+    assert cache.get(INDEX, "race") is None
+    assert cache.put(INDEX, "race", {"version": 2}, seq_no=11, primary_term=1)
+    assert cache.get(INDEX, "race").source == {"version": 2}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Document cache benchmark.")
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--write-share", type=float, default=0.02)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--redis-url", help="also run with a Redis second tier (the prefix is flushed)")
+    args = parser.parse_args()
+
+    server = FakeOpenSearchServer(base_latency=args.latency_ms / 1000).start()
+    opensearch_crud.client = get_client(hosts=[server.host], http_compress=False)
+    body = "lorem ipsum dolor sit amet " * 20
+    results = opensearch_crud.create_documents(
+        INDEX, ((f"doc-{i}", {"title": f"Doc {i}", "body": body, "version": -1}) for i in range(args.docs)))
+    assert all(r.ok for r in results)
+
+    keys = zipf_keys(args.docs, args.ops, args.zipf, seed=1)
+    print(f"{args.ops} operations over {args.docs} documents (zipf s={args.zipf}, "
+          f"{args.write_share:.0%} updates), {args.latency_ms} ms per round trip")
+    run("no cache", None, keys, args.write_share, seed=2)
+    run("local, 64 MiB", DocumentCache(), keys, args.write_share, seed=2)
+    run("local, 1 MiB", DocumentCache(max_bytes=2 ** 20), keys, args.write_share, seed=2)
+    if args.redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis_url)
+        prefix = "bench-doccache:"
+        for key in redis_client.scan_iter(match=f"{prefix}*"):
+            redis_client.delete(key)
+        # A tiny local tier, so most hits are served by Redis.
+        run("local 64 KiB + Redis", DocumentCache(max_bytes=64 * 1024, redis_client=redis_client,
+                                                  redis_prefix=prefix), keys, args.write_share, seed=2)
+        check_in_flight_read(DocumentCache(redis_client=redis_client, redis_prefix=prefix))
+    check_in_flight_read(DocumentCache())
+    print("in-flight read check ok")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
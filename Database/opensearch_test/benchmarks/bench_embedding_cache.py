@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+Embedding cache: cold run vs. re-run (disk hits) vs. repeated queries (memory hits).
+
+A fake encoder that sleeps per text stands in for the model / API, so the numbers show how
+much of a re-index job and of repeated queries the cache removes. Also checks that eviction
+keeps the store within `max_entries` and that near-identical texts share an entry.
+
+Usage:
+    python benchmarks/bench_embedding_cache.py --docs 2000 --dimension 1024
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_cache import EmbeddingCache
+
+
+def make_encoder(dimension, cost_per_text, calls):
+    def encode(texts):
+        calls.append(len(texts))
+        time.sleep(cost_per_text * len(texts))
+        vectors = []
+        for text in texts:
+            rng = random.Random(text)
+            vectors.append([rng.uniform(-1, 1) for _ in range(dimension)])
+        return vectors
+    return encode
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"  {label:<34} {time.perf_counter() - start:>8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding cache cold/warm/hot timings.")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--cost-ms", type=float, default=2.0, help="simulated encode cost per text")
+    args = parser.parse_args()
+
+    texts = [f"document {i}: the quick brown fox jumps over the lazy dog" for i in range(args.docs)]
+    calls = []
+    encode = make_encoder(args.dimension, args.cost_ms / 1000, calls)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite3")
+        print(f"{args.docs} docs, dimension {args.dimension}, {args.cost_ms}ms per encoded text")
+
+        cache = EmbeddingCache(path)
+        cold = timed("cold (all misses)", lambda: cache.get_or_compute("fake", texts, encode))
+        hot = timed("same process (memory hits)", lambda: cache.get_or_compute("fake", texts, encode))
+        cache.close()
+
+        cache = EmbeddingCache(path)  # a fresh run: empty LRU, warm SQLite file
+        warm = timed("next run (disk hits)", lambda: cache.get_or_compute("fake", texts, encode))
+        timed("1000 repeated single queries", lambda: [
+            cache.get_or_compute("fake", [texts[i % 10]], encode) for i in range(1000)
+        ])
+        assert cold == hot == warm, "cached vectors differ from computed ones"
+        assert sum(calls) == args.docs, f"encoder saw {sum(calls)} texts, expected {args.docs}"
+
+        # Whitespace / Unicode variants of a cached text must not be re-encoded.
+        cache.get_or_compute("fake", ["  document 0:\tthe quick brown fox jumps over the lazy dog\n"], encode)
+        assert sum(calls) == args.docs, "normalized variant missed the cache"
+        print(f"  stats: {cache.stats}, hit rate {cache.hit_rate():.1%}")
+        cache.close()
+
+        small = EmbeddingCache(os.path.join(tmp, "small.sqlite3"), max_entries=500, memory_entries=100)
+        small.get_or_compute("fake", texts, make_encoder(8, 0, []))
+        print(f"  bounded store: {small.disk_entries} rows on disk (max 500), {small.stats['evictions']} evicted")
+        assert small.disk_entries <= 500
+        small.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+Indexing throughput with SentenceTransformer: per-document encode vs. batched encode.
+
+Two parts:
+1. `_bulk` body building: `json.dumps(vector.tolist())` per document vs. `bulk_vectors`
+   formatting a whole float32 batch at once (time and payload size).
+2. Encoding docs/sec on CPU for batch sizes 1..N, plus the original one-`encode()`-per-document
+   loop. Needs `sentence-transformers` and downloads the model on first run.
+
+Usage:
+    python benchmarks/bench_encode_batching.py --docs 1000 --batch-sizes 1 8 32 64 128
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bulk_vectors import build_bulk_body
+
+WORDS = ("search vector index model query document embedding cluster shard node latency "
+         "python opensearch batch throughput memory cache token sentence").split()
+
+
+def make_texts(count, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(8, 40))) for _ in range(count)]
+
+
+def per_document_body(index, ids, texts, matrix):
+    lines = []
+    for doc_id, text, vector in zip(ids, texts, matrix):
+        lines.append(json.dumps({"index": {"_index": index, "_id": doc_id}}))
+        lines.append(json.dumps({"text": text, "text_vector": vector.tolist()}))
+    return "\n".join(lines) + "\n"
+
+
+def bench_serialization(texts, dimension):
+    matrix = np.random.default_rng(0).standard_normal((len(texts), dimension)).astype(np.float32)
+    print(f"_bulk body for {len(texts)} docs x {dimension} dims")
+    for label, build in (("json.dumps(tolist())", per_document_body), ("bulk_vectors", build_bulk_body)):
+        start = time.perf_counter()
+        body = build("bench", range(1, len(texts) + 1), texts, matrix)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<22} {elapsed * 1000:>8.1f} ms  {len(body) / 2 ** 20:>6.2f} MiB")
+
+    # The compact format must round-trip float32 exactly.
+    parsed = [json.loads(line)["text_vector"] for line in build_bulk_body(
+        "bench", range(len(texts)), texts, matrix).splitlines()[1::2]]
+    assert np.array_equal(np.asarray(parsed, dtype=np.float32), matrix)
+
+
+def bench_encoding(texts, batch_sizes, model_name):
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("\nsentence-transformers is not installed; skipping the encoding benchmark.")
+        return
+    model = SentenceTransformer(model_name, device="cpu")
+    model.encode(texts[:16])  # warm-up
+
+    print(f"\nEncoding {len(texts)} docs with {model_name} on CPU")
+    print(f"  {'mode':<28} {'docs/s':>8}")
+    start = time.perf_counter()
+    for text in texts:
+        model.encode(text).tolist()
+    print(f"  {'one encode() per document':<28} {len(texts) / (time.perf_counter() - start):>8.1f}")
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        print(f"  {f'encode(list, batch_size={batch_size})':<28} {len(texts) / (time.perf_counter() - start):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched SentenceTransformer encoding and _bulk body benchmark.")
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64, 128])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    texts = make_texts(args.docs)
+    bench_serialization(texts, args.dimension)
+    bench_encoding(texts, args.batch_sizes, args.model)
+
+
+if __name__ == "__main__":
+    main()
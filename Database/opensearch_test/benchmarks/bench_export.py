@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+Exporting a whole index: load-everything vs. the streaming `opensearch_export` iterator.
+
+The "load everything" baseline is the usual ad-hoc script: scroll through the index,
+append every hit to a list, then write the file. The streaming exports write NDJSON (and
+Parquet when pyarrow is installed) page by page, with 1 and N slices, through a point in
+time and through the scroll fallback. Peak Python memory is measured with tracemalloc;
+the fake server runs in its own process so its allocations are not counted. Every export
+is checked to contain each document exactly once, and an export abandoned half-way must
+leave no PIT open on the server.
+
+Usage:
+    python benchmarks/bench_export.py --docs 20000 --slices 4
+    python benchmarks/bench_export.py --live --index my-vector-test-index
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import opensearch_crud
+from fake_opensearch_server import FakeOpenSearchServer
+from opensearch_client import get_client
+from opensearch_export import export_index, scan_index
+
+
+class PitCounter:
+    """Client wrapper counting point-in-time contexts that are opened but not deleted."""
+
+    def __init__(self, client):
+        self.client = client
+        self.open = 0
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def create_pit(self, **kwargs):
+        response = self.client.create_pit(**kwargs)
+        self.open += 1
+        return response
+
+    def delete_pit(self, **kwargs):
+        response = self.client.delete_pit(**kwargs)
+        self.open -= 1
+        return response
+
+
+def serve(latency, pit, port):
+    server = FakeOpenSearchServer(base_latency=latency, pit=pit).start()
+    port.value = server.host["port"]
+    server.thread.join()
+
+
+def start_server(latency, pit):
+    port = multiprocessing.Value("i", 0)
+    process = multiprocessing.Process(target=serve, args=(latency, pit, port), daemon=True)
+    process.start()
+    while not port.value:
+        time.sleep(0.01)
+    return process, get_client(hosts=[{"host": "127.0.0.1", "port": port.value}], http_compress=False)
+
+
+def load_everything(client, index, path):
+    hits = []
+    response = client.search(index=index, body={"size": 1000, "query": {"match_all": {}}}, scroll="2m")
+    while response["hits"]["hits"]:
+        hits.extend(response["hits"]["hits"])
+        response = client.scroll(scroll_id=response["_scroll_id"], scroll="2m")
+    client.clear_scroll(scroll_id=response["_scroll_id"])
+    with open(path, "w", encoding="utf-8") as f:
+        for hit in hits:
+            f.write(json.dumps({"_id": hit["_id"], "_source": hit["_source"]}, ensure_ascii=False) + "\n")
+    return len(hits)
+
+
+def exported_ids(path):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=["_id"]).column("_id").to_pylist()
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["_id"] for line in f]
+
+
+def measure(label, expected, path, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = fn(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    ids = exported_ids(path)
+    assert count == len(ids) == len(set(ids)) and set(ids) == expected, f"{label}: wrong documents"
+    print(f"  {label:<34} {elapsed:>7.2f} s {count / elapsed:>9.0f} docs/s {peak / 2 ** 20:>8.1f} MiB peak")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index export benchmark.")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--slices", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--live", action="store_true", help="export an existing index from OPENSEARCH_HOST/PORT")
+    parser.add_argument("--index", default="bench-export")
+    args = parser.parse_args()
+
+    try:
+        import pyarrow # noqa: F401
+        formats = ("ndjson", "parquet")
+    except ImportError:
+        formats = ("ndjson",)
+
+    if args.live:
+        client, process, fallback, fallback_process = get_client(), None, None, None
+        expected = {hit["_id"] for hit in scan_index(client, args.index, source=[])}
+    else:
+        process, client = start_server(args.latency_ms / 1000, pit=True)
+        fallback_process, fallback = start_server(args.latency_ms / 1000, pit=False)
+        text = "lorem ipsum dolor sit amet " * 40
+        for target in (client, fallback):
+            opensearch_crud.client = target
+            documents = ((f"doc-{i:07d}", {"text": f"{i} {text}", "n": i}) for i in range(args.docs))
+            assert all(r.ok for r in opensearch_crud.create_documents(args.index, documents))
+        expected = {f"doc-{i:07d}" for i in range(args.docs)}
+    print(f"{len(expected)} documents")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export.ndjson")
+        measure("load everything, then write", expected, path, lambda p: load_everything(client, args.index, p))
+        for fmt in formats:
+            path = os.path.join(tmp, f"export.{fmt}")
+            for slices in (1, args.slices):
+                measure(f"stream {fmt}, PIT, {slices} slice(s)", expected, path,
+                        lambda p: export_index(client, args.index, p, slices=slices))
+            if fallback:
+                measure(f"stream {fmt}, scroll, {args.slices} slices", expected, path,
+                        lambda p: export_index(fallback, args.index, p, slices=args.slices))
+
+    # Stopping early must close the PIT and stop the slice readers.
+    threads = threading.active_count()
+    counted = PitCounter(client)
+    hits = scan_index(counted, args.index, slices=args.slices, size=100)
+    first = [next(hits) for _ in range(10)]
+    hits.close()
+    assert len(first) == 10 and counted.open == 0, "PIT left open"
+    assert threading.active_count() == threads, "slice readers still running"
+    if process:
+        process.terminate()
+        fallback_process.terminate()
+    print("early close ok")
+
+
+if __name__ == "__main__":
+    main()
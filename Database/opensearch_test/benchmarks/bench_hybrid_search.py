@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""
+Hybrid search latency: the old single bool(match + knn) query vs. concurrent BM25 / k-NN legs.
+
+By default runs against a simulated cluster where each request sleeps for a configurable
+server time (plus a network round trip), to show how much the concurrent legs and the
+overlap with query embedding save. With `--live`, both variants run against the index built
+by `opensearch_vector_search.py` on a real cluster (needs sentence-transformers).
+
+Usage:
+    python benchmarks/bench_hybrid_search.py --iterations 50
+    python benchmarks/bench_hybrid_search.py --live --iterations 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hybrid_search import HybridSearcher
+
+
+class SimulatedClient:
+    """Answers searches after sleeping: round trip + server time per query clause."""
+
+    def __init__(self, rtt_ms, bm25_ms, knn_ms):
+        self.rtt = rtt_ms / 1000
+        self.bm25 = bm25_ms / 1000
+        self.knn = knn_ms / 1000
+
+    def search(self, index, body):
+        text = json.dumps(body["query"])
+        cost = self.rtt
+        cost += self.bm25 if '"must": [{"match"' in text else 0 # Scoring match, not a filter
+        cost += self.knn if '"knn"' in text else 0
+        time.sleep(cost)
+        return {"hits": {"hits": [{"_id": str(i), "_score": 1.0 / (i + 1), "_source": {"text": f"doc {i}"}}
+                                  for i in range(body["size"])]}}
+
+
+def old_hybrid_query(client, index, embed_query, query_text, filter_keyword, k):
+    vector = embed_query(query_text)
+    body = {"size": k, "query": {"bool": {
+        "must": [{"match": {"text": filter_keyword}}],
+        "should": [{"knn": {"text_vector": {"vector": vector, "k": k}}}],
+    }}}
+    return client.search(index=index, body=body)["hits"]["hits"]
+
+
+def measure(label, fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"  {label:<34} p50 {np.percentile(timings, 50):>7.1f} ms   p95 {np.percentile(timings, 95):>7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hybrid search latency benchmark.")
+    parser.add_argument("--live", action="store_true", help="use the real cluster and model")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rtt-ms", type=float, default=2.0)
+    parser.add_argument("--bm25-ms", type=float, default=8.0)
+    parser.add_argument("--knn-ms", type=float, default=12.0)
+    parser.add_argument("--embed-ms", type=float, default=10.0, help="simulated query embedding time")
+    args = parser.parse_args()
+
+    if args.live:
+        import opensearch_vector_search as script
+        client, index, embed_query = script.client, script.INDEX_NAME, script.embed_query
+        filter_mode = script.hybrid_searcher.filter_mode
+    else:
+        client, index = SimulatedClient(args.rtt_ms, args.bm25_ms, args.knn_ms), "simulated"
+        filter_mode = "efficient"
+
+        def embed_query(text):
+            time.sleep(args.embed_ms / 1000)
+            return [0.0] * 384
+
+    searcher = HybridSearcher(client, index, embed_query, filter_mode=filter_mode)
+    query, keyword = "places to eat", "italy"
+    print(f"{'live cluster' if args.live else 'simulated cluster'}, k={args.k}, {args.iterations} iterations")
+    measure("single bool(match + knn) query",
+            lambda: old_hybrid_query(client, index, embed_query, query, keyword, args.k), args.iterations)
+    measure("concurrent legs, RRF", lambda: searcher.search(query, k=args.k), args.iterations)
+    measure("concurrent legs, RRF + filter",
+            lambda: searcher.search(query, k=args.k, filter={"match": {"text": keyword}}), args.iterations)
+    measure("concurrent legs, weighted",
+            lambda: searcher.search(query, k=args.k, method="weighted"), args.iterations)
+    searcher.close()
+
+
+if __name__ == "__main__":
+    main()
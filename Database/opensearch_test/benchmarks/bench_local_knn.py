@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Local k-NN index: recall@k vs. latency of IVF against exact brute force.
+
+Generates clustered float32 vectors (closer to real embeddings than uniform noise), takes the
+brute-force top-k as ground truth and sweeps IVF `nprobe`. Also times saving the index and
+loading it back with and without memory-mapping.
+
+Usage:
+    python benchmarks/bench_local_knn.py --docs 100000 --dimension 384 --queries 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_vector_index import BruteForceIndex, IVFIndex, load_index, save_index
+
+
+def clustered_vectors(count, dimension, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    return centers[labels] + 0.35 * rng.standard_normal((count, dimension)).astype(np.float32)
+
+
+def latency(search, queries):
+    timings = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query)[0][0])
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return np.array(results), np.percentile(timings, 50), np.percentile(timings, 95)
+
+
+def recall(found, truth):
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs. latency of the local k-NN index.")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    data = clustered_vectors(args.docs + args.queries, args.dimension, clusters=200, seed=0)
+    vectors, queries = data[:args.docs], data[args.docs:]
+    ids = [str(i) for i in range(args.docs)]
+    print(f"{args.docs} vectors x {args.dimension} dims, {args.queries} queries, k={args.k}")
+
+    flat = BruteForceIndex(vectors, ids)
+    truth, p50, p95 = latency(lambda q: flat.search(q, args.k), queries)
+    start = time.perf_counter()
+    flat.search(queries, args.k)
+    batched = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"  {'index':<18} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"  {'brute force':<18} {1.0:>9.3f} {p50:>8.2f} {p95:>8.2f}   ({batched:.2f} ms/query batched)")
+
+    start = time.perf_counter()
+    ivf = IVFIndex(vectors, ids)
+    print(f"  IVF build: {time.perf_counter() - start:.1f}s, {len(ivf.centroids)} lists")
+    # IVF reorders vectors by list; map its positions back to the original ids.
+    ivf_ids = np.array([int(i) for i in ivf.ids])
+    for nprobe in args.nprobe:
+        found, p50, p95 = latency(lambda q: ivf.search(q, args.k, nprobe=nprobe), queries)
+        print(f"  {f'IVF nprobe={nprobe}':<18} {recall(ivf_ids[found], truth):>9.3f} {p50:>8.2f} {p95:>8.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        save_index(ivf, tmp, index="bench")
+        print(f"\n  save: {time.perf_counter() - start:.2f}s")
+        for mmap in (False, True):
+            start = time.perf_counter()
+            loaded, _ = load_index(tmp, mmap=mmap)
+            elapsed = time.perf_counter() - start
+            found, p50, _ = latency(lambda q: loaded.search(q, args.k, nprobe=8), queries[:50])
+            print(f"  load (mmap={mmap}): {elapsed * 1000:.0f} ms, first queries p50 {p50:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
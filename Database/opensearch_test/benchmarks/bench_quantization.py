@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compact vector storage: memory, build time and recall@10 of fp16 / int8 / PQ vs. float32.
+
+Recall is measured against exact float32 search, with and without the full-precision
+rerank step. Also compares the `_bulk` JSON payload per document for float vectors and
+OpenSearch "byte" vectors.
+
+Usage:
+    python benchmarks/bench_quantization.py --docs 50000 --dimension 384
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_local_knn import recall
+from bulk_vectors import format_vectors
+from local_vector_index import BruteForceIndex
+from vector_quantization import (Fp16Quantizer, Int8Quantizer, ProductQuantizer, QuantizedIndex,
+                                 to_index_vectors)
+
+
+def embedding_like_vectors(count, dimension, seed=0):
+    """Unit vectors with a decaying spectrum (a few strong directions), like real embeddings.
+
+    Isotropic noise makes every neighbour almost equidistant, which no quantizer (and no
+    real embedding model) produces.
+    """
+    rng = np.random.default_rng(seed)
+    rotation, _ = np.linalg.qr(rng.standard_normal((dimension, dimension)))
+    spectrum = np.arange(1, dimension + 1) ** -0.75
+    vectors = (rng.standard_normal((count, dimension)) * spectrum) @ rotation
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def p50_ms(search, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantization memory / build time / recall benchmark.")
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ sub-vectors (default: dimension / 8)")
+    args = parser.parse_args()
+
+    data = embedding_like_vectors(args.docs + args.queries, args.dimension)
+    vectors, queries = data[:args.docs], data[args.docs:]
+    ids = list(range(args.docs))
+
+    flat = BruteForceIndex(vectors, ids)
+    truth = flat.search(queries, args.k)[0]
+    print(f"{args.docs} vectors x {args.dimension} dims, k={args.k}")
+    print(f"  {'storage':<10} {'MiB':>8} {'build s':>8} {'recall':>7} {'+rerank':>8} {'p50 ms':>7}")
+    print(f"  {'float32':<10} {vectors.nbytes / 2 ** 20:>8.1f} {0:>8.1f} {1.0:>7.3f} {'-':>8} "
+          f"{p50_ms(lambda q: flat.search(q, args.k), queries):>7.2f}")
+
+    quantizers = [Fp16Quantizer(), Int8Quantizer(), ProductQuantizer(m=args.pq_m or args.dimension // 8)]
+    for quantizer in quantizers:
+        start = time.perf_counter()
+        index = QuantizedIndex(vectors, ids, quantizer=quantizer)
+        build = time.perf_counter() - start
+        plain = recall(index.search(queries, args.k, rerank=False)[0], truth)
+        reranked = recall(index.search(queries, args.k)[0], truth)
+        label = quantizer.kind if quantizer.kind != "pq" else f"pq m={quantizer.m}"
+        print(f"  {label:<10} {index.code_bytes / 2 ** 20:>8.1f} {build:>8.1f} {plain:>7.3f} {reranked:>8.3f} "
+              f"{p50_ms(lambda q: index.search(q, args.k), queries):>7.2f}")
+
+    sample = vectors[:1000]
+    float_bytes = sum(map(len, format_vectors(sample))) / len(sample)
+    byte_bytes = sum(map(len, format_vectors(to_index_vectors(sample, "byte")))) / len(sample)
+    print(f"\n_bulk vector JSON per document: float {float_bytes:.0f} B, byte {byte_bytes:.0f} B "
+          f"({byte_bytes / float_bytes:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""
+A local, OpenAI-compatible `/embeddings` endpoint for benchmarks.
+
+Vectors are deterministic per text (seeded from its hash), so callers can check that
+results come back in input order. Latency is `base_latency + per_item_latency * len(input)`;
+requests beyond `max_in_flight` concurrent ones are answered with 429 + Retry-After, like a
+rate-limited provider.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_vector(text, dimension):
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    return [rng.uniform(-1.0, 1.0) for _ in range(dimension)]
+
+
+class FakeEmbeddingsServer:
+    def __init__(self, dimension=1024, base_latency=0.02, per_item_latency=0.001, max_in_flight=None):
+        self.dimension = dimension
+        self.base_latency = base_latency
+        self.per_item_latency = per_item_latency
+        self.max_in_flight = max_in_flight
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {"requests": 0, "items": 0, "rate_limited": 0}
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {"requests": 0, "items": 0, "rate_limited": 0}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # Client gave up on the request
+
+            def do_POST(self):
+                if not self.path.endswith("/embeddings"):
+                    return self._reply(404, {"error": {"message": "not found"}})
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+
+                with server.lock:
+                    if server.max_in_flight is not None and server.in_flight >= server.max_in_flight:
+                        server.stats["rate_limited"] += 1
+                        limited = True
+                    else:
+                        server.in_flight += 1
+                        limited = False
+                if limited:
+                    return self._reply(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                                       {"Retry-After": "0.05"})
+                try:
+                    time.sleep(server.base_latency + server.per_item_latency * len(inputs))
+                    data = []
+                    for i, text in enumerate(inputs):
+                        vector = fake_vector(text, server.dimension)
+                        if request.get("encoding_format") == "base64":
+                            vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode()
+                        data.append({"object": "embedding", "index": i, "embedding": vector})
+                    with server.lock:
+                        server.stats["requests"] += 1
+                        server.stats["items"] += len(inputs)
+                    tokens = sum(len(text) // 4 + 1 for text in inputs)
+                    self._reply(200, {
+                        "object": "list",
+                        "data": data,
+                        "model": request.get("model"),
+                        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                    })
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+        return Handler
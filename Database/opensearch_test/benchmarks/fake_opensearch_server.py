@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+"""
+A local, in-memory stand-in for the OpenSearch document APIs, for benchmarks.
+
+Implements single-document `_doc` / `_update` / `DELETE`, `_bulk` and `_mget` on a dict of
+indices, with `_version` / `_seq_no` / `_primary_term` like the real thing, plus `_search`
+for `match_all` / `term` queries with point-in-time + `search_after` (sorted on `_id`),
+scroll, `slice` and `_source` filtering (`pit=False` answers the PIT API with 404, like a
+cluster older than 2.4).
+
+Every request sleeps `base_latency + per_item_latency * items` to model the network round
+trip plus per-document work; `reject_rate` answers that share of bulk items with 429
+(`es_rejected_execution_exception`), like a full write queue. Gzip request bodies
+(`http_compress=True`) are accepted.
+"""
+
+import bisect
+import gzip
+import itertools
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeOpenSearchServer:
+    def __init__(self, base_latency=0.002, per_item_latency=0.00002, reject_rate=0.0, seed=0, pit=True):
+        self.base_latency = base_latency
+        self.per_item_latency = per_item_latency
+        self.reject_rate = reject_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.indices = {} # index -> {id: (source, version, seq_no)}
+        self.seq_no = 0
+        self.auto_id = 0
+        self.pit = pit
+        self.contexts = {} # PIT id -> (index, snapshot); scroll id -> [index, docs, size, body, position]
+        self.context_ids = itertools.count(1)
+        self.stats = {"requests": 0, "items": 0, "rejected": 0}
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = 128
+        self.thread = None
+
+    @property
+    def host(self):
+        return {"host": "127.0.0.1", "port": self.httpd.server_address[1]}
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {"requests": 0, "items": 0, "rejected": 0}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- Document store (callers hold self.lock) ---
+
+    def _meta(self, index, doc_id, version, seq_no):
+        return {"_index": index, "_id": doc_id, "_version": version, "_seq_no": seq_no, "_primary_term": 1}
+
+    def _write(self, op, index, doc_id, body):
+        docs = self.indices.setdefault(index, {})
+        if doc_id is None:
+            self.auto_id += 1
+            doc_id = f"auto-{self.auto_id}"
+        current = docs.get(doc_id)
+        if op == "create" and current:
+            return 409, {"_index": index, "_id": doc_id, "error": {"type": "version_conflict_engine_exception"}}
+        if op == "delete":
+            if not current:
+                return 404, dict(self._meta(index, doc_id, 1, self.seq_no), result="not_found")
+            del docs[doc_id]
+            self.seq_no += 1
+            return 200, dict(self._meta(index, doc_id, current[1] + 1, self.seq_no), result="deleted")
+        if op == "update":
+            if not current and not body.get("doc_as_upsert"):
+                return 404, {"_index": index, "_id": doc_id, "error": {"type": "document_missing_exception"}}
+            source = dict(current[0]) if current else {}
+            source.update(body.get("doc", {}))
+        else:
+            source = body
+        version = current[1] + 1 if current else 1
+        self.seq_no += 1
+        docs[doc_id] = (source, version, self.seq_no)
+        result = "updated" if current else "created"
+        return 201 if result == "created" else 200, dict(self._meta(index, doc_id, version, self.seq_no), result=result)
+
+    def _get(self, index, doc_id, includes=None):
+        current = self.indices.get(index, {}).get(doc_id)
+        if not current:
+            return {"_index": index, "_id": doc_id, "found": False}
+        source = current[0]
+        if includes:
+            source = {key: value for key, value in source.items() if key in includes}
+        return dict(self._meta(index, doc_id, current[1], current[2]), found=True, _source=source)
+
+    @staticmethod
+    def _parse_bulk(raw, default_index):
+        lines = [line for line in raw.split("\n") if line.strip()]
+        actions, i = [], 0
+        while i < len(lines):
+            op, meta = next(iter(json.loads(lines[i]).items()))
+            body = None
+            if op != "delete":
+                i += 1
+                body = json.loads(lines[i])
+            i += 1
+            actions.append((op, meta.get("_index", default_index), meta.get("_id"), body))
+        return actions
+
+    def _bulk(self, actions):
+        items, errors = [], False
+        for op, index, doc_id, body in actions:
+            if self.reject_rate and self.rng.random() < self.reject_rate:
+                self.stats["rejected"] += 1
+                status, outcome = 429, {"_index": index, "_id": doc_id,
+                                        "error": {"type": "es_rejected_execution_exception"}}
+            else:
+                status, outcome = self._write(op, index, doc_id, body)
+            errors = errors or (status >= 300 and not (op == "delete" and status == 404))
+            items.append({op: dict(outcome, status=status)})
+        return {"took": 1, "errors": errors, "items": items}
+
+    def _snapshot(self, index):
+        docs = self.indices.get(index, {})
+        return [(doc_id,) + docs[doc_id] for doc_id in sorted(docs)]
+
+    @staticmethod
+    def _matches(doc_id, source, body):
+        query = body.get("query") or {"match_all": {}}
+        if "term" in query:
+            field, value = next(iter(query["term"].items()))
+            value = value["value"] if isinstance(value, dict) else value
+            if source.get(field) != value:
+                return False
+        elif "match_all" not in query:
+            raise ValueError(f"unsupported query {query}")
+        part = body.get("slice")
+        return not part or zlib.crc32(doc_id.encode()) % part["max"] == part["id"]
+
+    def _hits(self, index, docs, body):
+        includes = body.get("_source")
+        hits = []
+        for doc_id, source, version, seq_no in docs:
+            if includes is not None:
+                source = {key: value for key, value in source.items() if key in includes}
+            hits.append({"_index": index, "_id": doc_id, "_score": None, "_source": source, "sort": [doc_id]})
+        return {"took": 1, "timed_out": False, "hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits}}
+
+    def _search(self, index, body, scroll=False):
+        """Answers a `_search`; PIT searches pass `index=None` and read their snapshot."""
+        size = body.get("size", 10)
+        if index is None:
+            index, snapshot = self.contexts[body["pit"]["id"]]
+        else:
+            snapshot = self._snapshot(index)
+        start = 0
+        if "search_after" in body:
+            start = bisect.bisect_right(snapshot, body["search_after"][0], key=lambda doc: doc[0])
+        matches = (snapshot[i] for i in range(start, len(snapshot)) if self._matches(*snapshot[i][:2], body))
+        if scroll:
+            docs = list(matches)
+        else:
+            docs = list(itertools.islice(matches, size))
+        response = self._hits(index, docs[:size], body)
+        if "pit" in body:
+            response["pit_id"] = body["pit"]["id"]
+        if scroll:
+            scroll_id = f"scroll-{next(self.context_ids)}"
+            self.contexts[scroll_id] = [index, docs, size, body, size]
+            response["_scroll_id"] = scroll_id
+        return response
+
+    def _scroll(self, scroll_id):
+        context = self.contexts[scroll_id]
+        index, docs, size, body, position = context
+        context[4] = position + size
+        return dict(self._hits(index, docs[position:position + size], body), _scroll_id=scroll_id)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive
+            disable_nagle_algorithm = True # Avoids 40 ms delayed-ACK stalls between small replies
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _body(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    raw = gzip.decompress(raw)
+                return raw.decode("utf-8")
+
+            def _handle(self):
+                url = urlsplit(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                parts = [part for part in url.path.split("/") if part]
+                raw = self._body()
+
+                if parts and parts[-1] == "_bulk":
+                    actions = server._parse_bulk(raw, parts[0] if len(parts) == 2 else None)
+                    time.sleep(server.base_latency + server.per_item_latency * len(actions))
+                    with server.lock:
+                        server.stats["requests"] += 1
+                        server.stats["items"] += len(actions)
+                        response = server._bulk(actions)
+                    return self._reply(200, response)
+
+                if parts[-2:] == ["_search", "point_in_time"] or parts[-2:] == ["_search", "scroll"]:
+                    time.sleep(server.base_latency)
+                    kind = parts[-1]
+                    if kind == "point_in_time" and not server.pit:
+                        return self._reply(404, {"error": {"type": "invalid_index_name_exception"}})
+                    with server.lock:
+                        server.stats["requests"] += 1
+                        body = json.loads(raw) if raw else {}
+                        if self.command == "DELETE":
+                            ids = body.get("pit_id") or body.get("scroll_id") or []
+                            for context_id in ids if isinstance(ids, list) else [ids]:
+                                server.contexts.pop(context_id, None)
+                            return self._reply(200, {"succeeded": True})
+                        if kind == "point_in_time":
+                            pit_id = f"pit-{next(server.context_ids)}"
+                            server.contexts[pit_id] = (parts[0], server._snapshot(parts[0]))
+                            return self._reply(200, {"pit_id": pit_id, "creation_time": int(time.time() * 1000)})
+                        response = server._scroll(body["scroll_id"])
+                        server.stats["items"] += len(response["hits"]["hits"])
+                    return self._reply(200, response)
+
+                if parts and parts[-1] == "_search":
+                    body = json.loads(raw) if raw else {}
+                    time.sleep(server.base_latency + server.per_item_latency * body.get("size", 10))
+                    with server.lock:
+                        server.stats["requests"] += 1
+                        response = server._search(parts[0] if len(parts) == 2 else None, body, "scroll" in query)
+                        server.stats["items"] += len(response["hits"]["hits"])
+                    return self._reply(200, response)
+
+                if parts and parts[-1] == "_mget":
+                    body = json.loads(raw)
+                    ids = body.get("ids") or [doc["_id"] for doc in body.get("docs", [])]
+                    includes = query.get("_source_includes")
+                    includes = set(includes.split(",")) if includes else None
+                    time.sleep(server.base_latency + server.per_item_latency * len(ids))
+                    with server.lock:
+                        server.stats["requests"] += 1
+                        server.stats["items"] += len(ids)
+                        docs = [server._get(parts[0], doc_id, includes) for doc_id in ids]
+                    return self._reply(200, {"docs": docs})
+
+                if len(parts) in (2, 3) and parts[1] in ("_doc", "_create", "_update"):
+                    index, endpoint = parts[0], parts[1]
+                    doc_id = parts[2] if len(parts) == 3 else None
+                    time.sleep(server.base_latency + server.per_item_latency)
+                    with server.lock:
+                        server.stats["requests"] += 1
+                        server.stats["items"] += 1
+                        if self.command == "GET":
+                            doc = server._get(index, doc_id)
+                            status, payload = (200 if doc["found"] else 404), doc
+                        elif self.command == "DELETE":
+                            status, payload = server._write("delete", index, doc_id, None)
+                        else:
+                            op = {"_doc": "index", "_create": "create", "_update": "update"}[endpoint]
+                            status, payload = server._write(op, index, doc_id, json.loads(raw))
+                    return self._reply(status, payload)
+
+                self._reply(404, {"error": {"type": "unsupported_operation", "reason": self.path}})
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        return Handler
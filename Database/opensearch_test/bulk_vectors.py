@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+"""
+Builds `_bulk` request bodies straight from a float32 embedding matrix.
+
+`json.dumps(vector.tolist())` creates a Python float per component and prints each one with
+17 significant digits. Here a whole batch is formatted in one `np.savetxt` call with `%.9g`,
+which is enough digits to round-trip float32 exactly, so the payload is ~40% smaller and
+no per-vector lists are built.
+"""
+
+import io
+import json
+
+import numpy as np
+
+
+def format_vectors(matrix):
+    """Returns one JSON array string per row of a 2-D float (or int8 "byte" vector) matrix."""
+    matrix = np.asarray(matrix)
+    if not len(matrix):
+        return []
+    if np.issubdtype(matrix.dtype, np.integer):
+        fmt = "%d"
+    else:
+        matrix, fmt = matrix.astype(np.float32, copy=False), "%.9g"
+    buf = io.StringIO()
+    np.savetxt(buf, matrix, fmt=fmt, delimiter=",")
+    return ["[" + row + "]" for row in buf.getvalue().splitlines()]
+
+
+def build_bulk_body(index, ids, texts, matrix, vector_field="text_vector", text_field="text"):
+    """Returns an NDJSON `_bulk` body indexing one document per (id, text, vector row)."""
+    lines = []
+    for doc_id, text, vector in zip(ids, texts, format_vectors(matrix)):
+        lines.append(json.dumps({"index": {"_index": index, "_id": doc_id}}))
+        lines.append(f'{{"{text_field}": {json.dumps(text)}, "{vector_field}": {vector}}}')
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def check_bulk_response(response):
+    """Raises RuntimeError listing the first failed items of a `_bulk` response."""
+    if not response.get("errors"):
+        return
+    failed = [item for item in response["items"] if next(iter(item.values())).get("status", 500) >= 300]
+    raise RuntimeError(f"{len(failed)} bulk item(s) failed, e.g. {failed[:3]}")
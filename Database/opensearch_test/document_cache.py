@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+"""
+Read-through cache for OpenSearch documents, used by `opensearch_crud`.
+
+Documents are cached per (index, id) together with the `_seq_no` / `_primary_term` they
+were read or written at. The first tier is an in-process LRU bounded by the JSON size of
+the cached sources (`max_bytes`), with a `ttl`; the optional second tier is Redis (a hash
+per document, expiring after `redis_ttl`), shared by every process using the same prefix.
+
+Writes made through `opensearch_crud` call `record_write()` with the version OpenSearch
+returned: the new document is cached (index), or the old one is dropped (update / delete).
+Every write also leaves a version floor for `ttl` seconds, and a document older than its
+floor is never cached, so a read that was already in flight when the document changed
+cannot put the old version back. In Redis the same check is done atomically by a Lua script.
+Documents that do not exist are cached too, so repeated reads of a missing id are hits.
+While a background update / delete by query runs, its index is not cached at all
+(`pause_index()` / `resume_index()`).
+Writes from other processes reach this process through Redis only when they go through a
+cache with the same Redis tier; otherwise the local `ttl` bounds how stale a read can be.
+
+Usage:
+    cache = DocumentCache(max_bytes=64 * 2 ** 20, ttl=60, redis_client=redis.Redis())
+    cached = cache.get("my-index", "1")   # CachedDocument or None
+    cache.put("my-index", "1", source, seq_no, primary_term)
+"""
+
+import json
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 60
+DEFAULT_REDIS_TTL = 300
+# A document that was never written through the cache; any real version is newer.
+UNKNOWN_VERSION = (-1, -1)
+
+CachedDocument = namedtuple('CachedDocument', 'found source seq_no primary_term')
+
+# KEYS[1] = document hash; ARGV = primary_term, seq_no, payload ("" = invalidated), ttl.
+# Stores the payload unless the hash already holds a newer version.
+_REDIS_PUT = """
+local term = tonumber(redis.call('HGET', KEYS[1], 't') or '-2')
+local seq = tonumber(redis.call('HGET', KEYS[1], 'q') or '-2')
+local new_term, new_seq = tonumber(ARGV[1]), tonumber(ARGV[2])
+if term > new_term or (term == new_term and seq > new_seq) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 't', new_term, 'q', new_seq, 'd', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+def _text(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class DocumentCache:
+    """Byte-bounded TTL/LRU document cache with an optional shared Redis tier."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, redis_client=None,
+                 redis_ttl=DEFAULT_REDIS_TTL, redis_prefix="doccache:", max_floors=100_000):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.redis = redis_client
+        self.redis_ttl = redis_ttl
+        self.redis_prefix = redis_prefix
+        self.max_floors = max_floors
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # (index, id) -> (CachedDocument, size, expires_at)
+        self.floors = OrderedDict() # (index, id) -> ((primary_term, seq_no), expires_at)
+        self.paused = Counter() # index -> running update / delete by query tasks
+        self.size_bytes = 0
+        self.stats = {"hits": 0, "redis_hits": 0, "misses": 0, "puts": 0, "stale_puts": 0,
+                      "invalidations": 0, "evictions": 0, "expirations": 0}
+        self._redis_put = redis_client.register_script(_REDIS_PUT) if redis_client is not None else None
+
+    # --- Public API ---
+
+    def get(self, index, doc_id):
+        """Returns the cached `CachedDocument`, or None on a miss."""
+        return self.get_many(index, [doc_id]).get(doc_id)
+
+    def get_many(self, index, doc_ids):
+        """Returns `{doc_id: CachedDocument}` for the ids that are cached (local tier, then Redis)."""
+        found, missing = {}, []
+        now = time.monotonic()
+        with self.lock:
+            for doc_id in doc_ids:
+                cached = self._get_local((index, doc_id), now)
+                if cached is not None:
+                    found[doc_id] = cached
+                else:
+                    missing.append(doc_id)
+            self.stats["hits"] += len(found)
+            if not self.redis:
+                self.stats["misses"] += len(missing)
+        if self.redis and missing:
+            remote = self._get_redis(index, missing)
+            with self.lock:
+                for doc_id, cached in remote.items():
+                    self._put_local((index, doc_id), cached, time.monotonic())
+                self.stats["redis_hits"] += len(remote)
+                self.stats["misses"] += len(missing) - len(remote)
+            found.update(remote)
+        return found
+
+    def put(self, index, doc_id, source, seq_no=None, primary_term=None, found=True):
+        """Caches a document as read (or written) at `seq_no` / `primary_term`.
+
+        Returns False if a newer version has been written through the cache meanwhile.
+        """
+        cached = CachedDocument(found, source if found else None,
+                                UNKNOWN_VERSION[1] if seq_no is None else seq_no,
+                                UNKNOWN_VERSION[0] if primary_term is None else primary_term)
+        with self.lock:
+            stored = self._put_local((index, doc_id), cached, time.monotonic())
+        if stored and self.redis:
+            payload = json.dumps({"found": found, "source": cached.source})
+            stored = bool(self._redis_put(keys=[self._redis_key(index, doc_id)],
+                                          args=[cached.primary_term, cached.seq_no, payload, self.redis_ttl]))
+            if not stored:
+                # Redis has a newer version written by another process.
+                with self.lock:
+                    self._drop((index, doc_id))
+        if not stored:
+            with self.lock:
+                self.stats["stale_puts"] += 1
+        return stored
+
+    def record_write(self, index, doc_id, seq_no, primary_term, source=None, found=True):
+        """Applies a write OpenSearch acknowledged at `seq_no` / `primary_term`.
+
+        With `source` (a full document that was indexed) the new version is cached; otherwise
+        (update, delete) the document is dropped. `found=False` caches a delete as a miss.
+        Either way, reads of older versions are no longer cached.
+        """
+        key, version = (index, doc_id), (primary_term, seq_no)
+        cached = CachedDocument(found, source if found else None, seq_no, primary_term)
+        now = time.monotonic()
+        with self.lock:
+            known = (source is not None or not found) and index not in self.paused
+            self._raise_floor(key, version, now)
+            if known:
+                self._put_local(key, cached, now)
+            else:
+                self._drop(key)
+            self.stats["invalidations"] += 1
+        if self.redis:
+            payload = json.dumps({"found": found, "source": cached.source}) if known else ""
+            self._redis_put(keys=[self._redis_key(index, doc_id)],
+                            args=[primary_term, seq_no, payload, self.redis_ttl])
+
+    def invalidate(self, index, doc_id):
+        """Drops a document whose new version is not known."""
+        with self.lock:
+            self._drop((index, doc_id))
+            self.stats["invalidations"] += 1
+        if self.redis:
+            self.redis.delete(self._redis_key(index, doc_id))
+
+    def invalidate_index(self, index):
+        """Drops every cached document of an index (after update / delete by query)."""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == index]:
+                self._drop(key)
+            self.stats["invalidations"] += 1
+        if self.redis:
+            keys = list(self.redis.scan_iter(match=f"{self.redis_prefix}{index}:*", count=1000))
+            for start in range(0, len(keys), 1000):
+                self.redis.unlink(*keys[start:start + 1000])
+
+    def pause_index(self, index):
+        """Drops an index's documents and stops caching them until `resume_index()`.
+
+        Used while an update / delete by query task runs in the background: documents read
+        meanwhile may be old versions, and the task's writes come with no version to check.
+        """
+        with self.lock:
+            self.paused[index] += 1
+        self.invalidate_index(index)
+
+    def resume_index(self, index):
+        """Caches the index again once the last paused task finished; drops what it changed."""
+        self.invalidate_index(index)
+        with self.lock:
+            self.paused[index] -= 1
+            if self.paused[index] <= 0:
+                del self.paused[index]
+
+    def hit_rate(self):
+        hits = self.stats["hits"] + self.stats["redis_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.floors.clear()
+            self.size_bytes = 0
+
+    # --- Internals (callers hold self.lock) ---
+
+    def _get_local(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= now:
+            self._drop(key)
+            self.stats["expirations"] += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def _put_local(self, key, cached, now):
+        if key[0] in self.paused:
+            return False
+        floor = self.floors.get(key)
+        if floor is not None:
+            if floor[1] <= now:
+                del self.floors[key]
+            elif (cached.primary_term, cached.seq_no) < floor[0]:
+                return False
+        size = len(json.dumps(cached.source)) + 64 # Rough per-entry overhead
+        self._drop(key) # Never serve the previous version, even if this one is not kept
+        if size > self.max_bytes:
+            return True # Too big to keep; not a stale write
+        self.entries[key] = (cached, size, now + self.ttl)
+        self.size_bytes += size
+        self.stats["puts"] += 1
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted, _) = self.entries.popitem(last=False)
+            self.size_bytes -= evicted
+            self.stats["evictions"] += 1
+        return True
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
+
+    def _raise_floor(self, key, version, now):
+        current = self.floors.get(key)
+        if current is None or current[0] < version:
+            self.floors[key] = (version, now + self.ttl)
+            self.floors.move_to_end(key)
+            while len(self.floors) > self.max_floors:
+                self.floors.popitem(last=False)
+
+    def _redis_key(self, index, doc_id):
+        return f"{self.redis_prefix}{index}:{doc_id}"
+
+    def _get_redis(self, index, doc_ids):
+        pipe = self.redis.pipeline(transaction=False)
+        for doc_id in doc_ids:
+            pipe.hmget(self._redis_key(index, doc_id), "t", "q", "d")
+        found = {}
+        for doc_id, (term, seq, payload) in zip(doc_ids, pipe.execute()):
+            payload = _text(payload)
+            if not payload:
+                continue # Missing, or invalidated by a write
+            data = json.loads(payload)
+            found[doc_id] = CachedDocument(data["found"], data["source"], int(seq), int(term))
+        return found
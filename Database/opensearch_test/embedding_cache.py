@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""
+Content-addressed embedding cache shared by the vector search scripts.
+
+Vectors are keyed by `sha256(model name + normalized text)`, so the same text embedded by
+the same model is only ever computed once, across runs. Lookups go through an in-memory LRU
+first and a SQLite file second (vectors stored as raw float32 blobs). The SQLite store is
+bounded by `max_entries`; when it grows past that, the least recently used rows are evicted.
+Hit/miss counters are kept in `stats`.
+
+Usage:
+    cache = EmbeddingCache("embedding_cache.sqlite3")
+    vectors = cache.get_or_compute("text-embedding-v4", texts, compute_fn)
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_MEMORY_ENTRIES = 10_000
+
+
+def normalize_text(text):
+    """Unicode-normalizes and collapses whitespace; case is kept since models are case-sensitive."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def to_blob(vector):
+    """float32 bytes for a vector given as a list or a NumPy array (no per-element conversion)."""
+    if hasattr(vector, "dtype"):
+        return vector.astype("<f4", copy=False).tobytes()
+    return array("f", vector).tobytes()
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """In-memory LRU in front of a size-bounded SQLite store of float32 vectors."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.db.commit()
+        self.disk_entries = self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    # --- Public API ---
+
+    def get_many(self, model, texts):
+        """Returns one vector (list of floats) or None per text, in input order."""
+        keys = [cache_key(model, text) for text in texts]
+        results = [None] * len(texts)
+        missing = {}
+        with self.lock:
+            for i, key in enumerate(keys):
+                vector = self.memory.get(key)
+                if vector is not None:
+                    self.memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    results[i] = vector
+                else:
+                    missing.setdefault(key, []).append(i)
+            if missing:
+                found = self._load(list(missing))
+                for key, positions in missing.items():
+                    vector = found.get(key)
+                    self.stats["disk_hits" if vector is not None else "misses"] += len(positions)
+                    if vector is not None:
+                        self._remember(key, vector)
+                        for i in positions:
+                            results[i] = vector
+        return results
+
+    def put_many(self, model, texts, vectors):
+        """Stores vectors for texts, evicting the least recently used rows if over capacity."""
+        now = time.time()
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            key = cache_key(model, text)
+            rows[key] = (key, model, to_blob(vector), now)
+        with self.lock:
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?)", rows.values())
+            self.disk_entries += self.db.total_changes - before
+            self.db.commit()
+            for key, (_, _, blob, _) in rows.items():
+                self._remember(key, array("f", blob).tolist())
+            self.stats["writes"] += len(rows)
+            if self.disk_entries > self.max_entries:
+                self._evict()
+
+    def get_or_compute(self, model, texts, compute_fn):
+        """Returns vectors for all texts, calling `compute_fn(missing_texts)` only for cache misses.
+
+        Repeated texts in one call are computed once.
+        """
+        results = self.get_many(model, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, results) if vector is None))
+        if missing:
+            computed = compute_fn(missing)
+            self.put_many(model, missing, computed)
+            # Round-trip through float32 so fresh vectors match what later cache hits return.
+            by_text = {text: array("f", to_blob(vector)).tolist() for text, vector in zip(missing, computed)}
+            results = [vector if vector is not None else by_text[text] for text, vector in zip(texts, results)]
+        return results
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.db.execute("DELETE FROM embeddings")
+            self.db.commit()
+            self.disk_entries = 0
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    # --- Internals ---
+
+    def _load(self, keys):
+        found = {}
+        # Stay under SQLite's bound-parameter limit.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for key, blob in self.db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            ):
+                found[key] = array("f", blob).tolist()
+        if found:
+            self.db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                [(time.time(), key) for key in found])
+            self.db.commit()
+        return found
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict(self):
+        # Evict down to 90% so we are not deleting on every subsequent write.
+        excess = self.disk_entries - int(self.max_entries * 0.9)
+        self.db.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self.db.commit()
+        self.disk_entries -= excess
+        self.stats["evictions"] += excess
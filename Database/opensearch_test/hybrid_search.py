@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""
+Hybrid (BM25 + k-NN) search with rank fusion.
+
+A single `bool` query with a `match` must-clause and a `knn` should-clause only returns
+documents that match the keywords, and adds a BM25 score (unbounded) to an l2 score (0..1).
+`HybridSearcher` instead runs the two legs as separate requests, concurrently, and fuses
+the result lists:
+
+- "rrf": reciprocal rank fusion, `sum(1 / (rank_constant + rank))` over the legs; needs no
+  score calibration.
+- "weighted": min-max normalizes each leg's scores to 0..1 and adds them with `weights`.
+
+The BM25 request is sent before the query is embedded, so embedding overlaps with it.
+An optional `filter` (any OpenSearch query clause) restricts both legs. For the k-NN leg,
+`filter_mode` picks how:
+
+- "efficient": `knn.filter`, filtered during the graph search (lucene / faiss engines).
+- "exact": `script_score` k-NN over the filtered documents only; exact, any engine.
+- "post": `bool` filter around the `knn` query; cheapest, but can return fewer than k hits.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+FUSION_METHODS = ("rrf", "weighted")
+FILTER_MODES = ("efficient", "exact", "post")
+
+
+def reciprocal_rank_fusion(result_lists, rank_constant=60):
+    """Fuses ranked lists of hits; returns `[(doc_id, score, hit, ranks)]` best first."""
+    fused = {}
+    for leg, hits in result_lists.items():
+        for rank, hit in enumerate(hits, 1):
+            entry = fused.setdefault(hit["_id"], [0.0, hit, {}])
+            entry[0] += 1.0 / (rank_constant + rank)
+            entry[2][leg] = rank
+    return sorted(((doc_id, score, hit, ranks) for doc_id, (score, hit, ranks) in fused.items()),
+                  key=lambda item: (-item[1], item[0]))
+
+
+def weighted_score_fusion(result_lists, weights):
+    """Fuses lists by min-max normalized scores; `weights` maps leg name -> weight."""
+    fused = {}
+    for leg, hits in result_lists.items():
+        if not hits:
+            continue
+        scores = [hit["_score"] or 0.0 for hit in hits]
+        low, high = min(scores), max(scores)
+        for rank, (hit, score) in enumerate(zip(hits, scores), 1):
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            entry = fused.setdefault(hit["_id"], [0.0, hit, {}])
+            entry[0] += weights.get(leg, 1.0) * normalized
+            entry[2][leg] = rank
+    return sorted(((doc_id, score, hit, ranks) for doc_id, (score, hit, ranks) in fused.items()),
+                  key=lambda item: (-item[1], item[0]))
+
+
+class HybridSearcher:
+    """Runs BM25 and k-NN legs concurrently against one index and fuses their rankings."""
+
+    def __init__(self, client, index, embed_query, text_field="text", vector_field="text_vector",
+                 source_fields=("text",), filter_mode="exact", max_workers=8):
+        if filter_mode not in FILTER_MODES:
+            raise ValueError(f"Unknown filter mode '{filter_mode}', expected one of {FILTER_MODES}")
+        self.client = client
+        self.index = index
+        self.embed_query = embed_query
+        self.text_field = text_field
+        self.vector_field = vector_field
+        self.source_fields = list(source_fields)
+        self.filter_mode = filter_mode
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hybrid-search")
+
+    def search(self, query_text, k=10, filter=None, method="rrf", weights=None, rank_constant=60, window=None):
+        """Returns the fused top-k hits: `{"_id", "_score", "_source", "ranks"}`.
+
+        `window` is how many candidates each leg returns (default `max(5 * k, 20)`).
+        """
+        if method not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method '{method}', expected one of {FUSION_METHODS}")
+        window = window or max(5 * k, 20)
+        bm25 = self.executor.submit(self._search, self.bm25_query(query_text, window, filter))
+        knn = self._search(self.knn_query(self.embed_query(query_text), window, filter))
+        result_lists = {"bm25": bm25.result(), "knn": knn}
+
+        if method == "rrf":
+            fused = reciprocal_rank_fusion(result_lists, rank_constant)
+        else:
+            fused = weighted_score_fusion(result_lists, weights or {"bm25": 0.5, "knn": 0.5})
+        return [{"_id": doc_id, "_score": score, "_source": hit.get("_source", {}), "ranks": ranks}
+                for doc_id, score, hit, ranks in fused[:k]]
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    # --- Query builders ---
+
+    def bm25_query(self, query_text, size, filter=None):
+        query = {"bool": {"must": [{"match": {self.text_field: query_text}}]}}
+        if filter:
+            query["bool"]["filter"] = [filter]
+        return {"size": size, "_source": self.source_fields, "query": query}
+
+    def knn_query(self, vector, size, filter=None):
+        knn = {"vector": vector, "k": size}
+        if not filter:
+            query = {"knn": {self.vector_field: knn}}
+        elif self.filter_mode == "efficient":
+            query = {"knn": {self.vector_field: dict(knn, filter=filter)}}
+        elif self.filter_mode == "post":
+            query = {"bool": {"must": [{"knn": {self.vector_field: knn}}], "filter": [filter]}}
+        else:
+            # The k-NN plugin's exact scoring script; same l2 score as the HNSW query.
+            query = {"script_score": {
+                "query": {"bool": {"filter": [filter]}},
+                "script": {
+                    "source": "knn_score",
+                    "lang": "knn",
+                    "params": {"field": self.vector_field, "query_value": vector, "space_type": "l2"},
+                },
+            }}
+        return {"size": size, "_source": self.source_fields, "query": query}
+
+    def _search(self, body):
+        return self.client.search(index=self.index, body=body)["hits"]["hits"]
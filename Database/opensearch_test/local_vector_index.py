@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+
+"""
+In-process vector index that mirrors the `knn_vector` (l2) field of the vector scripts.
+
+For small collections a round trip to OpenSearch costs more than scanning every vector, so
+this module answers k-NN queries locally:
+
+- `BruteForceIndex`: exact search, one matrix multiply + `argpartition` per query batch.
+- `IVFIndex`: k-means coarse quantizer; a query only scans the `nprobe` closest lists,
+  then ranks candidates exactly. Used for larger collections.
+- `LocalKnnCache`: read-through cache in front of an OpenSearch index. The first query pulls
+  all vectors from OpenSearch (or loads a snapshot from disk, memory-mapped), later queries
+  are answered locally; collections above `max_docs` always go to OpenSearch. Every `ttl`
+  seconds the index's write counters are compared with those seen at the pull, and the copy
+  is pulled again if anything was indexed, updated or deleted.
+
+Scores follow OpenSearch's l2 space: `1 / (1 + squared_l2_distance)`, and hits have the same
+`{"_id", "_score", "_source"}` shape as an OpenSearch response.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from opensearch_export import scan_index
+
+DEFAULT_IVF_THRESHOLD = 50_000
+
+
+def l2_score(squared_distance):
+    """OpenSearch's score for the l2 space."""
+    return 1.0 / (1.0 + squared_distance)
+
+
+def _top_k(distances, k):
+    """Indices of the k smallest values per row, sorted ascending."""
+    k = min(k, distances.shape[1])
+    if k == 0:
+        return np.empty((distances.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, part, axis=1).argsort(axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _squared_l2(queries, vectors, vector_norms):
+    """Squared l2 distances via |x|^2 - 2 x.q + |q|^2 (one GEMM instead of a broadcast)."""
+    distances = vector_norms[None, :] - 2.0 * (queries @ vectors.T)
+    distances += np.einsum("ij,ij->i", queries, queries)[:, None]
+    return np.maximum(distances, 0.0, out=distances)
+
+
+def assign(vectors, centroids, block=65536):
+    """Index of the nearest centroid for every vector (in blocks to bound memory)."""
+    norms = np.einsum("ij,ij->i", centroids, centroids)
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        chunk = vectors[start:start + block]
+        assignment[start:start + block] = _squared_l2(chunk, centroids, norms).argmin(axis=1)
+    return assignment
+
+
+def kmeans(vectors, n_clusters, train_size=50_000, iterations=10, seed=0):
+    """Lloyd's k-means on a random sample of `vectors`; returns float32 centroids."""
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(vectors[rng.choice(len(vectors), min(train_size, len(vectors)), replace=False)],
+                        dtype=np.float32)
+    n_clusters = min(n_clusters, len(sample))
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign(sample, centroids)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        filled = counts > 0
+        # Sum each cluster's points with one reduceat over the points sorted by cluster.
+        order = np.argsort(assignment, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids[filled] = np.add.reduceat(sample[order], starts, axis=0) / counts[filled, None]
+        # Re-seed empty clusters with random points so none stays empty.
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+    return centroids
+
+
+class BruteForceIndex:
+    """Exact l2 k-NN over a float32 matrix."""
+
+    kind = "flat"
+
+    def __init__(self, vectors, ids, sources=None):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.ids = list(ids)
+        self.sources = sources
+        self.norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, queries, k=10):
+        """Returns `(positions, squared_distances)` arrays of shape (n_queries, k)."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not len(self):
+            # An empty index has no dimension to multiply against.
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        distances = _squared_l2(queries, self.vectors, self.norms)
+        positions = _top_k(distances, k)
+        return positions, np.take_along_axis(distances, positions, axis=1)
+
+    def _meta(self):
+        return {}
+
+    def _arrays(self):
+        return {"vectors": self.vectors}
+
+    @classmethod
+    def _from_arrays(cls, arrays, ids, sources, meta):
+        return cls(arrays["vectors"], ids, sources)
+
+
+class IVFIndex(BruteForceIndex):
+    """Inverted-file index: vectors are stored grouped by their nearest k-means centroid."""
+
+    kind = "ivf"
+
+    def __init__(self, vectors, ids, sources=None, nlist=None, nprobe=8, train_size=50_000,
+                 iterations=10, seed=0, _centroids=None, _offsets=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ids = list(ids)
+        if _centroids is None:
+            nlist = nlist or max(1, int(4 * np.sqrt(len(vectors))))
+            centroids = kmeans(vectors, nlist, train_size, iterations, seed)
+            assignment = assign(vectors, centroids)
+            # Store each list contiguously, so a probe reads one slice (and mmap pages stay local).
+            order = np.argsort(assignment, kind="stable")
+            vectors = vectors[order]
+            ids = [ids[i] for i in order]
+            if sources is not None:
+                sources = [sources[i] for i in order]
+            _offsets = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+            _centroids = centroids
+        super().__init__(vectors, ids, sources)
+        self.centroids = _centroids
+        self.centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self.offsets = _offsets
+        self.nprobe = nprobe
+
+    def search(self, queries, k=10, nprobe=None):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probes = _top_k(_squared_l2(queries, self.centroids, self.centroid_norms), nprobe)
+        positions = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        for q, lists in enumerate(probes):
+            candidates = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+            if not len(candidates):
+                continue
+            d = _squared_l2(queries[q:q + 1], self.vectors[candidates], self.norms[candidates])
+            best = _top_k(d, k)[0]
+            positions[q, :len(best)] = candidates[best]
+            distances[q, :len(best)] = d[0, best]
+        return positions, distances
+
+    def _meta(self):
+        return {"nprobe": self.nprobe}
+
+    def _arrays(self):
+        return {"vectors": self.vectors, "centroids": self.centroids, "offsets": self.offsets}
+
+    @classmethod
+    def _from_arrays(cls, arrays, ids, sources, meta):
+        return cls(arrays["vectors"], ids, sources, nprobe=meta.get("nprobe", 8),
+                   _centroids=np.asarray(arrays["centroids"]), _offsets=np.asarray(arrays["offsets"]))
+
+
+INDEX_TYPES = {cls.kind: cls for cls in (BruteForceIndex, IVFIndex)}
+
+
+def build_index(vectors, ids, sources=None, ivf_threshold=DEFAULT_IVF_THRESHOLD, **ivf_options):
+    """Exact index for small collections, IVF above `ivf_threshold` vectors."""
+    if len(ids) < ivf_threshold:
+        return BruteForceIndex(vectors, ids, sources)
+    return IVFIndex(vectors, ids, sources, **ivf_options)
+
+
+def save_index(vector_index, path, **meta):
+    """Writes the index as a directory of .npy arrays plus JSON metadata.
+
+    The snapshot is written to a temporary sibling directory and renamed over `path`, so files
+    that a `load_index(mmap=True)` (here or in another worker) still maps are never rewritten
+    in place: they are unlinked and stay readable until unmapped.
+    """
+    path = os.path.abspath(path)
+    parent, name = os.path.split(path)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f".{name}.", dir=parent)
+    try:
+        for array_name, array in vector_index._arrays().items():
+            np.save(os.path.join(tmp, f"{array_name}.npy"), array)
+        with open(os.path.join(tmp, "docs.json"), "w", encoding="utf-8") as f:
+            json.dump({"ids": vector_index.ids, "sources": vector_index.sources}, f, ensure_ascii=False)
+        meta = dict(meta, **vector_index._meta(), kind=vector_index.kind, count=len(vector_index),
+                    dimension=int(vector_index.vectors.shape[1]), saved_at=time.time())
+        # Written last: a directory without meta.json is an incomplete snapshot.
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        if os.path.isdir(path):
+            # A directory can only be renamed over an empty one, so move the old snapshot aside first.
+            old = f"{tmp}.old"
+            os.replace(path, old)
+            os.replace(tmp, path)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.replace(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_index(path, mmap=True):
+    """Loads a saved index; with `mmap=True` vectors are memory-mapped instead of read.
+
+    Raises ValueError if the files are not from one snapshot (read while it was replaced).
+    """
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(os.path.join(path, "docs.json"), encoding="utf-8") as f:
+        docs = json.load(f)
+    cls = INDEX_TYPES[meta["kind"]]
+    arrays = {
+        name[:-4]: np.load(os.path.join(path, name), mmap_mode="r" if mmap else None)
+        for name in os.listdir(path) if name.endswith(".npy")
+    }
+    if not meta["count"] == len(docs["ids"]) == len(arrays["vectors"]):
+        raise ValueError(f"Inconsistent index snapshot at {path}")
+    return cls._from_arrays(arrays, docs["ids"], docs["sources"], meta), meta
+
+
+class LocalKnnCache:
+    """Read-through local k-NN cache for one `knn_vector` field of an OpenSearch index."""
+
+    def __init__(self, client, index, vector_field, path=None, max_docs=200_000, ttl=300,
+                 source_fields=("text",), ivf_threshold=DEFAULT_IVF_THRESHOLD):
+        self.client = client
+        self.index = index
+        self.vector_field = vector_field
+        self.path = path
+        self.max_docs = max_docs
+        self.ttl = ttl
+        self.source_fields = list(source_fields)
+        self.ivf_threshold = ivf_threshold
+        self.local = None
+        self.version = None
+        self.loaded_at = 0.0
+        self.stats = {"local": 0, "remote": 0, "loads": 0}
+
+    def search(self, query_vector, k=10):
+        """Returns OpenSearch-style hits, answered locally whenever the collection fits."""
+        local = self._ensure_loaded()
+        if local is None:
+            self.stats["remote"] += 1
+            return self._remote_search(query_vector, k)
+        self.stats["local"] += 1
+        positions, distances = local.search(query_vector, k)
+        return [{
+            "_id": local.ids[p],
+            "_score": float(l2_score(d)),
+            "_source": local.sources[p] if local.sources is not None else {},
+        } for p, d in zip(positions[0], distances[0]) if p >= 0]
+
+    def invalidate(self):
+        """Drops the local copy (and snapshot) after the OpenSearch index was written to."""
+        self.local = None
+        self.version = None
+        self.loaded_at = 0.0
+        if self.path and os.path.exists(os.path.join(self.path, "meta.json")):
+            os.remove(os.path.join(self.path, "meta.json"))
+
+    # --- Internals ---
+
+    def _ensure_loaded(self):
+        if self.local is not None and time.time() - self.loaded_at < self.ttl:
+            return self.local
+        count = self.client.count(index=self.index)["count"]
+        if count > self.max_docs:
+            self.local = None
+            return None
+        version = self._version()
+        if self.local is not None and self.version == version:
+            self.loaded_at = time.time() # No writes since the pull; extend its lifetime
+            return self.local
+        if self.path and os.path.exists(os.path.join(self.path, "meta.json")):
+            try:
+                local, meta = load_index(self.path)
+            except (OSError, ValueError):
+                local, meta = None, {} # Replaced or removed while reading; pull instead
+            if meta.get("index") == self.index and meta.get("version") == version:
+                self.local, self.version, self.loaded_at = local, version, time.time()
+                return self.local
+        self.local = self._pull(count)
+        self.version = version
+        self.loaded_at = time.time()
+        self.stats["loads"] += 1
+        if self.path:
+            save_index(self.local, self.path, index=self.index, version=version)
+        return self.local
+
+    def _version(self):
+        """Change marker of the index: any index, update or delete since the last pull changes it.
+
+        The write counters move as soon as a write is acknowledged and the doc counts once it
+        is refreshed, so a pull that raced an unrefreshed write is replaced after the refresh.
+        A segment merge also changes `docs.deleted`, which only costs one extra pull.
+        """
+        stats = self.client.indices.stats(index=self.index, metric="docs,indexing")["_all"]["primaries"]
+        return [stats["docs"]["count"], stats["docs"]["deleted"],
+                stats["indexing"]["index_total"], stats["indexing"]["delete_total"]]
+
+    def _pull(self, count):
+        """Reads every document's vector and source fields from OpenSearch into a float32 matrix."""
+        ids, sources, vectors = [], [], None
+        hits = scan_index(self.client, self.index, source=self.source_fields + [self.vector_field])
+        for i, hit in enumerate(hits):
+            source = hit["_source"]
+            vector = source.pop(self.vector_field)
+            if vectors is None:
+                vectors = np.empty((max(count, 1), len(vector)), dtype=np.float32)
+            elif i == len(vectors): # Documents added since the count
+                vectors = np.resize(vectors, (2 * len(vectors), vectors.shape[1]))
+            vectors[i] = vector
+            ids.append(hit["_id"])
+            sources.append(source)
+        if vectors is None:
+            vectors = np.empty((0, 0), dtype=np.float32)
+        return build_index(vectors[:len(ids)], ids, sources, ivf_threshold=self.ivf_threshold)
+
+    def _remote_search(self, query_vector, k):
+        body = {
+            "size": k,
+            "_source": self.source_fields,
+            "query": {"knn": {self.vector_field: {"vector": list(map(float, query_vector)), "k": k}}},
+        }
+        return self.client.search(index=self.index, body=body)["hits"]["hits"]
@@ -1,26 +1,64 @@
-from opensearchpy import OpenSearch
-
-# Connect to OpenSearch
-client = OpenSearch(
-    hosts=[{'host': 'localhost', 'port': 9200}],
-    http_auth=None,  # No authentication
-    use_ssl=False,
-    verify_certs=False,
-    ssl_assert_hostname=False,
-    ssl_show_warn=False,
-)
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from opensearchpy.exceptions import NotFoundError
+
+from document_cache import DocumentCache
+from opensearch_client import lazy_client
+from opensearch_export import export_index, scan_index
+
+# Connect to OpenSearch (shared, pooled client; connects on first use)
+client = lazy_client()
+
+# Optional read-through document cache (see document_cache.py); DOCUMENT_CACHE_REDIS_URL adds
+# a Redis tier shared between processes.
+def _document_cache_from_env():
+    if os.getenv("DOCUMENT_CACHE", "false").lower() not in ("1", "true", "yes"):
+        return None
+    redis_client = None
+    if os.getenv("DOCUMENT_CACHE_REDIS_URL"):
+        import redis
+        redis_client = redis.Redis.from_url(os.environ["DOCUMENT_CACHE_REDIS_URL"])
+    return DocumentCache(
+        max_bytes=int(os.getenv("DOCUMENT_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+        ttl=float(os.getenv("DOCUMENT_CACHE_TTL", 60)),
+        redis_client=redis_client,
+    )
+
+document_cache = _document_cache_from_env()
 
 # 1. Create (Index a document)
 def create_document(index_name, doc_id, document):
     response = client.index(index=index_name, id=doc_id, body=document)
+    if document_cache:
+        document_cache.record_write(index_name, response['_id'], response['_seq_no'], response['_primary_term'],
+                                    source=document)
     print(f"Document created: {response['_id']}")
 
 # 2. Read (Get a document)
 def read_document(index_name, doc_id):
+    cached = document_cache.get(index_name, doc_id) if document_cache else None
+    if cached:
+        if not cached.found:
+            print(f"Document not found (cached): {doc_id}")
+            return None
+        print(f"Document found (cached): {cached.source}")
+        return cached.source
     try:
         response = client.get(index=index_name, id=doc_id)
+        if document_cache:
+            document_cache.put(index_name, doc_id, response['_source'], response['_seq_no'], response['_primary_term'])
         print(f"Document found: {response['_source']}")
         return response['_source']
+    except NotFoundError as e:
+        if document_cache:
+            document_cache.put(index_name, doc_id, None, found=False)
+        print(f"Error reading document: {e}")
+        return None
     except Exception as e:
         print(f"Error reading document: {e}")
         return None
@@ -28,16 +66,253 @@ def read_document(index_name, doc_id):
 # 3. Update (Update a document)
 def update_document(index_name, doc_id, partial_document):
     response = client.update(index=index_name, id=doc_id, body={"doc": partial_document})
+    if document_cache:
+        document_cache.record_write(index_name, doc_id, response['_seq_no'], response['_primary_term'])
     print(f"Document updated: {response['_id']}")
 
 # 4. Delete (Delete a document)
 def delete_document(index_name, doc_id):
     try:
         response = client.delete(index=index_name, id=doc_id)
+        if document_cache:
+            document_cache.record_write(index_name, doc_id, response['_seq_no'], response['_primary_term'], found=False)
         print(f"Document deleted: {response['_id']}")
     except Exception as e:
         print(f"Error deleting document: {e}")
 
+# --- Batch operations ---
+# The batch functions take any iterable (generators included), send it as `_bulk` / `_mget`
+# requests of at most `max_bytes` / `max_items`, keep up to `workers` requests in flight and
+# return one result per input item, in input order, instead of printing.
+
+BulkItemResult = namedtuple('BulkItemResult', 'id op ok status result error seq_no primary_term',
+                            defaults=(None, None))
+ReadResult = namedtuple('ReadResult', 'id found source')
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_MAX_ITEMS = 1000
+DEFAULT_WORKERS = 4
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+
+def _in_order(chunks, send, workers):
+    """Runs `send(chunk)` for each chunk on a bounded pool, yielding results in chunk order."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(send, chunk))
+            # Bounded read-ahead keeps memory constant for generator inputs.
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _chunk_actions(actions, max_bytes, max_items):
+    chunk, size = [], 0
+    for action in actions:
+        if chunk and (len(chunk) >= max_items or size + len(action[2]) > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(action)
+        size += len(action[2])
+    if chunk:
+        yield chunk
+
+
+def _send_bulk(chunk, refresh, max_retries):
+    """Sends one chunk of `(doc_id, op, ndjson)` actions, retrying items rejected with 429/5xx."""
+    results = [None] * len(chunk)
+    pending = list(range(len(chunk)))
+    for attempt in range(max_retries + 1):
+        body = ''.join(chunk[i][2] for i in pending)
+        try:
+            response = client.bulk(body=body, refresh=refresh)
+        except Exception as e:
+            if attempt < max_retries:
+                time.sleep(0.5 * 2 ** attempt)
+                continue
+            for i in pending:
+                results[i] = BulkItemResult(chunk[i][0], chunk[i][1], False, None, None, str(e))
+            break
+        retry = []
+        for i, item in zip(pending, response['items']):
+            op, outcome = next(iter(item.items()))
+            status = outcome.get('status', 500)
+            if status in RETRYABLE_STATUSES and attempt < max_retries:
+                retry.append(i)
+                continue
+            ok = status < 300 or (op == 'delete' and status == 404)
+            results[i] = BulkItemResult(outcome.get('_id', chunk[i][0]), op, ok, status,
+                                        outcome.get('result'), None if ok else outcome.get('error'),
+                                        outcome.get('_seq_no'), outcome.get('_primary_term'))
+        if not retry:
+            break
+        pending = retry
+        time.sleep(0.5 * 2 ** attempt)
+    return results
+
+
+def bulk_actions(actions, max_bytes=DEFAULT_MAX_BYTES, max_items=DEFAULT_MAX_ITEMS,
+                 workers=DEFAULT_WORKERS, refresh=False, max_retries=3):
+    """Streams `(doc_id, op, ndjson_lines)` actions through `_bulk`; yields `BulkItemResult`s."""
+    refresh = 'wait_for' if refresh else 'false'
+    chunks = _chunk_actions(actions, max_bytes, max_items)
+    return _in_order(chunks, lambda chunk: _send_bulk(chunk, refresh, max_retries), workers)
+
+
+def _action(op, index_name, doc_id, source=None):
+    meta = {'_index': index_name}
+    if doc_id is not None:
+        meta['_id'] = doc_id
+    line = json.dumps({op: meta}) + "\n"
+    if source is not None:
+        line += json.dumps(source) + "\n"
+    return doc_id, op, line
+
+
+def _record_bulk_writes(index_name, results):
+    """Drops written documents from the document cache (their new sources are not kept)."""
+    if document_cache:
+        for r in results:
+            if r.ok and r.seq_no is not None:
+                document_cache.record_write(index_name, r.id, r.seq_no, r.primary_term, found=r.op != 'delete')
+            elif r.id is not None:
+                document_cache.invalidate(index_name, r.id)
+    return results
+
+
+# 5. Create many (`documents`: iterable of (doc_id, document); doc_id None auto-generates)
+def create_documents(index_name, documents, overwrite=True, **options):
+    op = 'index' if overwrite else 'create'
+    results = bulk_actions((_action(op, index_name, doc_id, doc) for doc_id, doc in documents), **options)
+    return _record_bulk_writes(index_name, list(results))
+
+# 6. Read many via _mget; returns a ReadResult per id, in order
+def read_documents(index_name, doc_ids, source=None, max_items=DEFAULT_MAX_ITEMS, workers=DEFAULT_WORKERS):
+    def chunks():
+        chunk = []
+        for doc_id in doc_ids:
+            chunk.append(doc_id)
+            if len(chunk) >= max_items:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def send(chunk):
+        if not document_cache:
+            params = {'_source_includes': ','.join(source)} if source else {}
+            response = client.mget(index=index_name, body={'ids': chunk}, params=params)
+            return [ReadResult(doc['_id'], doc.get('found', False), doc.get('_source')) for doc in response['docs']]
+        # Whole documents are fetched and cached; `source` is applied to the results.
+        cached = document_cache.get_many(index_name, chunk)
+        missing = [doc_id for doc_id in dict.fromkeys(chunk) if doc_id not in cached]
+        if missing:
+            for doc in client.mget(index=index_name, body={'ids': missing})['docs']:
+                found = doc.get('found', False)
+                document_cache.put(index_name, doc['_id'], doc.get('_source'), doc.get('_seq_no'),
+                                   doc.get('_primary_term'), found=found)
+                cached[doc['_id']] = ReadResult(doc['_id'], found, doc.get('_source'))
+        results = []
+        for doc_id in chunk:
+            doc = cached[doc_id]
+            doc_source = doc.source
+            if source and doc_source is not None:
+                doc_source = {key: value for key, value in doc_source.items() if key in source}
+            results.append(ReadResult(doc_id, doc.found, doc_source))
+        return results
+
+    return list(_in_order(chunks(), send, workers))
+
+# 7. Update many (`updates`: iterable of (doc_id, partial_document))
+def update_documents(index_name, updates, upsert=False, **options):
+    results = bulk_actions((
+        _action('update', index_name, doc_id, {'doc': partial, 'doc_as_upsert': upsert})
+        for doc_id, partial in updates
+    ), **options)
+    return _record_bulk_writes(index_name, list(results))
+
+# 8. Delete many
+def delete_documents(index_name, doc_ids, **options):
+    results = bulk_actions((_action('delete', index_name, doc_id) for doc_id in doc_ids), **options)
+    return _record_bulk_writes(index_name, list(results))
+
+# 9. Update / delete everything matching a query, server-side (sliced across shards)
+TASK_POLL_INTERVAL = 1.0
+
+def _summary(response):
+    return {
+        'total': response.get('total', 0),
+        'updated': response.get('updated', 0),
+        'deleted': response.get('deleted', 0),
+        'version_conflicts': response.get('version_conflicts', 0),
+        'failures': response.get('failures', []),
+        'took_ms': response.get('took'),
+    }
+
+def wait_for_task(task_id, poll_interval=TASK_POLL_INTERVAL):
+    """Polls a by-query task started with `wait=False` until it completes; returns its summary."""
+    while True:
+        response = client.tasks.get(task_id=task_id)
+        if response.get('completed'):
+            return _summary(response.get('response', {}))
+        time.sleep(poll_interval)
+
+def _resume_cache_when_done(index_name, task_id):
+    try:
+        wait_for_task(task_id)
+    except Exception as e:
+        print(f"Error polling task {task_id}: {e}")
+    finally:
+        document_cache.resume_index(index_name)
+
+def _by_query(method, index_name, body, wait, slices, conflicts):
+    """With `wait=False` returns `{'task': id}` at once; `wait_for_task(id)` gives the result.
+
+    The document cache stops caching the index until the task completes, so reads made
+    while it runs cannot put old versions back.
+    """
+    if document_cache:
+        document_cache.pause_index(index_name)
+    try:
+        response = method(index=index_name, body=body, params={
+            'conflicts': conflicts,
+            'slices': slices,
+            'wait_for_completion': 'true' if wait else 'false',
+        })
+    except Exception:
+        if document_cache:
+            document_cache.resume_index(index_name)
+        raise
+    if not wait:
+        if document_cache:
+            threading.Thread(target=_resume_cache_when_done, args=(index_name, response['task']),
+                             daemon=True).start()
+        return {'task': response['task']}
+    if document_cache:
+        document_cache.resume_index(index_name)
+    return _summary(response)
+
+def update_by_query(index_name, query, script, wait=True, slices='auto', conflicts='proceed'):
+    """`script` is a painless source string or a full script object."""
+    if isinstance(script, str):
+        script = {'source': script, 'lang': 'painless'}
+    return _by_query(client.update_by_query, index_name, {'query': query, 'script': script},
+                     wait, slices, conflicts)
+
+def delete_by_query(index_name, query, wait=True, slices='auto', conflicts='proceed'):
+    return _by_query(client.delete_by_query, index_name, {'query': query}, wait, slices, conflicts)
+
+# 10. Read a whole index as a stream (point in time + search_after, scroll fallback; see opensearch_export.py)
+def iter_documents(index_name, query=None, source=None, slices=1, **options):
+    return scan_index(client, index_name, query=query, source=source, slices=slices, **options)
+
+# 11. Export a whole index to .ndjson / .parquet; returns the number of documents written
+def export_documents(index_name, path, query=None, source=None, slices=1, **options):
+    return export_index(client, index_name, path, query=query, source=source, slices=slices, **options)
+
+
 # --- Example Usage ---
 if __name__ == "__main__":
     INDEX_NAME = "my-test-index"
@@ -74,3 +349,24 @@ if __name__ == "__main__":
     # Try to read again
     print("\n--- Reading document after delete ---")
     read_document(INDEX_NAME, DOC_ID)
+
+    # Batch versions
+    print("\n--- Batch create / read / update / delete ---")
+    books = ((str(i), {'title': f'Book {i}', 'year': 1900 + i}) for i in range(1000))
+    results = create_documents(INDEX_NAME, books, refresh=True)
+    print(f"Created {sum(r.ok for r in results)}/{len(results)} documents")
+    found = read_documents(INDEX_NAME, ['1', '2', 'missing'], source=['title'])
+    print(f"Read: {[(r.id, r.found, r.source) for r in found]}")
+    results = update_documents(INDEX_NAME, ((str(i), {'year': 2000 + i}) for i in range(10)))
+    print(f"Updated {sum(r.ok for r in results)} documents")
+    print(f"Update by query: {update_by_query(INDEX_NAME, {'range': {'year': {'lt': 1950}}}, 'ctx._source.old = true')}")
+    client.indices.refresh(index=INDEX_NAME)
+    old_titles = sum(1 for _ in iter_documents(INDEX_NAME, {'term': {'old': True}}, source=['title'], slices=2))
+    print(f"Streamed {old_titles} old titles")
+    print(f"Exported {export_documents(INDEX_NAME, 'my-test-index.ndjson')} documents to my-test-index.ndjson")
+    results = delete_documents(INDEX_NAME, (str(i) for i in range(500)))
+    print(f"Deleted {sum(r.ok for r in results)} documents")
+    print(f"Delete by query: {delete_by_query(INDEX_NAME, {'match_all': {}})}")
+
+    if document_cache:
+        print(f"\nDocument cache: {document_cache.stats}, hit rate {document_cache.hit_rate():.0%}")
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""
+Streams every document of an index, in constant memory.
+
+`scan_index()` is a generator over hits. It opens a point in time (PIT, OpenSearch >= 2.4)
+and pages through it with `search_after`, so the export sees one consistent snapshot and
+holds no server-side scroll context per page; on clusters without PIT it falls back to a
+scroll. `slices=N` splits the read into N sliced searches run by N threads; pages are
+handed over through a bounded queue, so at most about `2 * N` pages are held in memory
+whatever the index size. `source` limits the `_source` fields that are fetched.
+
+`export_index()` writes the hits to NDJSON (`{"_id": ..., "_source": {...}}` per line) or,
+with pyarrow installed, Parquet (one row group per `batch_size` documents, an `_id` column
+plus one column per top-level source field, inferred from the first row group unless a
+schema is passed). `iter_batches()` groups hits into lists for batch work such as
+re-embedding.
+
+PIT pages are sorted on `sort` (default `_id`, which is unique; pass a unique keyword
+field instead on very large indices to avoid loading `_id` fielddata). The order across
+slices is not defined.
+"""
+
+import itertools
+import json
+import queue
+import threading
+
+from opensearchpy.exceptions import NotFoundError, RequestError, TransportError
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_KEEP_ALIVE = "2m"
+DEFAULT_SORT = [{"_id": "asc"}]
+EXPORT_FORMATS = ("ndjson", "parquet")
+_DONE = object()
+
+
+def _body(query, source, size, slice_id, slices):
+    body = {"size": size, "query": query or {"match_all": {}}}
+    if source is not None:
+        body["_source"] = list(source)
+    if slices > 1:
+        body["slice"] = {"id": slice_id, "max": slices}
+    return body
+
+
+def _open_pit(client, index, keep_alive):
+    """Returns a PIT id, or None if the cluster has no point-in-time API."""
+    try:
+        return client.create_pit(index=index, params={"keep_alive": keep_alive})["pit_id"]
+    except (NotFoundError, RequestError):
+        return None
+    except TransportError as e:
+        if e.status_code in (400, 404, 405):
+            return None
+        raise
+
+
+def _pit_pages(client, pit_id, body, keep_alive, sort, stop):
+    body = dict(body, pit={"id": pit_id, "keep_alive": keep_alive}, sort=sort)
+    while not stop.is_set():
+        response = client.search(body=body)
+        hits = response["hits"]["hits"]
+        if not hits:
+            return
+        yield hits
+        if len(hits) < body["size"]:
+            return
+        body["pit"]["id"] = response.get("pit_id", body["pit"]["id"])
+        body["search_after"] = hits[-1]["sort"]
+
+
+def _scroll_pages(client, index, body, keep_alive, stop):
+    response = client.search(index=index, body=dict(body, sort=["_doc"]), scroll=keep_alive)
+    scroll_id = response.get("_scroll_id")
+    try:
+        while response["hits"]["hits"] and not stop.is_set():
+            yield response["hits"]["hits"]
+            response = client.scroll(scroll_id=scroll_id, scroll=keep_alive)
+            scroll_id = response.get("_scroll_id", scroll_id)
+    finally:
+        if scroll_id:
+            client.clear_scroll(scroll_id=scroll_id)
+
+
+def scan_index(client, index, query=None, source=None, size=DEFAULT_PAGE_SIZE, slices=1,
+               keep_alive=DEFAULT_KEEP_ALIVE, sort=None, use_pit=True):
+    """Yields every hit (`_id`, `_source`, ...) matching `query`; see the module docstring."""
+    pit_id = _open_pit(client, index, keep_alive) if use_pit else None
+    stop = threading.Event()
+
+    def pages(slice_id):
+        body = _body(query, source, size, slice_id, slices)
+        if pit_id:
+            return _pit_pages(client, pit_id, body, keep_alive, sort or DEFAULT_SORT, stop)
+        return _scroll_pages(client, index, body, keep_alive, stop)
+
+    try:
+        if slices <= 1:
+            for hits in pages(0):
+                yield from hits
+            return
+
+        pending = queue.Queue(maxsize=2 * slices)
+
+        def read_slice(slice_id):
+            try:
+                for hits in pages(slice_id):
+                    while not stop.is_set():
+                        try:
+                            pending.put(hits, timeout=0.1)
+                            break
+                        except queue.Full:
+                            pass
+            except Exception as e:
+                pending.put(e)
+            finally:
+                pending.put(_DONE)
+
+        threads = [threading.Thread(target=read_slice, args=(i,), daemon=True) for i in range(slices)]
+        for thread in threads:
+            thread.start()
+        running = slices
+        while running:
+            item = pending.get()
+            if item is _DONE:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield from item
+    finally:
+        # Also runs when the caller stops iterating early.
+        stop.set()
+        if slices > 1:
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    pending.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        if pit_id:
+            client.delete_pit(body={"pit_id": [pit_id]})
+
+
+def iter_batches(hits, batch_size):
+    """Groups an iterable of hits into lists of at most `batch_size`."""
+    hits = iter(hits)
+    while batch := list(itertools.islice(hits, batch_size)):
+        yield batch
+
+
+def write_ndjson(hits, path):
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for hit in hits:
+            f.write(json.dumps({"_id": hit["_id"], "_source": hit.get("_source", {})}, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def write_parquet(hits, path, batch_size=DEFAULT_PAGE_SIZE, schema=None):
+    """Writes one row group per `batch_size` hits; returns the number of documents.
+
+    Without `schema` the columns are inferred from the first row group. A later document with
+    a field outside the schema, or a value the column type cannot hold, raises ValueError
+    instead of being dropped; pass a `pyarrow.Schema` covering every field (with `_id`) for
+    indexes whose documents vary, or export to NDJSON.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from None
+
+    count, writer = 0, None
+    try:
+        for batch in iter_batches(hits, batch_size):
+            rows = [dict(hit.get("_source", {}), _id=hit["_id"]) for hit in batch]
+            if writer is None:
+                schema = schema or pa.Table.from_pylist(rows).schema
+                writer = pq.ParquetWriter(path, schema)
+            unseen = set().union(*rows).difference(schema.names)
+            if unseen:
+                raise ValueError(f"Documents {count}-{count + len(rows) - 1} have fields {sorted(unseen)} "
+                                 f"that are not in the Parquet schema; pass schema= or export to NDJSON")
+            try:
+                table = pa.Table.from_pylist(rows, schema=schema)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise ValueError(f"Documents {count}-{count + len(rows) - 1} do not fit the Parquet "
+                                 f"schema: {e}") from e
+            writer.write_table(table)
+            count += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def export_index(client, index, path, format=None, batch_size=DEFAULT_PAGE_SIZE, schema=None, **scan_options):
+    """Writes every matching document of `index` to `path`; returns the number of documents.
+
+    `format` is "ndjson" or "parquet" (default: from the file extension); `schema` is the
+    optional Parquet schema (see `write_parquet()`). `scan_options` go to `scan_index()`
+    (query, source, slices, ...).
+    """
+    format = format or ("parquet" if str(path).endswith(".parquet") else "ndjson")
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{format}', expected one of {EXPORT_FORMATS}")
+    hits = scan_index(client, index, size=batch_size, **scan_options)
+    if format == "parquet":
+        return write_parquet(hits, path, batch_size, schema)
+    return write_ndjson(hits, path)
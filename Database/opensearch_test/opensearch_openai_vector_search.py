@@ -10,6 +10,14 @@ It requires the following libraries:
 
 You can install them using: pip install opensearch-py openai python-dotenv
 
+Document embeddings are generated in batches with `batch_embeddings.embed_texts`
+(several texts per request, several requests in flight); tune with the
+EMBEDDING_BATCH_SIZE / EMBEDDING_CONCURRENCY environment variables. All embeddings
+go through the on-disk cache in `embedding_cache.py`, so unchanged documents and
+repeated queries never hit the API twice. Documents are written with one `_bulk`
+request; VECTOR_ENCODING=fp16|byte stores the vectors in a compact encoding (see
+`vector_quantization.py`).
+
 Setup:
 1. Make sure your OpenSearch instance is running (e.g., via docker-compose).
 2. Create a file named .env in the same directory as this script.
@@ -18,10 +26,14 @@ Setup:
 """
 
 import os
-import time
 from dotenv import load_dotenv
 from openai import OpenAI
-from opensearchpy import OpenSearch
+
+from batch_embeddings import embed_texts
+from bulk_vectors import build_bulk_body, check_bulk_response
+from embedding_cache import EmbeddingCache
+from opensearch_client import lazy_client
+from vector_quantization import knn_vector_mapping, to_index_vectors
 
 # --- 1. Configuration ---
 
@@ -31,17 +43,19 @@ load_dotenv()
 QWEN_API_KEY = os.getenv("QWEN_API_KEY")
 QWEN_BASE_URL = os.getenv("QWEN_BASE_URL")
 QWEN_EMBEDDING_MODEL_NAME = os.getenv("QWEN_EMBEDDING_MODEL_NAME")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 10))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+# knn_vector encoding: "float" (nmslib, float32), "fp16" (faiss SQ) or "byte" (lucene, int8)
+VECTOR_ENCODING = os.getenv("VECTOR_ENCODING", "float")
+
+embedding_cache = EmbeddingCache(
+    os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"),
+    max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 100_000)),
+)
 
 client_openai = OpenAI(base_url=QWEN_BASE_URL, api_key=QWEN_API_KEY)
-# Connect to OpenSearch
-client_opensearch = OpenSearch(
-    hosts=[{'host': 'localhost', 'port': 9200}],
-    http_auth=None,  # No authentication
-    use_ssl=False,
-    verify_certs=False,
-    ssl_assert_hostname=False,
-    ssl_show_warn=False,
-)
+# Connect to OpenSearch (shared, pooled client; connects on first use)
+client_opensearch = lazy_client()
 
 
 # Dimension of vectors produced by text-embedding-3-small
@@ -53,11 +67,24 @@ INDEX_NAME = "my-openai-vector-index"
 # --- 2. OpenAI Embedding Function ---
 
 def get_openai_embedding(text):
-    """Generates a vector embedding for the given text using OpenAI's API."""
-    # OpenAI recommends replacing newlines with spaces for better performance
-    text = text.replace("\n", " ")
-    response = client_openai.embeddings.create(input=[text], model=QWEN_EMBEDDING_MODEL_NAME)
-    return response.data[0].embedding
+    """Generates a vector embedding for the given text using OpenAI's API (cached)."""
+    def compute(missing):
+        # OpenAI recommends replacing newlines with spaces for better performance
+        text = missing[0].replace("\n", " ")
+        response = client_openai.embeddings.create(input=[text], model=QWEN_EMBEDDING_MODEL_NAME)
+        return [response.data[0].embedding]
+
+    return embedding_cache.get_or_compute(QWEN_EMBEDDING_MODEL_NAME, [text], compute)[0]
+
+
+def get_openai_embeddings(texts):
+    """Generates embeddings for many texts at once, in input order; only cache misses are sent."""
+    return embedding_cache.get_or_compute(QWEN_EMBEDDING_MODEL_NAME, texts, lambda missing: embed_texts(
+        missing,
+        model=QWEN_EMBEDDING_MODEL_NAME,
+        max_batch_items=EMBEDDING_BATCH_SIZE,
+        concurrency=EMBEDDING_CONCURRENCY,
+    ))
 
 
 # --- 3. Index Setup ---
@@ -78,19 +105,8 @@ def create_index_with_vector_mapping():
         "mappings": {
             "properties": {
                 "text": {"type": "text"},
-                "text_vector": {
-                    "type": "knn_vector",
-                    "dimension": VECTOR_DIMENSION, # Crucial: Must match the model's output dimension
-                    "method": {
-                        "name": "hnsw",
-                        "space_type": "l2",
-                        "engine": "nmslib",
-                        "parameters": {
-                            "ef_construction": 128,
-                            "m": 24
-                        }
-                    }
-                }
+                # Crucial: the dimension must match the model's output dimension
+                "text_vector": knn_vector_mapping(VECTOR_DIMENSION, VECTOR_ENCODING)
             }
         }
     }
@@ -111,19 +127,13 @@ def index_documents():
         {"text": "I'm planning a trip to Italy to enjoy the local cuisine."}
     ]
 
-    for i, doc in enumerate(documents):
-        print(f"Generating embedding for document {i+1}...")
-        vector = get_openai_embedding(doc["text"])
-        
-        doc_body = {
-            "text": doc["text"],
-            "text_vector": vector # The embedding is already a list
-        }
-        
-        client_opensearch.index(index=INDEX_NAME, body=doc_body, id=i+1, refresh=True)
-        print(f"Indexed document {i+1}")
+    print(f"Generating embeddings for {len(documents)} documents...")
+    texts = [doc["text"] for doc in documents]
+    vectors = to_index_vectors(get_openai_embeddings(texts), VECTOR_ENCODING)
 
-    time.sleep(2)
+    body = build_bulk_body(INDEX_NAME, range(1, len(texts) + 1), texts, vectors)
+    check_bulk_response(client_opensearch.bulk(body=body, refresh=True))
+    print(f"Indexed {len(texts)} documents")
 
 
 # --- 5. Vector Search ---
@@ -132,7 +142,7 @@ def search_with_vector(query_text, k=3):
     """Performs a k-NN search for the most similar documents using an OpenAI embedding."""
     print(f"\n--- Performing k-NN search for: '{query_text}' ---")
     
-    query_vector = get_openai_embedding(query_text)
+    query_vector = to_index_vectors(get_openai_embedding(query_text), VECTOR_ENCODING)[0].tolist()
     
     search_query = {
         "size": k,
@@ -164,6 +174,8 @@ if __name__ == "__main__":
     # Perform another vector search
     search_with_vector("sunny weather activities")
 
+    print(f"\nEmbedding cache: {embedding_cache.stats}, hit rate {embedding_cache.hit_rate():.0%}")
+
     # Clean up the index (optional)
     # client_opensearch.indices.delete(index=INDEX_NAME)
     # print(f"\nIndex '{INDEX_NAME}' deleted.")
@@ -8,32 +8,117 @@ It requires the following libraries:
 - sentence-transformers
 
 You can install them using: pip install opensearch-py sentence-transformers
+
+Embeddings are cached on disk (see `embedding_cache.py`), so re-running the script or
+repeating a query skips the model; the model itself is only loaded on a cache miss.
+Documents are encoded in batches and written with `_bulk` (see `bulk_vectors.py`);
+tune with ENCODE_BATCH_SIZE / BULK_BATCH_SIZE / NORMALIZE_EMBEDDINGS.
+VECTOR_ENCODING=fp16|byte switches the index to a compact vector encoding
+(see `vector_quantization.py`). With LOCAL_KNN_CACHE=true, `search_with_vector()` answers
+from an in-process copy of the vectors (see `local_vector_index.py`) instead of a round
+trip per query. `hybrid_search()` runs BM25 and k-NN queries concurrently and fuses them
+with reciprocal rank fusion (see `hybrid_search.py`). `reembed_documents()` re-encodes a
+whole index page by page (see `opensearch_export.py`), e.g. after changing the model.
 """
 
-import time
-from opensearchpy import OpenSearch
+import os
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from bulk_vectors import build_bulk_body, check_bulk_response
+from embedding_cache import EmbeddingCache
+from hybrid_search import HybridSearcher
+from local_vector_index import LocalKnnCache
+from opensearch_client import lazy_client
+from opensearch_export import iter_batches, scan_index
+from vector_quantization import knn_vector_mapping, to_index_vectors
+
 # --- 1. Configuration ---
 
-# Connect to OpenSearch
-client = OpenSearch(
-    hosts=[{'host': 'localhost', 'port': 9200}],
-    http_auth=None,  # No authentication as per docker-compose.yml
-    use_ssl=False,
-    verify_certs=False,
-    ssl_assert_hostname=False,
-    ssl_show_warn=False,
-)
+# Connect to OpenSearch (shared, pooled client; connects on first use)
+client = lazy_client()
 
-# Load a pre-trained sentence transformer model
+# Pre-trained sentence transformer model
 # all-MiniLM-L6-v2 is a fast and solid model for semantic search.
-model = SentenceTransformer('all-MiniLM-L6-v2')
+MODEL_NAME = 'all-MiniLM-L6-v2'
 # The dimension of the vectors produced by this model is 384
 VECTOR_DIMENSION = 384
 
 INDEX_NAME = "my-vector-test-index"
 
+# Encoding batch size, and whether to L2-normalize vectors (then l2 distance ranks like cosine)
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", 64))
+NORMALIZE_EMBEDDINGS = os.getenv("NORMALIZE_EMBEDDINGS", "false").lower() in ("1", "true", "yes")
+# knn_vector encoding: "float" (nmslib, float32), "fp16" (faiss SQ) or "byte" (lucene, int8)
+VECTOR_ENCODING = os.getenv("VECTOR_ENCODING", "float")
+# Documents per _bulk request when indexing
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 256))
+
+embedding_cache = EmbeddingCache(
+    os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"),
+    max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 100_000)),
+)
+# Serve k-NN queries from a local copy of the index (snapshot kept under LOCAL_KNN_PATH)
+LOCAL_KNN_CACHE = os.getenv("LOCAL_KNN_CACHE", "false").lower() in ("1", "true", "yes")
+local_knn = LocalKnnCache(
+    client, INDEX_NAME, "text_vector",
+    path=os.getenv("LOCAL_KNN_PATH", "local_knn_snapshot"),
+    max_docs=int(os.getenv("LOCAL_KNN_MAX_DOCS", 200_000)),
+) if LOCAL_KNN_CACHE else None
+
+# BM25 + k-NN rank fusion; knn.filter needs the faiss / lucene engines, nmslib filters exactly
+hybrid_searcher = HybridSearcher(
+    client, INDEX_NAME, lambda text: embed_query(text),
+    filter_mode="exact" if VECTOR_ENCODING == "float" else "efficient",
+)
+
+# Normalized and raw vectors differ, so they are cached under different keys.
+CACHE_MODEL_KEY = f"{MODEL_NAME}:normalized" if NORMALIZE_EMBEDDINGS else MODEL_NAME
+_model = None
+
+
+def get_model():
+    """Loads the sentence transformer on first use."""
+    global _model
+    if _model is None:
+        _model = SentenceTransformer(MODEL_NAME)
+    return _model
+
+
+def encode_batch(texts, batch_size=ENCODE_BATCH_SIZE):
+    """Returns a float32 matrix with one embedding row per text, encoding only cache misses.
+
+    Misses go through the model in one `encode()` call so it can batch them.
+    """
+    matrix = np.empty((len(texts), VECTOR_DIMENSION), dtype=np.float32)
+    missing = []
+    for i, vector in enumerate(embedding_cache.get_many(CACHE_MODEL_KEY, texts)):
+        if vector is None:
+            missing.append(i)
+        else:
+            matrix[i] = vector
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        encoded = get_model().encode(
+            missing_texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=NORMALIZE_EMBEDDINGS,
+        )
+        matrix[missing] = encoded
+        embedding_cache.put_many(CACHE_MODEL_KEY, missing_texts, matrix[missing])
+    return matrix
+
+
+def embed(texts):
+    """Returns embeddings (lists of floats) for texts, encoding only cache misses."""
+    return encode_batch(texts).tolist()
+
+
+def embed_query(text):
+    """Query vector in the index's encoding (byte indexes need int8 queries too)."""
+    return to_index_vectors(encode_batch([text]), VECTOR_ENCODING)[0].tolist()
+
 
 # --- 2. Index Setup ---
 
@@ -53,28 +138,58 @@ def create_index_with_vector_mapping():
         "mappings": {
             "properties": {
                 "text": {"type": "text"}, # Standard text field
-                "text_vector": { # Vector field for k-NN search
-                    "type": "knn_vector",
-                    "dimension": VECTOR_DIMENSION,
-                    "method": {
-                        "name": "hnsw",
-                        "space_type": "l2",
-                        "engine": "nmslib",
-                        "parameters": {
-                            "ef_construction": 128,
-                            "m": 24
-                        }
-                    }
-                }
+                # Vector field for k-NN search (hnsw / l2; engine depends on VECTOR_ENCODING)
+                "text_vector": knn_vector_mapping(VECTOR_DIMENSION, VECTOR_ENCODING)
             }
         }
     }
     client.indices.create(index=INDEX_NAME, body=settings)
+    if local_knn:
+        local_knn.invalidate()
     print(f"Index '{INDEX_NAME}' created successfully.")
 
 
 # --- 3. Indexing Documents ---
 
+def bulk_index_documents(texts, ids=None, batch_size=BULK_BATCH_SIZE):
+    """Encodes texts batch by batch and writes each batch with one `_bulk` request.
+
+    Vectors go from the float32 matrix straight into the request body. The index is
+    refreshed once at the end instead of after every document.
+    """
+    ids = list(ids) if ids is not None else list(range(1, len(texts) + 1))
+    for start in range(0, len(texts), batch_size):
+        batch_texts = texts[start:start + batch_size]
+        matrix = to_index_vectors(encode_batch(batch_texts), VECTOR_ENCODING)
+        body = build_bulk_body(INDEX_NAME, ids[start:start + batch_size], batch_texts, matrix)
+        check_bulk_response(client.bulk(body=body))
+        print(f"Indexed documents {start + 1}-{start + len(batch_texts)}")
+    client.indices.refresh(index=INDEX_NAME)
+    if local_knn:
+        local_knn.invalidate()
+
+
+def reembed_documents(source_index=INDEX_NAME, target_index=INDEX_NAME, slices=2, batch_size=BULK_BATCH_SIZE):
+    """Re-encodes the text of every document in `source_index` and writes it to `target_index`.
+
+    Documents are streamed from a point in time, so only a few pages are in memory at once
+    and documents written to `target_index` meanwhile are not read back.
+    """
+    count = 0
+    hits = scan_index(client, source_index, source=["text"], slices=slices, size=batch_size)
+    for batch in iter_batches(hits, batch_size):
+        texts = [hit["_source"]["text"] for hit in batch]
+        matrix = to_index_vectors(encode_batch(texts), VECTOR_ENCODING)
+        body = build_bulk_body(target_index, [hit["_id"] for hit in batch], texts, matrix)
+        check_bulk_response(client.bulk(body=body))
+        count += len(batch)
+        print(f"Re-embedded {count} documents")
+    client.indices.refresh(index=target_index)
+    if local_knn and target_index == INDEX_NAME:
+        local_knn.invalidate()
+    return count
+
+
 def index_documents():
     """Generates vector embeddings for sample documents and indexes them."""
     documents = [
@@ -86,22 +201,8 @@ def index_documents():
         {"text": "I'm planning a trip to Italy to enjoy the local cuisine."}
     ]
 
-    for i, doc in enumerate(documents):
-        # Generate the vector embedding for the text
-        vector = model.encode(doc["text"])
-        
-        # Create the document body for indexing
-        doc_body = {
-            "text": doc["text"],
-            "text_vector": vector.tolist() # Convert numpy array to list
-        }
-        
-        # Index the document
-        client.index(index=INDEX_NAME, body=doc_body, id=i+1, refresh=True)
-        print(f"Indexed document {i+1}")
-
-    # Give OpenSearch some time to make the documents searchable
-    time.sleep(2)
+    # Encode in batches (cached texts are not re-encoded) and index with _bulk
+    bulk_index_documents([doc["text"] for doc in documents])
 
 
 # --- 4. Vector Search ---
@@ -111,8 +212,14 @@ def search_with_vector(query_text, k=3):
     print(f"\n--- Performing k-NN search for: '{query_text}' ---")
     
     # Generate the vector for the query text
-    query_vector = model.encode(query_text).tolist()
-    
+    query_vector = embed_query(query_text)
+
+    if local_knn:
+        print("Search Results (local):")
+        for hit in local_knn.search(query_vector, k):
+            print(f"  - Score: {hit['_score']:.4f}, Text: {hit['_source']['text']}")
+        return
+
     search_query = {
         "size": k,
         "query": {
@@ -132,44 +239,25 @@ def search_with_vector(query_text, k=3):
         print(f"  - Score: {hit['_score']:.4f}, Text: {hit['_source']['text']}")
 
 
-def hybrid_search(query_text, filter_keyword, k=2):
-    """Performs a hybrid search combining k-NN and a boolean filter."""
-    print(f"\n--- Performing Hybrid search for: '{query_text}' with filter '{filter_keyword}' ---")
+def hybrid_search(query_text, filter_keyword=None, k=2, method="rrf"):
+    """Performs a hybrid search: BM25 and k-NN legs run concurrently and are rank-fused.
 
-    query_vector = model.encode(query_text).tolist()
-
-    search_query = {
-        "size": k,
-        "query": {
-            "bool": {
-                "must": [
-                    {
-                        "match": {
-                            "text": filter_keyword
-                        }
-                    }
-                ],
-                "should": [
-                    {
-                        "knn": {
-                            "text_vector": {
-                                "vector": query_vector,
-                                "k": k
-                            }
-                        }
-                    }
-                ]
-            }
-        }
-    }
+    `filter_keyword` restricts both legs to documents whose text matches it.
+    """
+    print(f"\n--- Performing Hybrid search for: '{query_text}' with filter '{filter_keyword}' ---")
 
-    response = client.search(index=INDEX_NAME, body=search_query)
+    hits = hybrid_searcher.search(
+        query_text,
+        k=k,
+        filter={"match": {"text": filter_keyword}} if filter_keyword else None,
+        method=method,
+    )
 
     print("Search Results:")
-    if not response["hits"]["hits"]:
+    if not hits:
         print("  No documents found.")
-    for hit in response["hits"]["hits"]:
-        print(f"  - Score: {hit['_score']:.4f}, Text: {hit['_source']['text']}")
+    for hit in hits:
+        print(f"  - Score: {hit['_score']:.4f}, Ranks: {hit['ranks']}, Text: {hit['_source']['text']}")
 
 
 # --- 5. Main Execution ---
@@ -189,6 +277,8 @@ if __name__ == "__main__":
     # Perform a hybrid search (combining vector and keyword)
     hybrid_search("places to eat", filter_keyword="italy") # 查询 “吃饭的地方”，并筛选包含 “italy” 的结果
 
+    print(f"\nEmbedding cache: {embedding_cache.stats}, hit rate {embedding_cache.hit_rate():.0%}")
+
     # Clean up the index
     # client.indices.delete(index=INDEX_NAME)
     # print(f"\nIndex '{INDEX_NAME}' deleted.")
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for batch_embeddings against an in-process fake of `client.embeddings.create`.
+
+Run with:
+    python -m pytest tests
+"""
+
+import asyncio
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_embeddings import embed_texts, make_batches
+
+
+def fake_vector(text):
+    return [float(len(text)), float(sum(map(ord, text)) % 997)]
+
+
+def rate_limit_error():
+    response = SimpleNamespace(status_code=429, headers={'retry-after': '0'}, request=None)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+class FakeEmbeddings:
+    """Answers in shuffled order after a random delay; `fail(text)` returns how many times to fail first."""
+
+    def __init__(self, fail=None, error=rate_limit_error):
+        self.fail = fail or (lambda text: 0)
+        self.error = error
+        self.calls = []
+        self.failures = {}
+
+    async def create(self, input, model, encoding_format):
+        self.calls.append(list(input))
+        await asyncio.sleep(random.random() / 1000)
+        key = tuple(input)
+        if any(self.failures.get(key, 0) < self.fail(text) for text in input):
+            self.failures[key] = self.failures.get(key, 0) + 1
+            raise self.error()
+        data = [SimpleNamespace(index=i, embedding=fake_vector(text)) for i, text in enumerate(input)]
+        random.shuffle(data)
+        return SimpleNamespace(data=data)
+
+
+def embed(texts, backend, **kwargs):
+    kwargs.setdefault('base_delay', 0)
+    return embed_texts(texts, model="fake", client=SimpleNamespace(embeddings=backend), **kwargs)
+
+
+def test_make_batches_respects_items_and_tokens():
+    texts = [f"text {i}" for i in range(23)]
+    batches = make_batches(texts, max_batch_items=5)
+    assert [start for start, _ in batches] == [0, 5, 10, 15, 20]
+    assert [text for _, batch in batches for text in batch] == texts
+
+    long = ["x" * 400] * 4  # ~101 estimated tokens each
+    assert [len(batch) for _, batch in make_batches(long, max_batch_items=10, max_batch_tokens=250)] == [2, 2]
+    # A single text over the token budget still gets a batch of its own.
+    assert [len(batch) for _, batch in make_batches(["x" * 4000], max_batch_tokens=10)] == [1]
+
+
+@pytest.mark.parametrize("items,tokens,concurrency", [(1, 8000, 1), (5, 8000, 3), (10, 30, 4), (7, 8000, 8)])
+def test_results_follow_input_order_across_batches(items, tokens, concurrency):
+    texts = [f"document {i} " + "word " * (i % 7) for i in range(53)]
+    backend = FakeEmbeddings()
+    vectors = embed(texts, backend, max_batch_items=items, max_batch_tokens=tokens, concurrency=concurrency)
+    assert vectors == [fake_vector(text) for text in texts]
+    assert sorted(text for call in backend.calls for text in call) == sorted(texts)
+    assert all(len(call) <= items for call in backend.calls)
+
+
+def test_newlines_are_replaced_before_sending():
+    backend = FakeEmbeddings()
+    assert embed(["a\nb"], backend) == [fake_vector("a b")]
+    assert backend.calls == [["a b"]]
+
+
+def test_failed_batches_are_retried_and_keep_their_positions():
+    texts = [f"text {i}" for i in range(30)]
+    failing = {"text 3": 2, "text 17": 1, "text 29": 3}
+    backend = FakeEmbeddings(fail=lambda text: failing.get(text, 0))
+    vectors = embed(texts, backend, max_batch_items=4, concurrency=4, max_retries=3)
+    assert vectors == [fake_vector(text) for text in texts]
+    assert len(backend.calls) == len(make_batches(texts, max_batch_items=4)) + sum(failing.values())
+
+
+def test_connection_errors_are_retried():
+    errors = iter([openai.APIConnectionError(request=None)])
+    backend = FakeEmbeddings(fail=lambda text: 1, error=lambda: next(errors))
+    assert embed(["a", "b"], backend) == [fake_vector("a"), fake_vector("b")]
+    assert len(backend.calls) == 2
+
+
+def test_gives_up_after_max_retries():
+    backend = FakeEmbeddings(fail=lambda text: 10 if text == "bad" else 0)
+    with pytest.raises(openai.RateLimitError):
+        embed(["ok", "bad"], backend, max_batch_items=1, max_retries=2)
+    assert backend.calls.count(["bad"]) == 3
+
+
+def test_non_retryable_errors_are_raised_immediately():
+    backend = FakeEmbeddings(fail=lambda text: 1, error=lambda: ValueError("bad request"))
+    with pytest.raises(ValueError):
+        embed(["a"], backend, max_retries=5)
+    assert len(backend.calls) == 1
+
+
+def test_empty_input():
+    backend = FakeEmbeddings()
+    assert embed([], backend) == []
+    assert backend.calls == []
+
+
+def test_empty_strings_and_duplicates_keep_one_vector_per_input():
+    texts = ["a", "", "b", "a", "", "a", "c", "b"]
+    backend = FakeEmbeddings()
+    vectors = embed(texts, backend, max_batch_items=3, concurrency=2)
+    assert vectors == [fake_vector(text) for text in texts]
+    assert len(vectors) == len(texts)
+    assert sum(len(call) for call in backend.calls) == len(texts)
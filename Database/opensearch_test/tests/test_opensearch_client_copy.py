@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+"""The pdf_search_app backend ships a copy of opensearch_client.py; keep the two identical."""
+
+import os
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(HERE)))
+
+
+def test_opensearch_client_copies_match():
+    paths = [os.path.join(REPO, "Database", "opensearch_test", "opensearch_client.py"),
+             os.path.join(REPO, "Fullstack", "pdf_search_app", "backend", "opensearch_client.py")]
+    original, copy = (open(path, "rb").read() for path in paths)
+    assert original == copy, "opensearch_client.py copies differ; apply the change to both"
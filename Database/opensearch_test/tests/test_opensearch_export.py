@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the Parquet writer of opensearch_export (skipped without pyarrow).
+
+Run with:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from opensearch_export import write_parquet
+
+
+def hits(sources):
+    return [{"_id": str(i), "_source": source} for i, source in enumerate(sources)]
+
+
+def test_row_groups_follow_batch_size(tmp_path):
+    path = tmp_path / "out.parquet"
+
+    assert write_parquet(hits([{"n": i, "text": f"doc {i}"} for i in range(5)]), path, batch_size=2) == 5
+
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == 3
+    assert parquet.read().to_pylist()[4] == {"n": 4, "text": "doc 4", "_id": "4"}
+
+
+def test_field_missing_from_first_batch_raises(tmp_path):
+    sources = [{"n": 1}, {"n": 2}, {"n": 3, "extra": "x"}]
+
+    with pytest.raises(ValueError, match="extra"):
+        write_parquet(hits(sources), tmp_path / "out.parquet", batch_size=2)
+
+
+def test_type_change_raises(tmp_path):
+    sources = [{"n": 1}, {"n": 2}, {"n": "three"}]
+
+    with pytest.raises(ValueError, match="do not fit"):
+        write_parquet(hits(sources), tmp_path / "out.parquet", batch_size=2)
+
+
+def test_explicit_schema_keeps_every_field(tmp_path):
+    path = tmp_path / "out.parquet"
+    schema = pa.schema([("n", pa.int64()), ("extra", pa.string()), ("_id", pa.string())])
+
+    write_parquet(hits([{"n": 1}, {"n": 2}, {"n": 3, "extra": "x"}]), path, batch_size=2, schema=schema)
+
+    assert pq.read_table(path).to_pylist() == [
+        {"n": 1, "extra": None, "_id": "0"},
+        {"n": 2, "extra": None, "_id": "1"},
+        {"n": 3, "extra": "x", "_id": "2"},
+    ]
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compact vector storage: client-side quantization and OpenSearch's compact `knn_vector` encodings.
+
+Client side (for `local_vector_index` and offline work):
+- `Fp16Quantizer`: half precision, 2 bytes per dimension.
+- `Int8Quantizer`: per-dimension min/max scalar quantization, 1 byte per dimension.
+- `ProductQuantizer`: `m` sub-vectors, each replaced by one of 256 k-means centroids, so
+  1 byte per sub-vector; distances via lookup tables (asymmetric distance computation).
+- `QuantizedIndex`: searches the codes, then reranks the best `k * rerank_factor` candidates
+  against the full-precision vectors (which can stay memory-mapped on disk).
+
+OpenSearch side:
+- `knn_vector_mapping(dimension, encoding)` builds the field mapping for "float" (the original
+  nmslib HNSW mapping), "fp16" (faiss HNSW with the fp16 scalar-quantization encoder,
+  OpenSearch >= 2.13) or "byte" (lucene HNSW with `data_type: byte`, OpenSearch >= 2.9).
+- `to_index_vectors(matrix, encoding)` converts embeddings into what that field accepts;
+  "byte" vectors are symmetric int8 (`round(x * scale)`, clipped), which suits unit-length
+  embeddings such as MiniLM or text-embedding-v4 with the default scale of 127. Query vectors
+  must go through the same conversion.
+"""
+
+import numpy as np
+
+from local_vector_index import BruteForceIndex, INDEX_TYPES, _squared_l2, _top_k, assign, kmeans
+
+VECTOR_ENCODINGS = ("float", "fp16", "byte")
+DEFAULT_BYTE_SCALE = 127.0
+
+
+# --- OpenSearch mappings ---
+
+def knn_vector_mapping(dimension, encoding="float", ef_construction=128, m=24):
+    """`knn_vector` field mapping (l2 space, HNSW) for the given vector encoding."""
+    if encoding not in VECTOR_ENCODINGS:
+        raise ValueError(f"Unknown vector encoding '{encoding}', expected one of {VECTOR_ENCODINGS}")
+    parameters = {"ef_construction": ef_construction, "m": m}
+    mapping = {"type": "knn_vector", "dimension": dimension}
+    if encoding == "float":
+        engine = "nmslib"
+    elif encoding == "fp16":
+        engine = "faiss"
+        parameters["encoder"] = {"name": "sq", "parameters": {"type": "fp16"}}
+    else:
+        engine = "lucene"
+        mapping["data_type"] = "byte"
+    mapping["method"] = {"name": "hnsw", "space_type": "l2", "engine": engine, "parameters": parameters}
+    return mapping
+
+
+def to_index_vectors(matrix, encoding="float", scale=DEFAULT_BYTE_SCALE):
+    """Converts float embeddings to the values a field with `encoding` expects (2-D in, 2-D out)."""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    if encoding == "byte":
+        return np.clip(np.rint(matrix * scale), -128, 127).astype(np.int8)
+    # fp16 is applied by the faiss encoder on the server; send float32 values.
+    return matrix
+
+
+# --- Client-side quantizers ---
+
+class Fp16Quantizer:
+    kind = "fp16"
+    trained = True
+
+    def train(self, vectors):
+        return self
+
+    def encode(self, vectors):
+        return np.asarray(vectors, dtype=np.float16)
+
+    def decode(self, codes):
+        return np.asarray(codes, dtype=np.float32)
+
+    def norms(self, codes, block=4096):
+        """Squared norms of the decoded vectors (computed once per index)."""
+        return np.concatenate([
+            np.einsum("ij,ij->i", decoded, decoded)
+            for decoded in map(self.decode, (codes[s:s + block] for s in range(0, len(codes), block)))
+        ]) if len(codes) else np.empty(0, dtype=np.float32)
+
+    def distances(self, queries, codes, norms, block=4096):
+        """Squared l2 distances to the decoded codes.
+
+        Codes are decoded `block` rows at a time so the float32 copy stays in cache.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        distances = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), block):
+            decoded = self.decode(codes[start:start + block])
+            distances[:, start:start + block] = _squared_l2(queries, decoded, norms[start:start + block])
+        return distances
+
+    def state(self):
+        return {}
+
+    def load_state(self, state):
+        return self
+
+
+class Int8Quantizer(Fp16Quantizer):
+    """Per-dimension affine quantization to uint8 over a trimmed [lo, hi] range."""
+
+    kind = "int8"
+
+    def __init__(self, trim=0.001):
+        self.trim = trim
+        self.lo = self.step = None
+
+    @property
+    def trained(self):
+        return self.lo is not None
+
+    def train(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.lo = np.quantile(vectors, self.trim, axis=0).astype(np.float32)
+        hi = np.quantile(vectors, 1 - self.trim, axis=0).astype(np.float32)
+        self.step = np.maximum(hi - self.lo, 1e-12) / 255.0
+        return self
+
+    def encode(self, vectors):
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.lo) / self.step)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes):
+        return self.lo + np.asarray(codes, dtype=np.float32) * self.step
+
+    def distances(self, queries, codes, norms, block=4096):
+        """|q - (lo + c * step)|^2 expanded, so only the uint8 -> float32 cast is done per row."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        base = np.einsum("ij,ij->i", queries, queries) - 2.0 * (queries @ self.lo)
+        scaled = (-2.0 * queries * self.step).astype(np.float32)
+        distances = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), block):
+            chunk = codes[start:start + block].astype(np.float32)
+            distances[:, start:start + block] = scaled @ chunk.T
+        distances += norms[None, :]
+        distances += base[:, None]
+        return np.maximum(distances, 0.0, out=distances)
+
+    def state(self):
+        return {"lo": self.lo, "step": self.step}
+
+    def load_state(self, state):
+        self.lo, self.step = np.asarray(state["lo"]), np.asarray(state["step"])
+        return self
+
+
+class ProductQuantizer:
+    """Splits vectors into `m` sub-vectors and encodes each as the id of its nearest centroid."""
+
+    kind = "pq"
+
+    def __init__(self, m=16, ksub=256, train_size=20_000, iterations=15, seed=0):
+        self.m = m
+        self.ksub = ksub
+        self.train_size = train_size
+        self.iterations = iterations
+        self.seed = seed
+        self.codebooks = None
+
+    @property
+    def trained(self):
+        return self.codebooks is not None
+
+    def _split(self, vectors):
+        dimension = vectors.shape[1]
+        if dimension % self.m:
+            raise ValueError(f"Dimension {dimension} is not divisible by m={self.m}")
+        return vectors.reshape(len(vectors), self.m, dimension // self.m)
+
+    def train(self, vectors):
+        sub = self._split(np.asarray(vectors, dtype=np.float32))
+        self.codebooks = np.stack([
+            kmeans(sub[:, j], self.ksub, self.train_size, self.iterations, self.seed + j)
+            for j in range(self.m)
+        ])
+        return self
+
+    def encode(self, vectors):
+        sub = self._split(np.asarray(vectors, dtype=np.float32))
+        return np.stack([assign(sub[:, j], self.codebooks[j]) for j in range(self.m)], axis=1).astype(np.uint8)
+
+    def decode(self, codes):
+        codes = np.asarray(codes)
+        return self.codebooks[np.arange(self.m), codes].reshape(len(codes), -1)
+
+    def norms(self, codes):
+        return None # Lookup tables give distances directly
+
+    def distances(self, queries, codes, norms=None):
+        queries = self._split(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        # tables[q, j, c] = squared distance between query sub-vector j and centroid c.
+        tables = ((queries[:, :, None, :] - self.codebooks[None]) ** 2).sum(axis=-1)
+        columns = np.arange(self.m)
+        return np.stack([table[columns, codes].sum(axis=1) for table in tables])
+
+    def state(self):
+        return {"codebooks": self.codebooks}
+
+    def load_state(self, state):
+        self.codebooks = np.asarray(state["codebooks"])
+        self.m, self.ksub = self.codebooks.shape[:2]
+        return self
+
+
+QUANTIZERS = {cls.kind: cls for cls in (Fp16Quantizer, Int8Quantizer, ProductQuantizer)}
+
+
+class QuantizedIndex(BruteForceIndex):
+    """k-NN over quantized codes with an exact rerank of the best candidates.
+
+    Only the codes are scanned per query; full-precision `vectors` are touched for
+    `k * rerank_factor` rows, so they can be a memory-mapped array.
+    """
+
+    kind = "quantized"
+
+    def __init__(self, vectors, ids, sources=None, quantizer=None, rerank_factor=4, _codes=None):
+        self.vectors = vectors if isinstance(vectors, np.memmap) else np.asarray(vectors, dtype=np.float32)
+        self.ids = list(ids)
+        self.sources = sources
+        self.quantizer = quantizer if quantizer is not None else Int8Quantizer()
+        if _codes is None:
+            if not self.quantizer.trained:
+                self.quantizer.train(self.vectors)
+            _codes = self.quantizer.encode(self.vectors)
+        self.codes = _codes
+        self.code_norms = self.quantizer.norms(_codes)
+        self.rerank_factor = rerank_factor
+
+    @property
+    def code_bytes(self):
+        return self.codes.nbytes
+
+    def search(self, queries, k=10, rerank=True):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        approx = self.quantizer.distances(queries, self.codes, self.code_norms)
+        if not rerank:
+            positions = _top_k(approx, k)
+            return positions, np.take_along_axis(approx, positions, axis=1)
+        candidates = _top_k(approx, k * self.rerank_factor)
+        positions = np.empty((len(queries), min(k, candidates.shape[1])), dtype=np.int64)
+        distances = np.empty(positions.shape, dtype=np.float32)
+        for q, rows in enumerate(candidates):
+            rows = np.sort(rows) # Sequential reads when `vectors` is memory-mapped
+            full = np.asarray(self.vectors[rows], dtype=np.float32)
+            exact = _squared_l2(queries[q:q + 1], full, np.einsum("ij,ij->i", full, full))
+            best = _top_k(exact, k)[0]
+            positions[q] = rows[best]
+            distances[q] = exact[0, best]
+        return positions, distances
+
+    def _meta(self):
+        return {"quantizer": self.quantizer.kind, "rerank_factor": self.rerank_factor}
+
+    def _arrays(self):
+        arrays = {"vectors": self.vectors, "codes": self.codes}
+        arrays.update({f"quantizer_{name}": value for name, value in self.quantizer.state().items()})
+        return arrays
+
+    @classmethod
+    def _from_arrays(cls, arrays, ids, sources, meta):
+        state = {name[len("quantizer_"):]: value for name, value in arrays.items() if name.startswith("quantizer_")}
+        quantizer = QUANTIZERS[meta["quantizer"]]().load_state(state)
+        return cls(arrays["vectors"], ids, sources, quantizer=quantizer,
+                   rerank_factor=meta.get("rerank_factor", 4), _codes=np.asarray(arrays["codes"]))
+
+
+INDEX_TYPES[QuantizedIndex.kind] = QuantizedIndex
@@ -4,9 +4,16 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 from minio import Minio
-from opensearchpy import OpenSearch
-import PyPDF2
+import atexit
+import hashlib
 import io
+from bulk_indexer import BulkIndexer
+from dedup import FileRegistry
+from ingest_pipeline import IngestPipeline, PipelineFull
+from opensearch_client import lazy_client
+from pdf_extraction import PdfExtractor
+from search_index import INDEX_BODY, build_chunk_documents, build_search_query, format_search_response
+from streaming_upload import get_upload_settings, stream_to_minio
 
 # --- Initialization ---
 load_dotenv()
@@ -17,15 +24,8 @@ CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
 
 # --- Client Connections ---
 
-# OpenSearch Client
-opensearch_client = OpenSearch(
-    hosts=[{'host': os.getenv('OPENSEARCH_HOST'), 'port': int(os.getenv('OPENSEARCH_PORT'))}],
-    http_auth=None,
-    use_ssl=False,
-    verify_certs=False,
-    ssl_assert_hostname=False,
-    ssl_show_warn=False,
-)
+# OpenSearch Client (shared and pooled, see opensearch_client.py; connects on first use)
+opensearch_client = lazy_client()
 
 # MinIO Client
 minio_client = Minio(
@@ -37,6 +37,62 @@ minio_client = Minio(
 
 import time
 
+# --- Upload Settings ---
+
+# 'stream' pipes the body to MinIO in parts and spools a copy for extraction;
+# 'buffer' is the original read-everything-into-memory path.
+UPLOAD_MODE = os.getenv('UPLOAD_MODE', 'stream')
+UPLOAD_SETTINGS = get_upload_settings()
+
+# --- PDF Extraction Pool ---
+
+# Created once per process; large PDFs are split into page ranges across it.
+pdf_extractor = PdfExtractor(
+    max_workers=int(os.getenv('PDF_EXTRACT_WORKERS', os.cpu_count() or 1)),
+    pages_per_task=int(os.getenv('PDF_EXTRACT_PAGES_PER_TASK', 0)) or None,
+    min_pages_for_pool=int(os.getenv('PDF_EXTRACT_MIN_PAGES_FOR_POOL', 32))
+)
+atexit.register(pdf_extractor.shutdown)
+
+# --- Bulk Indexer ---
+
+# Batches documents into _bulk requests instead of one refresh=True index call each.
+bulk_indexer = BulkIndexer(
+    opensearch_client,
+    os.getenv('OPENSEARCH_INDEX'),
+    max_docs=int(os.getenv('BULK_MAX_DOCS', 500)),
+    max_bytes=int(os.getenv('BULK_MAX_BYTES', 5 * 1024 * 1024)),
+    flush_interval=float(os.getenv('BULK_FLUSH_INTERVAL', 1.0)),
+    max_retries=int(os.getenv('BULK_MAX_RETRIES', 3))
+)
+atexit.register(bulk_indexer.close)
+
+# --- File Registry ---
+
+# Content hashes and per-page hashes of every indexed file, for dedup.
+file_registry = FileRegistry(
+    opensearch_client,
+    os.getenv('OPENSEARCH_FILES_INDEX', f"{os.getenv('OPENSEARCH_INDEX')}-files")
+)
+
+# --- Ingestion Pipeline ---
+
+# extract -> chunk -> index run on background threads; uploads only store the PDF.
+ingest_pipeline = IngestPipeline(
+    minio_client,
+    bulk_indexer,
+    pdf_extractor,
+    bucket=os.getenv('MINIO_BUCKET'),
+    build_documents=build_chunk_documents,
+    registry=file_registry,
+    queue_size=int(os.getenv('INGEST_QUEUE_SIZE', 32)),
+    stage_workers={
+        'extract': int(os.getenv('INGEST_EXTRACT_WORKERS', 2)),
+        'index': int(os.getenv('INGEST_INDEX_WORKERS', 2)),
+    }
+)
+atexit.register(ingest_pipeline.shutdown)
+
 # --- Helper Functions ---
 
 def setup_minio_and_opensearch():
@@ -65,43 +121,33 @@ def setup_minio_and_opensearch():
     # Setup OpenSearch (can also have a retry loop if needed)
     index_name = os.getenv('OPENSEARCH_INDEX')
     if not opensearch_client.indices.exists(index=index_name):
-        opensearch_client.indices.create(index=index_name)
+        opensearch_client.indices.create(index=index_name, body=INDEX_BODY)
         print(f"OpenSearch index '{index_name}' created.")
     else:
         print(f"OpenSearch index '{index_name}' already exists.")
-
-def extract_text_from_pdf(pdf_file):
-    """Extracts text content from a PDF file stream."""
-    text = ""
-    try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        for page in pdf_reader.pages:
-            text += page.extract_text() or ""
-    except Exception as e:
-        print(f"Error extracting PDF text: {e}")
-        return None
-    return text
-
-# --- API Routes ---
-
-@app.route('/api/upload', methods=['POST'])
-def upload_pdf():
-    if 'file' not in request.files:
-        return jsonify({"error": "No file part"}), 400
-    
-    file = request.files['file']
-    if file.filename == '' or not file.filename.lower().endswith('.pdf'):
-        return jsonify({"error": "Invalid file, please upload a PDF"}), 400
-
-    try:
-        # Read file into memory
-        pdf_bytes = file.read()
+    file_registry.ensure_index()
+
+def get_upload_source():
+    """Returns (file_name, stream) for a multipart upload or a raw PDF body.
+
+    Raw bodies (`Content-Type: application/pdf`) take the name from the
+    `filename` query parameter and are read straight off the socket.
+    """
+    if 'file' in request.files:
+        file = request.files['file']
+        return file.filename, file.stream
+    if request.mimetype == 'application/pdf':
+        return request.args.get('filename', ''), request.stream
+    return None, None
+
+def store_pdf(file_name, source):
+    """Uploads the PDF to MinIO and returns (stream for extraction, length, sha256)."""
+    minio_bucket = os.getenv('MINIO_BUCKET')
+    if UPLOAD_MODE == 'buffer':
+        pdf_bytes = source.read()
         pdf_stream = io.BytesIO(pdf_bytes)
         file_length = len(pdf_bytes)
-        file_name = file.filename
-
-        # 1. Upload original PDF to MinIO
-        minio_bucket = os.getenv('MINIO_BUCKET')
+        sha256 = hashlib.sha256(pdf_bytes).hexdigest()
         minio_client.put_object(
             minio_bucket,
             file_name,
@@ -109,38 +155,97 @@ def upload_pdf():
             length=file_length,
             content_type='application/pdf'
         )
-        print(f"Successfully uploaded '{file_name}' to MinIO bucket '{minio_bucket}'.")
-
-        # 2. Extract text from PDF
         pdf_stream.seek(0) # Reset stream position after upload
-        extracted_text = extract_text_from_pdf(pdf_stream)
-        if extracted_text is None:
-            return jsonify({"error": "Could not extract text from PDF"}), 500
-
-        # 3. Index metadata and text into OpenSearch
-        document = {
-            'file_name': file_name,
-            'minio_path': f"/{minio_bucket}/{file_name}",
-            'content': extracted_text,
-            'size_bytes': file_length
-        }
-        opensearch_index = os.getenv('OPENSEARCH_INDEX')
-        opensearch_client.index(
-            index=opensearch_index,
-            body=document,
-            refresh=True # Make it immediately searchable
+    else:
+        pdf_stream, file_length, sha256 = stream_to_minio(
+            minio_client,
+            minio_bucket,
+            file_name,
+            source,
+            part_size=UPLOAD_SETTINGS['part_size'],
+            spool_max_size=UPLOAD_SETTINGS['spool_max_size'],
+            chunk_size=UPLOAD_SETTINGS['chunk_size']
         )
-        print(f"Successfully indexed metadata for '{file_name}' in OpenSearch.")
+    print(f"Successfully uploaded '{file_name}' to MinIO bucket '{minio_bucket}'.")
+    return pdf_stream, file_length, sha256
+
+# --- API Routes ---
+
+@app.route('/api/upload', methods=['POST'])
+def upload_pdf():
+    file_name, source = get_upload_source()
+    if source is None:
+        return jsonify({"error": "No file part"}), 400
+
+    if file_name == '' or not file_name.lower().endswith('.pdf'):
+        return jsonify({"error": "Invalid file, please upload a PDF"}), 400
+
+    pdf_stream = None
+    try:
+        # 1. Upload original PDF to MinIO
+        pdf_stream, file_length, sha256 = store_pdf(file_name, source)
+
+        # 2. Hand extraction and indexing to the background pipeline.
+        # ?refresh=true asks for read-your-writes once the job completes.
+        refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+        job_id = ingest_pipeline.submit(file_name, file_length, pdf_stream, sha256=sha256, refresh=refresh)
+        pdf_stream = None # Now owned by the pipeline
+        job = ingest_pipeline.status(job_id)
 
         return jsonify({
-            "message": "File uploaded and indexed successfully!",
+            "message": "File uploaded, indexing in progress.",
+            "job_id": job_id,
             "file_name": file_name,
-            "minio_path": document['minio_path']
-        }), 201
-
+            "minio_path": job['minio_path'],
+            "status_url": f"/api/ingest-status/{job_id}"
+        }), 202
+
+    except PipelineFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
     except Exception as e:
         print(f"An error occurred: {e}")
         return jsonify({"error": "An internal error occurred"}), 500
+    finally:
+        if pdf_stream is not None:
+            pdf_stream.close()
+
+@app.route('/api/ingest-status/<job_id>', methods=['GET'])
+def ingest_status(job_id):
+    job = ingest_pipeline.status(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/search', methods=['GET'])
+def search_pdfs():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Missing query parameter 'q'"}), 400
+
+    try:
+        body = build_search_query(
+            query,
+            size=request.args.get('size', 10, type=int),
+            cursor=request.args.get('cursor'),
+            file_name=request.args.get('file_name'),
+            fragment_size=request.args.get('fragment_size', 150, type=int),
+            fragments=request.args.get('fragments', 3, type=int)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        response = opensearch_client.search(index=os.getenv('OPENSEARCH_INDEX'), body=body)
+    except Exception as e:
+        print(f"Search failed: {e}")
+        return jsonify({"error": "An internal error occurred"}), 500
+    return jsonify(format_search_response(response, body['size']))
+
+@app.route('/api/ingest-metrics', methods=['GET'])
+def ingest_metrics():
+    return jsonify(ingest_pipeline.stats())
 
 # --- Main Execution ---
 
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Wall-time benchmark for PDF text extraction vs. worker count.
+
+Generates 10/100/1000-page PDFs and extracts each one with the original
+serial loop and with `PdfExtractor` at several pool sizes.
+
+Usage:
+    python benchmarks/bench_extraction.py --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import PyPDF2
+
+from pdf_extraction import PdfExtractor
+from synthetic_pdf import write_synthetic_pdf
+
+
+def extract_serial_concat(pdf_path):
+    """The original implementation: one reader, `text +=` per page."""
+    text = ""
+    for page in PyPDF2.PdfReader(pdf_path).pages:
+        text += page.extract_text() or ""
+    return text
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    extractors = {w: PdfExtractor(max_workers=w) for w in args.workers}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            header = f"{'pages':>6} {'serial +=':>10}" + ''.join(f" {f'{w} worker(s)':>12}" for w in args.workers)
+            print(header)
+            for pages in args.pages:
+                pdf_path = os.path.join(tmp, f'{pages}.pdf')
+                write_synthetic_pdf(pdf_path, num_pages=pages, words_per_page=400)
+                row = f"{pages:>6} {best_of(lambda: extract_serial_concat(pdf_path), args.repeat):>9.3f}s"
+                for w in args.workers:
+                    extractor = extractors[w]
+                    extractor.extract(pdf_path)  # warm up the pool processes
+                    row += f" {best_of(lambda: extractor.extract(pdf_path), args.repeat):>11.3f}s"
+                print(row)
+    finally:
+        for extractor in extractors.values():
+            extractor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
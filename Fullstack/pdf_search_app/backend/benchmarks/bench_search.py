@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Search latency: whole-document index vs. chunk-level index.
+
+Loads the same synthetic PDFs into two indexes — the original layout (one
+document per file, dynamic mapping, full `content` in `_source`) and the
+chunk layout from `search_index.py` — then runs the same queries against
+both and reports latency percentiles and response payload size.
+
+By default it runs against the in-process `FakeOpenSearch`; pass `--live`
+to use the OpenSearch configured in `.env` (two temporary indexes are
+created and deleted).
+
+Usage:
+    python benchmarks/bench_search.py --docs 20 --pages 200
+    python benchmarks/bench_search.py --live
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from bulk_indexer import BulkIndexer
+from fakes import FakeOpenSearch
+from ingest_pipeline import IngestJob, build_file_document
+from pdf_extraction import PdfExtractor
+from search_index import INDEX_BODY, build_chunk_documents, build_search_query, format_search_response
+from synthetic_pdf import write_synthetic_pdf
+
+QUERIES = ["bulk refresh", "vector search", "memory latency", "upload stream", "shard segment"]
+LEGACY_INDEX = "bench_pdf_documents_legacy"
+CHUNK_INDEX = "bench_pdf_documents_chunks"
+
+
+def make_client(live):
+    if not live:
+        return FakeOpenSearch()
+    from dotenv import load_dotenv
+    from opensearchpy import OpenSearch
+    load_dotenv(os.path.join(os.path.dirname(HERE), '.env'))
+    return OpenSearch(
+        hosts=[{'host': os.getenv('OPENSEARCH_HOST'), 'port': int(os.getenv('OPENSEARCH_PORT'))}],
+        use_ssl=False,
+        verify_certs=False,
+        ssl_show_warn=False,
+    )
+
+
+def load(client, docs, pages):
+    for name in (LEGACY_INDEX, CHUNK_INDEX):
+        if client.indices.exists(index=name):
+            client.indices.delete(index=name)
+    client.indices.create(index=LEGACY_INDEX)
+    client.indices.create(index=CHUNK_INDEX, body=INDEX_BODY)
+
+    extractor = PdfExtractor(max_workers=1)
+    legacy = BulkIndexer(client, LEGACY_INDEX, max_docs=10, flush_interval=0)
+    chunks = BulkIndexer(client, CHUNK_INDEX, flush_interval=0)
+    chunk_count = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(docs):
+            path = os.path.join(tmp, f"doc-{i}.pdf")
+            write_synthetic_pdf(path, num_pages=pages, seed=i)
+            job = IngestJob(f"doc-{i}.pdf", f"/pdfs/doc-{i}.pdf", os.path.getsize(path))
+            extracted = extractor.extract(path)
+            legacy.add_many(build_file_document(job, extracted))
+            documents = build_chunk_documents(job, extracted)
+            chunk_count += len(documents)
+            chunks.add_many(documents)
+    legacy.close(refresh=True)
+    chunks.close(refresh=True)
+    return chunk_count
+
+
+def measure(fn, repeat):
+    latencies = []
+    sizes = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            payload = fn(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            sizes.append(len(payload))
+    latencies.sort()
+    return {
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'kib': statistics.mean(sizes) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', type=int, default=20)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--live', action='store_true', help="use the OpenSearch from .env")
+    args = parser.parse_args()
+
+    client = make_client(args.live)
+    chunk_count = load(client, args.docs, args.pages)
+    print(f"Indexed {args.docs} PDFs x {args.pages} pages -> {chunk_count} chunks "
+          f"({'live OpenSearch' if args.live else 'FakeOpenSearch'})")
+
+    def legacy_search(query):
+        # What a client had to do before: match on the whole document, full _source back.
+        response = client.search(index=LEGACY_INDEX, body={"size": args.size, "query": {"match": {"content": query}}})
+        return json.dumps(response["hits"]["hits"])
+
+    def chunk_search(query):
+        body = build_search_query(query, size=args.size)
+        response = client.search(index=CHUNK_INDEX, body=body)
+        return json.dumps(format_search_response(response, body["size"]))
+
+    try:
+        print(f"{'layout':<10} {'p50 ms':>8} {'p95 ms':>8} {'payload KiB':>12}")
+        for name, fn in [('document', legacy_search), ('chunk', chunk_search)]:
+            stats = measure(fn, args.repeat)
+            print(f"{name:<10} {stats['p50']:>8.2f} {stats['p95']:>8.2f} {stats['kib']:>12.1f}")
+    finally:
+        if args.live:
+            client.indices.delete(index=LEGACY_INDEX)
+            client.indices.delete(index=CHUNK_INDEX)
+
+
+if __name__ == '__main__':
+    main()
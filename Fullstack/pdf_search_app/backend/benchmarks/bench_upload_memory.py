@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Peak-RSS benchmark for /api/upload: buffered vs. streaming upload mode.
+
+Each run happens in a fresh subprocess so `ru_maxrss` (the process
+high-water mark) only reflects that run. MinIO and OpenSearch are replaced
+by the in-process fakes from `fakes.py`.
+
+Usage:
+    python benchmarks/bench_upload_memory.py --size-mb 200
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(HERE)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, HERE)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def run_child(mode, transport, pdf_path):
+    """Performs one upload through the Flask test client and prints stats as JSON."""
+    os.environ.setdefault('OPENSEARCH_HOST', 'localhost')
+    os.environ.setdefault('OPENSEARCH_PORT', '9200')
+    os.environ.setdefault('OPENSEARCH_INDEX', 'pdf_documents')
+    os.environ.setdefault('MINIO_ENDPOINT', 'localhost:9000')
+    os.environ.setdefault('MINIO_BUCKET', 'pdfs')
+    os.environ['UPLOAD_MODE'] = mode
+
+    import minio
+    import opensearchpy
+    from fakes import FakeMinio, FakeOpenSearch
+
+    # Swap the client classes before app.py builds its module-level clients.
+    minio.Minio = lambda *args, **kwargs: FakeMinio()
+    opensearchpy.OpenSearch = lambda *args, **kwargs: FakeOpenSearch()
+    import app as backend
+
+    backend.minio_client.make_bucket(os.environ['MINIO_BUCKET'])
+    client = backend.app.test_client()
+
+    baseline = peak_rss_mb()
+    with open(pdf_path, 'rb') as f:
+        if transport == 'multipart':
+            response = client.post(
+                '/api/upload',
+                data={'file': (f, 'bench.pdf')},
+                content_type='multipart/form-data'
+            )
+        else:
+            # input_stream (not data=) so the test client does not slurp the file.
+            response = client.post(
+                '/api/upload?filename=bench.pdf',
+                input_stream=f,
+                content_length=os.path.getsize(pdf_path),
+                content_type='application/pdf'
+            )
+    # Extraction and indexing run in the background; include them in the peak.
+    job_id = response.get_json().get('job_id')
+    if job_id:
+        backend.ingest_pipeline.wait(job_id)
+    peak = peak_rss_mb()
+    backend.minio_client.cleanup()
+    print(json.dumps({
+        'status': response.status_code,
+        'baseline_mb': round(baseline, 1),
+        'peak_mb': round(peak, 1),
+        'delta_mb': round(peak - baseline, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=200, help="size of the synthetic PDF")
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--child', nargs=3, metavar=('MODE', 'TRANSPORT', 'PDF'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    from synthetic_pdf import write_synthetic_pdf
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'bench.pdf')
+        size = write_synthetic_pdf(pdf_path, num_pages=args.pages, padding_bytes=args.size_mb * 1024 * 1024)
+        print(f"Synthetic PDF: {size / (1024 * 1024):.1f} MiB, {args.pages} pages")
+        print(f"{'mode':<8} {'transport':<10} {'status':>6} {'baseline MiB':>13} {'peak MiB':>9} {'delta MiB':>10}")
+        for mode, transport in [('buffer', 'multipart'), ('stream', 'multipart'), ('stream', 'raw')]:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', mode, transport, pdf_path],
+                cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+            ).stdout
+            stats = json.loads(out.strip().splitlines()[-1])
+            print(f"{mode:<8} {transport:<10} {stats['status']:>6} {stats['baseline_mb']:>13} "
+                  f"{stats['peak_mb']:>9} {stats['delta_mb']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Writes synthetic PDFs for the benchmarks without any PDF library.
+
+Pages contain plain Helvetica text; optional `padding_bytes` adds an
+unreferenced binary stream so the file can be made arbitrarily large while
+staying cheap to parse. The file is written incrementally, so generating a
+multi-hundred-megabyte PDF does not need that much memory.
+"""
+import os
+import random
+
+WORDS = (
+    "search index document vector page upload stream minio opensearch "
+    "python flask worker queue latency memory throughput shard segment "
+    "refresh bulk chunk token query score highlight offset extract"
+).split()
+
+
+def _page_text(page_number, words_per_page, rng):
+    lines = [f"Page {page_number}"]
+    line = []
+    for _ in range(words_per_page):
+        line.append(rng.choice(WORDS))
+        if len(line) == 12:
+            lines.append(' '.join(line))
+            line = []
+    if line:
+        lines.append(' '.join(line))
+    return lines
+
+
+def _content_stream(lines):
+    ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+    for line in lines:
+        ops.append(f"({line}) Tj T*")
+    ops.append("ET")
+    return '\n'.join(ops).encode('latin-1')
+
+
+def write_synthetic_pdf(path, num_pages=10, words_per_page=200, padding_bytes=0, seed=0):
+    """Writes a `num_pages`-page PDF to `path` and returns its size in bytes."""
+    rng = random.Random(seed)
+    offsets = {}
+
+    # Object layout: 1 catalog, 2 pages tree, 3 font, then page/content pairs,
+    # then the optional padding stream.
+    page_ids = [4 + 2 * i for i in range(num_pages)]
+    padding_id = 4 + 2 * num_pages if padding_bytes else None
+    last_id = padding_id or (3 + 2 * num_pages)
+
+    with open(path, 'wb') as out:
+        def begin(obj_id):
+            offsets[obj_id] = out.tell()
+            out.write(f"{obj_id} 0 obj\n".encode())
+
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+        begin(1)
+        out.write(b"<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+
+        begin(2)
+        kids = ' '.join(f"{pid} 0 R" for pid in page_ids)
+        out.write(f"<< /Type /Pages /Kids [{kids}] /Count {num_pages} >>\nendobj\n".encode())
+
+        begin(3)
+        out.write(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>\nendobj\n")
+
+        for i, page_id in enumerate(page_ids):
+            content_id = page_id + 1
+            begin(page_id)
+            out.write(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>\nendobj\n".encode()
+            )
+            stream = _content_stream(_page_text(i + 1, words_per_page, rng))
+            begin(content_id)
+            out.write(f"<< /Length {len(stream)} >>\nstream\n".encode())
+            out.write(stream)
+            out.write(b"\nendstream\nendobj\n")
+
+        if padding_id:
+            begin(padding_id)
+            out.write(f"<< /Length {padding_bytes} >>\nstream\n".encode())
+            remaining = padding_bytes
+            while remaining:
+                n = min(remaining, 1024 * 1024)
+                out.write(os.urandom(n))
+                remaining -= n
+            out.write(b"\nendstream\nendobj\n")
+
+        xref_offset = out.tell()
+        out.write(f"xref\n0 {last_id + 1}\n".encode())
+        out.write(b"0000000000 65535 f \n")
+        for obj_id in range(1, last_id + 1):
+            out.write(f"{offsets[obj_id]:010d} 00000 n \n".encode())
+        out.write(
+            f"trailer\n<< /Size {last_id + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+        )
+        return out.tell()
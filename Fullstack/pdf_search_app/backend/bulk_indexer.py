@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""Buffered `_bulk` indexing for OpenSearch.
+
+Documents are collected in memory and sent as one `_bulk` request when the
+buffer reaches `max_docs` documents or `max_bytes` of NDJSON, or when the
+oldest buffered document is `flush_interval` seconds old. No refresh is
+forced unless a caller asks for read-your-writes, in which case the batch
+containing its documents is sent with `refresh=wait_for`.
+
+Items rejected with a retryable status (429 / 5xx) are re-sent with
+exponential backoff, outside the flush lock (a batch flushed meanwhile may
+land before them); everything else is reported per item on the
+`BulkTicket` returned by `add()` / `add_many()` / `write()` and in
+`failures`. Deleting a document that does not exist counts as success.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+
+class BulkTicket:
+    """Tracks a group of documents until every one of them is acknowledged or failed."""
+
+    def __init__(self, count):
+        self.lock = threading.Lock()
+        self.pending = count
+        self.succeeded = 0
+        self.errors = []
+        self.callbacks = []
+        self.done = threading.Event()
+        if count == 0:
+            self.done.set()
+
+    @property
+    def ok(self):
+        return self.done.is_set() and not self.errors
+
+    def wait(self, timeout=None):
+        """Blocks until all documents are resolved; returns True if none failed."""
+        self.done.wait(timeout)
+        return self.ok
+
+    def add_done_callback(self, fn):
+        """Calls `fn(ticket)` once resolved (immediately if already resolved)."""
+        with self.lock:
+            if not self.done.is_set():
+                self.callbacks.append(fn)
+                return
+        fn(self)
+
+    def _resolve(self, error=None):
+        with self.lock:
+            if error is None:
+                self.succeeded += 1
+            else:
+                self.errors.append(error)
+            self.pending -= 1
+            if self.pending > 0:
+                return
+            self.done.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for fn in callbacks:
+            fn(self)
+
+
+class _BulkItem:
+    __slots__ = ('doc_id', 'line', 'ticket')
+
+    def __init__(self, doc_id, line, ticket):
+        self.doc_id = doc_id
+        self.line = line
+        self.ticket = ticket
+
+
+class BulkIndexer:
+    """Thread-safe document buffer in front of the OpenSearch `_bulk` API."""
+
+    def __init__(self, client, index, max_docs=500, max_bytes=5 * 1024 * 1024,
+                 flush_interval=1.0, max_retries=3, retry_backoff=0.5):
+        self.client = client
+        self.index = index
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock() # Keeps batches in submission order
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.oldest_at = None
+        self.refresh_requested = False
+        self.failures = deque(maxlen=1000)
+        self.stats = {'docs_indexed': 0, 'docs_deleted': 0, 'docs_failed': 0, 'flushes': 0,
+                      'retries': 0, 'bytes_sent': 0}
+
+        self.closed = threading.Event()
+        self.flusher = None
+        if flush_interval:
+            self.flusher = threading.Thread(target=self._flush_periodically, name='bulk-flusher', daemon=True)
+            self.flusher.start()
+
+    # --- Public API ---
+
+    def add(self, body, doc_id=None, refresh=False):
+        """Buffers one document; returns a `BulkTicket` for it."""
+        return self.add_many([(doc_id, body)], refresh=refresh)
+
+    def add_many(self, documents, refresh=False):
+        """Buffers `(doc_id, body)` pairs; returns one `BulkTicket` covering all of them.
+
+        `refresh=True` requests read-your-writes: the batch carrying these
+        documents is sent with `refresh=wait_for`.
+        """
+        return self.write(documents, refresh=refresh)
+
+    def write(self, documents=(), delete_ids=(), refresh=False):
+        """Buffers index actions for `documents` and delete actions for `delete_ids`.
+
+        Returns one `BulkTicket` covering every action.
+        """
+        documents = list(documents)
+        delete_ids = list(delete_ids)
+        ticket = BulkTicket(len(documents) + len(delete_ids))
+        items = []
+        size = 0
+        for doc_id, body in documents:
+            action = {'_index': self.index}
+            if doc_id is not None:
+                action['_id'] = doc_id
+            line = json.dumps({'index': action}) + "\n" + json.dumps(body) + "\n"
+            items.append(_BulkItem(doc_id, line, ticket))
+            size += len(line) # json.dumps escapes non-ASCII, so chars == bytes
+        for doc_id in delete_ids:
+            line = json.dumps({'delete': {'_index': self.index, '_id': doc_id}}) + "\n"
+            items.append(_BulkItem(doc_id, line, ticket))
+            size += len(line)
+
+        with self.lock:
+            if self.oldest_at is None and items:
+                self.oldest_at = time.monotonic()
+            self.buffer.extend(items)
+            self.buffer_bytes += size
+            self.refresh_requested = self.refresh_requested or refresh
+            full = len(self.buffer) >= self.max_docs or self.buffer_bytes >= self.max_bytes
+        if full:
+            self.flush()
+        return ticket
+
+    def flush(self):
+        """Sends everything buffered so far, in requests of at most `max_docs` / `max_bytes`.
+
+        Retryable items are re-sent after a backoff that is slept without
+        holding `flush_lock`, so writers and the periodic flusher are not
+        blocked meanwhile.
+        """
+        with self.flush_lock:
+            with self.lock:
+                batch, self.buffer = self.buffer, []
+                refresh, self.refresh_requested = self.refresh_requested, False
+                self.buffer_bytes = 0
+                self.oldest_at = None
+            retry = self._send_all(batch, refresh, retryable=self.max_retries > 0)
+        attempt = 0
+        while retry:
+            attempt += 1
+            time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            with self.flush_lock:
+                retry = self._send_all(retry, refresh, retryable=attempt < self.max_retries)
+
+    def refresh(self):
+        """Makes everything indexed so far searchable with a single refresh."""
+        self.client.indices.refresh(index=self.index)
+
+    def close(self, refresh=False):
+        """Flushes the buffer and stops the background flusher."""
+        self.closed.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.flush()
+        if refresh:
+            self.refresh()
+
+    # --- Internals ---
+
+    def _flush_periodically(self):
+        tick = min(self.flush_interval, 0.1)
+        while not self.closed.wait(tick):
+            with self.lock:
+                due = self.oldest_at is not None and time.monotonic() - self.oldest_at >= self.flush_interval
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Bulk flush failed: {e}")
+
+    def _batches(self, items):
+        """Splits `items` into runs of at most `max_docs` items and `max_bytes` of NDJSON."""
+        start, size = 0, 0
+        for i, item in enumerate(items):
+            if i > start and (i - start >= self.max_docs or size + len(item.line) > self.max_bytes):
+                yield items[start:i]
+                start, size = i, 0
+            size += len(item.line)
+        if start < len(items):
+            yield items[start:]
+
+    def _send_all(self, items, refresh, retryable):
+        retry = []
+        for batch in self._batches(items):
+            retry.extend(self._send(batch, refresh, retryable))
+        return retry
+
+    def _send(self, pending, refresh, retryable):
+        """Sends one `_bulk` request; returns the items to retry."""
+        body = ''.join(item.line for item in pending)
+        try:
+            response = self.client.bulk(body=body, refresh='wait_for' if refresh else 'false')
+        except Exception as e:
+            if retryable:
+                self.stats['retries'] += len(pending)
+                return pending
+            for item in pending:
+                self._fail(item, None, str(e))
+            return []
+        self.stats['flushes'] += 1
+        self.stats['bytes_sent'] += len(body)
+
+        retry = []
+        for item, result in zip(pending, response['items']):
+            op, outcome = next(iter(result.items()))
+            status = outcome.get('status', 500)
+            if status < 300 or (op == 'delete' and status == 404):
+                self.stats['docs_deleted' if op == 'delete' else 'docs_indexed'] += 1
+                item.ticket._resolve()
+            elif status in RETRYABLE_STATUSES and retryable:
+                retry.append(item)
+            else:
+                self._fail(item, status, outcome.get('error'))
+        self.stats['retries'] += len(retry)
+        return retry
+
+    def _fail(self, item, status, error):
+        failure = {'index': self.index, 'id': item.doc_id, 'status': status, 'error': error}
+        print(f"Bulk indexing failed for document {item.doc_id}: {status} {error}")
+        self.stats['docs_failed'] += 1
+        self.failures.append(failure)
+        item.ticket._resolve(failure)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Bulk-ingest PDFs that already sit in the MinIO bucket.
+
+Every `.pdf` object under `--prefix` goes through the same extract -> chunk
+-> index pipeline as uploads, with documents batched into `_bulk` requests
+and a single index refresh at the end instead of one per document. Files
+whose content hash is already registered are skipped, and changed files
+only have their changed pages re-indexed, so nightly re-syncs mostly cost a
+download and a hash.
+
+Usage:
+    uv run bulk_ingest.py --prefix reports/2024/
+"""
+import argparse
+import time
+
+from app import bulk_indexer, ingest_pipeline, minio_client, setup_minio_and_opensearch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest PDFs from the MinIO bucket into OpenSearch.")
+    parser.add_argument('--prefix', default='', help="only objects whose name starts with this prefix")
+    parser.add_argument('--no-recursive', dest='recursive', action='store_false',
+                        help="do not descend into sub-directories of the prefix")
+    parser.add_argument('--no-refresh', dest='refresh', action='store_false',
+                        help="skip the final index refresh")
+    args = parser.parse_args()
+
+    setup_minio_and_opensearch()
+    bucket = ingest_pipeline.bucket
+    objects = [
+        obj for obj in minio_client.list_objects(bucket, prefix=args.prefix or None, recursive=args.recursive)
+        if not obj.is_dir and obj.object_name.lower().endswith('.pdf')
+    ]
+    print(f"Found {len(objects)} PDF(s) under '/{bucket}/{args.prefix}'.")
+    # Keep every job's status around until the summary is printed.
+    ingest_pipeline.max_jobs = max(ingest_pipeline.max_jobs, len(objects))
+
+    start = time.perf_counter()
+    job_ids = [ingest_pipeline.submit(obj.object_name, obj.size, block=True) for obj in objects]
+    ingest_pipeline.shutdown(wait=True)
+    bulk_indexer.close(refresh=args.refresh)
+    elapsed = time.perf_counter() - start
+
+    jobs = [ingest_pipeline.status(job_id) for job_id in job_ids]
+    failed = [job for job in jobs if job['status'] == 'failed']
+    skipped = [job for job in jobs if job['status'] == 'skipped']
+    for job in failed:
+        print(f"  FAILED {job['file_name']}: {job['error']}")
+    print(f"Ingested {len(jobs) - len(failed) - len(skipped)}/{len(jobs)} PDF(s), "
+          f"skipped {len(skipped)} already indexed, in {elapsed:.1f}s "
+          f"({sum(job['chunks_written'] for job in jobs)} chunk(s) written, "
+          f"{sum(job['chunks_deleted'] for job in jobs)} deleted, "
+          f"{bulk_indexer.stats['flushes']} bulk request(s), {bulk_indexer.stats['retries']} retried item(s)).")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
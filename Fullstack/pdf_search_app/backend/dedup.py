@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Content-hash deduplication and incremental re-indexing.
+
+A small registry index keeps one record per file name: the SHA-256 of the
+PDF bytes, a hash of every page's extracted text and how many chunks each
+page produced. With it the pipeline can
+
+- skip a file whose bytes are unchanged since it was last indexed,
+- skip a file whose bytes are already indexed under another name (the
+  record just points at the original with `duplicate_of`), and
+- for a changed file, re-index only the pages whose text changed and
+  delete the chunks that no longer exist.
+"""
+import hashlib
+import time
+
+from opensearchpy.exceptions import NotFoundError
+
+from pdf_extraction import PAGE_SEPARATOR
+from search_index import chunk_id
+
+REGISTRY_INDEX_BODY = {
+    "settings": {"index": {"number_of_shards": 1, "number_of_replicas": 0}},
+    "mappings": {
+        "dynamic": "strict",
+        "properties": {
+            "file_name": {"type": "keyword"},
+            "sha256": {"type": "keyword"},
+            "size_bytes": {"type": "long", "index": False},
+            "minio_path": {"type": "keyword", "index": False},
+            "page_count": {"type": "integer", "index": False},
+            "page_hashes": {"type": "keyword", "index": False},
+            "page_chunks": {"type": "integer", "index": False},
+            "duplicate_of": {"type": "keyword"},
+            "indexed_at": {"type": "double", "index": False}
+        }
+    }
+}
+
+
+def page_hashes(extracted):
+    """Returns one short hash per page of an `ExtractedPdf`."""
+    text = extracted.text
+    offsets = extracted.page_offsets
+    # Exclude the separator so a page hashes the same whether or not it is last.
+    ends = [offset - len(PAGE_SEPARATOR) for offset in offsets[1:]] + [len(text)]
+    return [
+        hashlib.sha256(text[start:end].encode('utf-8')).hexdigest()[:16]
+        for start, end in zip(offsets, ends)
+    ]
+
+
+def plan_incremental_update(file_name, documents, new_hashes, previous):
+    """Works out which chunk documents to write and which to delete.
+
+    `documents` are the `(doc_id, body)` pairs for the whole new version;
+    `previous` is the registry record of the last indexed version (or None).
+    Returns `(documents_to_write, ids_to_delete, page_chunks)`.
+    """
+    page_chunks = [0] * len(new_hashes)
+    for _, body in documents:
+        page_chunks[body['page'] - 1] += 1
+
+    old_hashes = (previous or {}).get('page_hashes') or []
+    old_chunks = (previous or {}).get('page_chunks') or []
+    if not old_hashes:
+        return documents, [], page_chunks
+
+    changed = {
+        page for page, page_hash in enumerate(new_hashes, 1)
+        if page > len(old_hashes) or old_hashes[page - 1] != page_hash
+    }
+    to_write = [(doc_id, body) for doc_id, body in documents if body['page'] in changed]
+
+    to_delete = []
+    for page, old_count in enumerate(old_chunks, 1):
+        # Pages that disappeared lose all their chunks; changed pages lose the tail.
+        new_count = page_chunks[page - 1] if page <= len(page_chunks) else 0
+        to_delete.extend(chunk_id(file_name, page, n) for n in range(new_count, old_count))
+    return to_write, to_delete, page_chunks
+
+
+class FileRegistry:
+    """Per-file records (hashes, chunk counts) in their own OpenSearch index."""
+
+    def __init__(self, client, index):
+        self.client = client
+        self.index = index
+
+    def ensure_index(self):
+        if not self.client.indices.exists(index=self.index):
+            self.client.indices.create(index=self.index, body=REGISTRY_INDEX_BODY)
+            print(f"OpenSearch index '{self.index}' created.")
+
+    def get(self, file_name):
+        """Realtime lookup of a file's record by name."""
+        try:
+            return self.client.get(index=self.index, id=file_name)['_source']
+        except NotFoundError:
+            return None
+
+    def find_by_hash(self, sha256):
+        """Returns the record of an indexed (non-duplicate) file with these bytes, if any."""
+        response = self.client.search(index=self.index, body={
+            "size": 1,
+            "query": {
+                "bool": {
+                    "filter": [{"term": {"sha256": sha256}}],
+                    "must_not": [{"exists": {"field": "duplicate_of"}}]
+                }
+            }
+        })
+        hits = response['hits']['hits']
+        return hits[0]['_source'] if hits else None
+
+    def put(self, record):
+        record = dict(record, indexed_at=time.time())
+        self.client.index(index=self.index, id=record['file_name'], body=record)
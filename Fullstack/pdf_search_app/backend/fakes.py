@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""In-process stand-ins for the MinIO and OpenSearch clients.
+
+They implement just enough of the `minio.Minio` / `opensearchpy.OpenSearch`
+surface used by this backend to run the app and the benchmarks without any
+external service.
+"""
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from opensearchpy.exceptions import NotFoundError
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class FakeObjectResponse(io.BufferedReader):
+    """Mimics the urllib3 response returned by `Minio.get_object`."""
+
+    def release_conn(self):
+        pass
+
+
+class FakeMinio:
+    """Disk-backed MinIO stand-in; objects live under a temporary directory."""
+
+    def __init__(self, root=None):
+        self.root = root or tempfile.mkdtemp(prefix='fake-minio-')
+        self.put_calls = 0
+
+    def _path(self, bucket, object_name):
+        return os.path.join(self.root, bucket, object_name)
+
+    def bucket_exists(self, bucket):
+        return os.path.isdir(os.path.join(self.root, bucket))
+
+    def make_bucket(self, bucket):
+        os.makedirs(os.path.join(self.root, bucket), exist_ok=True)
+
+    def put_object(self, bucket, object_name, data, length, part_size=0,
+                   content_type='application/octet-stream'):
+        # Like the real client, pull at most one part into memory at a time.
+        if length == -1 and part_size == 0:
+            raise ValueError("part_size must be provided when length is unknown")
+        part_size = part_size or max(MIN_PART_SIZE, length)
+        path = self._path(bucket, object_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        remaining = length
+        with open(path, 'wb') as out:
+            while remaining != 0:
+                want = part_size if remaining < 0 else min(part_size, remaining)
+                part = _read_part(data, want)
+                if not part:
+                    break
+                out.write(part)
+                if remaining > 0:
+                    remaining -= len(part)
+        self.put_calls += 1
+
+    def get_object(self, bucket, object_name):
+        return FakeObjectResponse(open(self._path(bucket, object_name), 'rb'))
+
+    def list_objects(self, bucket, prefix=None, recursive=False):
+        bucket_root = os.path.join(self.root, bucket)
+        for dirpath, dirnames, filenames in os.walk(bucket_root):
+            if not recursive:
+                dirnames.clear()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                object_name = os.path.relpath(path, bucket_root).replace(os.sep, '/')
+                if prefix is None or object_name.startswith(prefix):
+                    yield FakeObject(object_name, os.path.getsize(path))
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class FakeObject:
+    """Mimics `minio.datatypes.Object` as yielded by `list_objects`."""
+
+    def __init__(self, object_name, size):
+        self.object_name = object_name
+        self.size = size
+        self.is_dir = False
+
+
+def _read_part(data, size):
+    """Reads exactly `size` bytes (or until EOF) from a `read(n)` stream."""
+    chunks = []
+    while size > 0:
+        chunk = data.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class _FakeIndices:
+    def __init__(self, store):
+        self.store = store
+
+    def exists(self, index):
+        return index in self.store
+
+    def create(self, index, body=None):
+        self.store.setdefault(index, {})
+        return {'acknowledged': True, 'index': index}
+
+    def delete(self, index):
+        self.store.pop(index, None)
+        return {'acknowledged': True}
+
+    def refresh(self, index=None):
+        return {'_shards': {'failed': 0}}
+
+
+class FakeOpenSearch:
+    """Dict-backed OpenSearch stand-in."""
+
+    def __init__(self):
+        self.store = {}
+        self.indices = _FakeIndices(self.store)
+        self._next_id = 0
+        self.bulk_calls = 0
+
+    def index(self, index, body, id=None, refresh=False):
+        if id is None:
+            self._next_id += 1
+            id = str(self._next_id)
+        self.store.setdefault(index, {})[str(id)] = body
+        return {'_index': index, '_id': str(id), 'result': 'created'}
+
+    def get(self, index, id):
+        source = self.store.get(index, {}).get(str(id))
+        if source is None:
+            raise NotFoundError(404, 'not_found', {'found': False})
+        return {'_index': index, '_id': str(id), 'found': True, '_source': source}
+
+    def bulk(self, body, index=None, refresh=False):
+        """Applies `index` and `delete` actions from an NDJSON body."""
+        self.bulk_calls += 1
+        lines = iter(body.splitlines() if isinstance(body, str) else body.decode().splitlines())
+        items = []
+        for action_line in lines:
+            op, meta = next(iter(json.loads(action_line).items()))
+            target = meta.get('_index', index)
+            if op == 'index':
+                result = self.index(target, json.loads(next(lines)), id=meta.get('_id'))
+                items.append({'index': dict(result, status=201)})
+            elif op == 'delete':
+                found = self.store.get(target, {}).pop(str(meta['_id']), None) is not None
+                items.append({'delete': {'_index': target, '_id': meta['_id'], 'status': 200 if found else 404}})
+            else:
+                if op in ('create', 'update'):
+                    next(lines)
+                items.append({op: {'status': 400, 'error': {'type': 'unsupported_operation'}}})
+        return {'errors': any(item[next(iter(item))]['status'] >= 300 for item in items), 'items': items}
+
+    def search(self, index, body):
+        """Scores `match` queries by term frequency; supports the filters, sort,
+        `search_after`, `_source` includes and highlighting used by this backend."""
+        match, filters, missing = _parse_query(body.get('query', {'match_all': {}}))
+        field, text = next(iter(match.items())) if match else (None, '')
+        if isinstance(text, dict):
+            text = text['query']
+        terms = re.findall(r'\w+', text.lower())
+
+        hits = []
+        for doc_id, source in self.store.get(index, {}).items():
+            if any(source.get(f) != v for f, v in filters) or any(source.get(f) is not None for f in missing):
+                continue
+            score = 1.0
+            if terms:
+                value = source.get(field, '').lower()
+                score = float(sum(value.count(t) for t in terms))
+                if not score:
+                    continue
+            hits.append((score, doc_id, source))
+
+        tiebreak = 'chunk_id' if any('chunk_id' in s for s in body.get('sort', [])) else None
+        key = lambda hit: (-hit[0], hit[2].get(tiebreak, hit[1]) if tiebreak else hit[1])
+        hits.sort(key=key)
+        if 'search_after' in body:
+            after = (-body['search_after'][0], body['search_after'][1])
+            hits = [hit for hit in hits if key(hit) > after]
+
+        limit = body.get('track_total_hits', 10000)
+        total = {'value': min(len(hits), limit), 'relation': 'gte' if len(hits) > limit else 'eq'}
+        highlight = body.get('highlight', {}).get('fields', {})
+        includes = body.get('_source')
+        results = []
+        for score, doc_id, source in hits[:body.get('size', 10)]:
+            hit = {
+                '_index': index,
+                '_id': doc_id,
+                '_score': score,
+                '_source': {k: source[k] for k in includes if k in source} if includes else source,
+                'sort': list(key((score, doc_id, source))),
+            }
+            hit['sort'][0] = score
+            if highlight:
+                hit['highlight'] = {
+                    name: _highlight(source.get(name, ''), terms, opts.get('fragment_size', 100),
+                                     opts.get('number_of_fragments', 5))
+                    for name, opts in highlight.items()
+                }
+            results.append(hit)
+        return {'took': 0, 'hits': {'total': total, 'hits': results}}
+
+
+def _parse_query(query):
+    """Returns (match clause, [(field, value)] term filters, [must_not exists fields])."""
+    if 'match' in query:
+        return query['match'], [], []
+    if 'term' in query:
+        return {}, [next(iter(query['term'].items()))], []
+    if 'bool' in query:
+        match, filters = {}, []
+        for clause in query['bool'].get('must', []) + query['bool'].get('filter', []):
+            clause_match, clause_filters, _ = _parse_query(clause)
+            match.update(clause_match)
+            filters.extend(clause_filters)
+        missing = [clause['exists']['field'] for clause in query['bool'].get('must_not', []) if 'exists' in clause]
+        return match, filters, missing
+    return {}, [], []
+
+
+def _highlight(text, terms, fragment_size, number_of_fragments):
+    fragments = []
+    if terms:
+        pattern = re.compile('|'.join(re.escape(t) for t in terms), re.IGNORECASE)
+        for m in pattern.finditer(text):
+            if fragments and m.start() < fragments[-1][1]:
+                continue
+            start = max(0, m.start() - fragment_size // 2)
+            fragments.append((start, start + fragment_size))
+            if len(fragments) == number_of_fragments:
+                break
+        return [pattern.sub(lambda m: f"<em>{m.group(0)}</em>", text[a:b]) for a, b in fragments]
+    return [text[:fragment_size]]
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""Background ingestion pipeline: extract -> chunk -> index.
+
+The upload endpoint only stores the PDF in MinIO and submits a job; the
+stages run on their own worker threads and are connected by bounded queues,
+so a slow stage fills its inbox and eventually makes `submit()` fail fast
+instead of piling up work (backpressure). Each stage records how long jobs
+wait in its queue and how long it spends on them.
+
+The index stage hands documents to a `BulkIndexer` and does not wait for
+the `_bulk` round trip; the job completes when the indexer acknowledges
+every document. With a `FileRegistry` the pipeline also deduplicates by
+content hash and re-indexes only the pages that changed (see `dedup.py`).
+Clients are injected, so the pipeline runs just as well on the in-process
+fakes from `fakes.py`.
+"""
+import hashlib
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from dedup import page_hashes, plan_incremental_update
+
+STAGES = ('extract', 'chunk', 'index')
+STAGE_STATUS = {'extract': 'extracting', 'chunk': 'chunking', 'index': 'indexing'}
+
+
+class PipelineFull(Exception):
+    """Raised by `IngestPipeline.submit()` when the extract queue stays full."""
+
+
+class IngestJob:
+    """One PDF moving through the pipeline."""
+
+    def __init__(self, file_name, minio_path, size_bytes, pdf_stream=None, sha256=None, refresh=False):
+        self.id = uuid.uuid4().hex
+        self.file_name = file_name
+        self.minio_path = minio_path
+        self.size_bytes = size_bytes
+        self.status = 'queued'
+        self.error = None
+        self.timings = {}
+        self.created_at = time.time()
+        self.finished_at = None
+        # Stream handed over by the upload endpoint; fetched from MinIO when None.
+        self.pdf_stream = pdf_stream
+        # Computed while streaming the upload; while downloading otherwise.
+        self.sha256 = sha256
+        # Read-your-writes: index with refresh=wait_for before reporting completion.
+        self.refresh = refresh
+        self.extracted = None
+        self.documents = None
+        self.delete_ids = []
+        # Registry record of the previously indexed version of this file name.
+        self.previous = None
+        self.duplicate_of = None
+        self.page_hashes = []
+        self.page_chunks = []
+        self.skipped = None
+        self.chunks_written = 0
+        self.chunks_deleted = 0
+        self.enqueued_at = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'file_name': self.file_name,
+            'minio_path': self.minio_path,
+            'size_bytes': self.size_bytes,
+            'sha256': self.sha256,
+            'status': self.status,
+            'skipped_reason': self.skipped,
+            'duplicate_of': self.duplicate_of,
+            'chunks_written': self.chunks_written,
+            'chunks_deleted': self.chunks_deleted,
+            'error': self.error,
+            'timings': {k: round(v, 4) for k, v in self.timings.items()},
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class StageMetrics:
+    """Thread-safe counters for one stage."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.max_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def record(self, seconds, wait_seconds, ok):
+        with self.lock:
+            if ok:
+                self.processed += 1
+            else:
+                self.failed += 1
+            self.busy_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.wait_seconds += wait_seconds
+
+    def snapshot(self):
+        with self.lock:
+            total = self.processed + self.failed
+            return {
+                'processed': self.processed,
+                'failed': self.failed,
+                'avg_seconds': round(self.busy_seconds / total, 4) if total else 0.0,
+                'max_seconds': round(self.max_seconds, 4),
+                'avg_wait_seconds': round(self.wait_seconds / total, 4) if total else 0.0,
+            }
+
+
+def build_file_document(job, extracted):
+    """Default chunk stage: one document per file, as the synchronous endpoint indexed it.
+
+    Returns a list of `(doc_id, body)` pairs; `doc_id` None lets OpenSearch pick one.
+    """
+    return [(None, {
+        'file_name': job.file_name,
+        'minio_path': job.minio_path,
+        'content': extracted.text,
+        'page_count': len(extracted.page_offsets),
+        'size_bytes': job.size_bytes,
+    })]
+
+
+class IngestPipeline:
+    """Runs uploaded PDFs through extract -> chunk -> index on background threads."""
+
+    def __init__(self, minio_client, indexer, extractor, bucket,
+                 queue_size=32, stage_workers=None, submit_timeout=1.0,
+                 max_jobs=10000, build_documents=build_file_document, registry=None):
+        self.minio_client = minio_client
+        self.indexer = indexer
+        # Dedup needs page-level documents (a `page` field), e.g. build_chunk_documents.
+        self.registry = registry
+        self.extractor = extractor
+        self.bucket = bucket
+        self.submit_timeout = submit_timeout
+        self.max_jobs = max_jobs
+        self.build_documents = build_documents
+        self.stage_workers = {'extract': 2, 'chunk': 1, 'index': 2}
+        self.stage_workers.update(stage_workers or {})
+
+        self.queues = {name: queue.Queue(maxsize=queue_size) for name in STAGES}
+        self.metrics = {name: StageMetrics() for name in STAGES}
+        self.handlers = {'extract': self._extract, 'chunk': self._chunk, 'index': self._index}
+        self.jobs = OrderedDict()
+        self.jobs_lock = threading.Lock()
+        self.threads = []
+        self.start_lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Starts the stage workers; safe to call more than once."""
+        with self.start_lock:
+            if self.threads:
+                return
+            for i, name in enumerate(STAGES):
+                outbox = self.queues[STAGES[i + 1]] if i + 1 < len(STAGES) else None
+                for n in range(self.stage_workers[name]):
+                    thread = threading.Thread(
+                        target=self._run_stage,
+                        args=(name, self.queues[name], outbox),
+                        name=f"ingest-{name}-{n}",
+                        daemon=True
+                    )
+                    thread.start()
+                    self.threads.append(thread)
+
+    def shutdown(self, wait=True):
+        """Stops the workers, by default after draining everything already queued."""
+        if wait:
+            for name in STAGES:
+                self.queues[name].join()
+            self.indexer.flush()
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join()
+
+    # --- Public API ---
+
+    def submit(self, file_name, size_bytes, pdf_stream=None, sha256=None, refresh=False, block=False):
+        """Queues a stored PDF for ingestion and returns the job id.
+
+        On success the pipeline owns `pdf_stream` and closes it. Raises
+        `PipelineFull` if the extract queue has no room within `submit_timeout`,
+        unless `block` is set, in which case it waits for room.
+        """
+        self.start()
+        job = IngestJob(file_name, f"/{self.bucket}/{file_name}", size_bytes, pdf_stream, sha256, refresh)
+        job.enqueued_at = time.perf_counter()
+        try:
+            self.queues['extract'].put(job, timeout=None if block else self.submit_timeout)
+        except queue.Full:
+            raise PipelineFull("Ingestion queue is full, try again later")
+        self._remember(job)
+        return job.id
+
+    def status(self, job_id):
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until the job finishes; returns its status dict (None if unknown)."""
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job.done.wait(timeout)
+        return job.to_dict()
+
+    def stats(self):
+        return {
+            'stages': {
+                name: dict(self.metrics[name].snapshot(), queue_depth=self.queues[name].qsize())
+                for name in STAGES
+            },
+            'jobs_tracked': len(self.jobs),
+            'indexer': dict(self.indexer.stats, buffered=len(self.indexer.buffer)),
+        }
+
+    # --- Internals ---
+
+    def _remember(self, job):
+        with self.jobs_lock:
+            self.jobs[job.id] = job
+            # Forget the oldest finished jobs once over the limit.
+            while len(self.jobs) > self.max_jobs:
+                oldest_id, oldest = next(iter(self.jobs.items()))
+                if not oldest.done.is_set():
+                    break
+                del self.jobs[oldest_id]
+
+    def _run_stage(self, name, inbox, outbox):
+        handler = self.handlers[name]
+        metrics = self.metrics[name]
+        while not self.stopping.is_set():
+            try:
+                job = inbox.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                wait_seconds = time.perf_counter() - job.enqueued_at
+                job.status = STAGE_STATUS[name]
+                start = time.perf_counter()
+                ok = False
+                try:
+                    pending = handler(job)
+                    ok = True
+                except Exception as e:
+                    print(f"Ingest job {job.id} failed in stage '{name}': {e}")
+                    job.error = f"{name}: {e}"
+                finally:
+                    seconds = time.perf_counter() - start
+                    job.timings[name] = seconds
+                    job.timings[f"{name}_wait"] = wait_seconds
+                    metrics.record(seconds, wait_seconds, ok)
+
+                if not ok:
+                    self._finish(job, 'failed')
+                elif job.skipped == 'unchanged':
+                    self._finish(job, 'skipped')
+                elif outbox is None and pending is not None:
+                    job.enqueued_at = time.perf_counter()
+                    pending.add_done_callback(lambda ticket, job=job: self._acknowledged(job, ticket))
+                elif outbox is None:
+                    self._finish(job, 'completed')
+                else:
+                    job.enqueued_at = time.perf_counter()
+                    outbox.put(job) # Blocks while the next stage is saturated
+            finally:
+                inbox.task_done()
+
+    def _acknowledged(self, job, ticket):
+        """Called by the bulk indexer once every document of the job is resolved."""
+        job.timings['index_ack'] = time.perf_counter() - job.enqueued_at
+        if ticket.errors:
+            job.error = f"index: {len(ticket.errors)} document(s) failed: {ticket.errors[0]['error']}"
+            self._finish(job, 'failed')
+            return
+        if self.registry is not None:
+            # Only record the new version once all of its chunks are in.
+            try:
+                self.registry.put({
+                    'file_name': job.file_name,
+                    'sha256': job.sha256,
+                    'size_bytes': job.size_bytes,
+                    'minio_path': job.minio_path,
+                    'page_count': len(job.page_hashes),
+                    'page_hashes': job.page_hashes,
+                    'page_chunks': job.page_chunks,
+                    'duplicate_of': job.duplicate_of,
+                })
+            except Exception as e:
+                job.error = f"registry: {e}"
+                self._finish(job, 'failed')
+                return
+        self._finish(job, 'skipped' if job.skipped else 'completed')
+
+    def _finish(self, job, status):
+        if job.pdf_stream is not None:
+            job.pdf_stream.close()
+            job.pdf_stream = None
+        job.extracted = None
+        job.documents = None
+        job.delete_ids = []
+        job.previous = None
+        job.status = status
+        job.finished_at = time.time()
+        job.done.set()
+
+    def _fetch(self, job):
+        """Downloads the object from MinIO into a spooled temp file, hashing it on the way."""
+        spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        hasher = hashlib.sha256()
+        response = self.minio_client.get_object(self.bucket, job.file_name)
+        try:
+            for chunk in iter(lambda: response.read(1024 * 1024), b''):
+                hasher.update(chunk)
+                spool.write(chunk)
+        finally:
+            response.close()
+            response.release_conn()
+        spool.seek(0)
+        return spool, hasher.hexdigest()
+
+    def _check_known_content(self, job):
+        """Marks the job skipped if its bytes are already indexed; returns True if so."""
+        job.previous = self.registry.get(job.file_name)
+        if job.previous and job.previous.get('sha256') == job.sha256:
+            job.skipped = 'unchanged'
+            return True
+        original = self.registry.find_by_hash(job.sha256)
+        if original and original['file_name'] != job.file_name:
+            # Same bytes under another name: point at it instead of indexing a copy.
+            job.skipped = 'duplicate'
+            job.duplicate_of = original['file_name']
+            return True
+        return False
+
+    # --- Stages ---
+
+    def _extract(self, job):
+        if job.pdf_stream is None:
+            job.pdf_stream, job.sha256 = self._fetch(job)
+        try:
+            if self.registry is not None and self._check_known_content(job):
+                return
+            job.extracted = self.extractor.extract(job.pdf_stream)
+        finally:
+            job.pdf_stream.close()
+            job.pdf_stream = None
+
+    def _chunk(self, job):
+        documents = []
+        if job.extracted is not None:
+            documents = self.build_documents(job, job.extracted)
+            if self.registry is not None:
+                job.page_hashes = page_hashes(job.extracted)
+            job.extracted = None
+        if self.registry is not None:
+            # For duplicate content `documents` is empty, which deletes the
+            # chunks of an older version stored under this name.
+            documents, job.delete_ids, job.page_chunks = plan_incremental_update(
+                job.file_name, documents, job.page_hashes, job.previous
+            )
+        job.documents = documents
+
+    def _index(self, job):
+        """Buffers the job's writes and deletes; returns the ticket that completes the job."""
+        job.chunks_written = len(job.documents)
+        job.chunks_deleted = len(job.delete_ids)
+        return self.indexer.write(job.documents, job.delete_ids, refresh=job.refresh)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+Shared, lazily created OpenSearch clients.
+
+Every script used to build its own `OpenSearch(...)` at import time with default settings:
+a single pooled connection per node (concurrent threads open extra ones that urllib3 then
+discards), no compression, a 10s timeout and no retry on timeouts. `get_client()` builds one
+tuned client per distinct set of options on first use and hands the same instance to every
+caller; `lazy_client()` returns a stand-in that can sit in a module-level `client` variable
+without connecting anything at import time. `get_async_client()` is the `AsyncOpenSearch`
+equivalent for asyncio code (needs `pip install opensearch-py[async]`).
+
+Settings (environment variables, overridable per call):
+    OPENSEARCH_HOST / OPENSEARCH_PORT   localhost / 9200
+    OPENSEARCH_POOL_MAXSIZE             32    connections kept alive per node
+    OPENSEARCH_TIMEOUT                  30    seconds per request
+    OPENSEARCH_MAX_RETRIES              3     retries on timeouts / 502 / 503 / 504
+    OPENSEARCH_HTTP_COMPRESS            true  gzip request bodies (bulk payloads shrink ~5-10x)
+
+The same file lives in Database/opensearch_test and Fullstack/pdf_search_app/backend, which are
+separate projects (each with its own pyproject.toml); edit both copies together, the test in
+Database/opensearch_test/tests fails when they differ.
+"""
+
+import asyncio
+import os
+import threading
+
+from opensearchpy import OpenSearch
+
+_lock = threading.Lock()
+_clients = {}
+_async_clients = {}
+
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def client_options(**overrides):
+    """Connection settings shared by the sync and async clients."""
+    options = {
+        "hosts": [{
+            "host": os.getenv("OPENSEARCH_HOST", "localhost"),
+            "port": int(os.getenv("OPENSEARCH_PORT", 9200)),
+        }],
+        "http_auth": None,
+        "use_ssl": False,
+        "verify_certs": False,
+        "ssl_assert_hostname": False,
+        "ssl_show_warn": False,
+        "pool_maxsize": int(os.getenv("OPENSEARCH_POOL_MAXSIZE", 32)),
+        "timeout": float(os.getenv("OPENSEARCH_TIMEOUT", 30)),
+        "max_retries": int(os.getenv("OPENSEARCH_MAX_RETRIES", 3)),
+        "retry_on_timeout": True,
+        "http_compress": _env_bool("OPENSEARCH_HTTP_COMPRESS", True),
+    }
+    options.update(overrides)
+    return options
+
+
+def _key(options):
+    return repr(sorted(options.items()))
+
+
+def get_client(**overrides):
+    """Returns the shared `OpenSearch` client for these options, creating it on first use."""
+    options = client_options(**overrides)
+    key = _key(options)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = OpenSearch(**options)
+    return client
+
+
+def get_async_client(**overrides):
+    """Returns an `AsyncOpenSearch` client for the running event loop (one per loop and options)."""
+    from opensearchpy import AsyncOpenSearch
+
+    options = client_options(**overrides)
+    # aiohttp calls the pool size `maxsize`.
+    options["maxsize"] = options.pop("pool_maxsize")
+    key = (id(asyncio.get_running_loop()), _key(options))
+    client = _async_clients.get(key)
+    if client is None:
+        client = _async_clients[key] = AsyncOpenSearch(**options)
+    return client
+
+
+async def close_async_clients():
+    """Closes the async clients that belong to the running event loop."""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _async_clients if key[0] == loop_id]:
+        await _async_clients.pop(key).close()
+
+
+def close_clients():
+    """Closes every shared sync client (e.g. before forking worker processes)."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+class LazyClient:
+    """Module-level stand-in for `get_client(**options)`; connects on first attribute access."""
+
+    def __init__(self, **options):
+        self._options = options
+        self._client = None
+
+    def __getattr__(self, name):
+        if self._client is None:
+            self._client = get_client(**self._options)
+        return getattr(self._client, name)
+
+
+def lazy_client(**options):
+    return LazyClient(**options)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Per-page PDF text extraction, fanned out over a process pool.
+
+Small documents are parsed inline; larger ones are split into page ranges
+and each range is extracted by a worker process that opens its own
+`PdfReader` on a file path. Page texts are joined once at the end and the
+start offset of every page is returned so chunks can be mapped back to page
+numbers.
+"""
+import bisect
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+
+PAGE_SEPARATOR = "\n"
+
+# text: all pages joined with PAGE_SEPARATOR
+# page_offsets: page_offsets[i] is the index in `text` where page i+1 starts
+ExtractedPdf = namedtuple('ExtractedPdf', ['text', 'page_offsets'])
+
+
+def page_for_offset(page_offsets, offset):
+    """Returns the 1-based page number containing character `offset`."""
+    return bisect.bisect_right(page_offsets, offset)
+
+
+def _extract_page_range(pdf_path, start, stop):
+    """Worker entry point: extracts pages [start, stop) from the PDF at `pdf_path`."""
+    reader = PyPDF2.PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _join_pages(page_texts):
+    offsets = []
+    position = 0
+    for page_text in page_texts:
+        offsets.append(position)
+        position += len(page_text) + len(PAGE_SEPARATOR)
+    return ExtractedPdf(PAGE_SEPARATOR.join(page_texts), offsets)
+
+
+class PdfExtractor:
+    """Extracts PDF text, using a shared process pool for large documents.
+
+    The pool is created once and reused for every request; call `shutdown()`
+    when the application exits. Every task re-parses the PDF's xref and page
+    tree, so by default the pages are split into one range per worker;
+    `pages_per_task` overrides that.
+    """
+
+    def __init__(self, max_workers=None, pages_per_task=None, min_pages_for_pool=32):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.min_pages_for_pool = min_pages_for_pool
+        # With a single worker the pool would only add pickling overhead.
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+
+    def extract(self, pdf_file):
+        """Extracts text from a path or seekable binary stream into an `ExtractedPdf`."""
+        reader = PyPDF2.PdfReader(pdf_file)
+        page_count = len(reader.pages)
+        if self.pool is None or page_count < self.min_pages_for_pool:
+            return _join_pages([page.extract_text() or "" for page in reader.pages])
+
+        pdf_path, is_temp = self._as_path(pdf_file)
+        try:
+            step = self.pages_per_task or -(-page_count // self.max_workers)
+            ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+            futures = [self.pool.submit(_extract_page_range, pdf_path, start, stop) for start, stop in ranges]
+            page_texts = []
+            for future in futures:
+                page_texts.extend(future.result())
+        finally:
+            if is_temp:
+                os.remove(pdf_path)
+        return _join_pages(page_texts)
+
+    @staticmethod
+    def _as_path(pdf_file):
+        """Returns (path, is_temp); streams are copied to a named temp file for the workers."""
+        if isinstance(pdf_file, (str, os.PathLike)):
+            return os.fspath(pdf_file), False
+        pdf_file.seek(0)
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            shutil.copyfileobj(pdf_file, tmp, 1024 * 1024)
+        return tmp.name, True
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Chunk-level index layout and search queries for the PDF index.
+
+Each PDF is indexed as many small documents, one per paragraph-sized chunk
+of a page, instead of one huge `content` field. Chunk text is stored as a
+stored field (used for highlighting) and excluded from `_source`, so hits
+only ship back the small metadata fields plus bounded highlight fragments.
+Results are paginated with `search_after` on (`_score`, `chunk_id`).
+"""
+import base64
+import json
+
+CHUNK_MAX_CHARS = 1000
+MAX_PAGE_SIZE = 50
+MAX_FRAGMENT_SIZE = 500
+MAX_FRAGMENTS = 5
+
+INDEX_BODY = {
+    "settings": {
+        "index": {
+            "number_of_shards": 1,
+            "number_of_replicas": 0,
+            "refresh_interval": "1s"
+        }
+    },
+    "mappings": {
+        "dynamic": "strict",
+        "_source": {"excludes": ["content"]},
+        "properties": {
+            "chunk_id": {"type": "keyword"},
+            "file_name": {"type": "keyword"},
+            "minio_path": {"type": "keyword", "index": False},
+            "page": {"type": "integer"},
+            "chunk": {"type": "integer"},
+            # Offsets in the postings let the unified highlighter skip re-analysis.
+            "content": {"type": "text", "store": True, "index_options": "offsets"}
+        }
+    }
+}
+
+SOURCE_FIELDS = ["file_name", "minio_path", "page", "chunk"]
+
+
+# --- Chunking ---
+
+def chunk_id(file_name, page, n):
+    return f"{file_name}:{page}:{n}"
+
+
+def split_page(text, max_chars=CHUNK_MAX_CHARS):
+    """Packs a page's lines into chunks of at most `max_chars` characters."""
+    chunks = []
+    current = []
+    length = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        # Hard-wrap lines that are longer than a whole chunk.
+        while len(line) > max_chars:
+            if current:
+                chunks.append(' '.join(current))
+                current, length = [], 0
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and length + len(line) + 1 > max_chars:
+            chunks.append(' '.join(current))
+            current, length = [], 0
+        current.append(line)
+        length += len(line) + 1
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+def build_chunk_documents(job, extracted, max_chars=CHUNK_MAX_CHARS):
+    """Chunk stage for the ingestion pipeline: one document per page chunk.
+
+    Returns `(doc_id, body)` pairs; ids are `<file_name>:<page>:<chunk>` so
+    re-ingesting a file overwrites its previous chunks in place. File-level
+    metadata (size, page count) lives in the file registry, not on chunks,
+    so unchanged pages never need rewriting.
+    """
+    text = extracted.text
+    offsets = extracted.page_offsets
+    page_count = len(offsets)
+    documents = []
+    for i, start in enumerate(offsets):
+        end = offsets[i + 1] if i + 1 < page_count else len(text)
+        page = i + 1
+        for n, chunk in enumerate(split_page(text[start:end], max_chars)):
+            doc_id = chunk_id(job.file_name, page, n)
+            documents.append((doc_id, {
+                'chunk_id': doc_id,
+                'file_name': job.file_name,
+                'minio_path': job.minio_path,
+                'page': page,
+                'chunk': n,
+                'content': chunk,
+            }))
+    return documents
+
+
+# --- Search ---
+
+def encode_cursor(sort_values):
+    return base64.urlsafe_b64encode(json.dumps(sort_values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Turns an opaque `next_cursor` back into `search_after` values; raises ValueError."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def build_search_query(query, size=10, cursor=None, file_name=None, fragment_size=150, fragments=3):
+    """Builds a highlighted, `search_after`-paginated chunk query."""
+    size = max(1, min(size, MAX_PAGE_SIZE))
+    fragment_size = max(20, min(fragment_size, MAX_FRAGMENT_SIZE))
+    fragments = max(1, min(fragments, MAX_FRAGMENTS))
+
+    bool_query = {"must": [{"match": {"content": {"query": query, "operator": "or"}}}]}
+    if file_name:
+        bool_query["filter"] = [{"term": {"file_name": file_name}}]
+
+    body = {
+        "size": size,
+        "query": {"bool": bool_query},
+        "_source": SOURCE_FIELDS,
+        "sort": [{"_score": "desc"}, {"chunk_id": "asc"}],
+        # Exact totals cost a full count; a lower bound is enough for the UI.
+        "track_total_hits": 1000,
+        "highlight": {
+            "type": "unified",
+            "fields": {
+                "content": {
+                    "fragment_size": fragment_size,
+                    "number_of_fragments": fragments,
+                    "no_match_size": fragment_size
+                }
+            }
+        }
+    }
+    if cursor:
+        body["search_after"] = decode_cursor(cursor)
+    return body
+
+
+def format_search_response(response, size):
+    """Flattens an OpenSearch response into the `/api/search` payload."""
+    hits = response["hits"]["hits"]
+    results = [{
+        "file_name": hit["_source"]["file_name"],
+        "minio_path": hit["_source"]["minio_path"],
+        "page": hit["_source"]["page"],
+        "chunk": hit["_source"]["chunk"],
+        "score": hit["_score"],
+        "highlights": hit.get("highlight", {}).get("content", []),
+    } for hit in hits]
+    total = response["hits"].get("total", {})
+    return {
+        "results": results,
+        "total": total.get("value", len(results)),
+        "total_is_lower_bound": total.get("relation") == "gte",
+        "next_cursor": encode_cursor(hits[-1]["sort"]) if len(hits) == size else None,
+    }
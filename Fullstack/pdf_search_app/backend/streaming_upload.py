@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Streaming upload helpers: push a request body to MinIO chunk by chunk
+while spooling a copy for text extraction, so memory stays bounded by the
+MinIO part size plus the spool threshold instead of the file size. The
+SHA-256 of the body is computed on the same pass."""
+import hashlib
+import os
+import tempfile
+
+# MinIO requires parts of at least 5 MiB for multipart uploads of unknown length.
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 10 * 1024 * 1024
+DEFAULT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+def get_upload_settings():
+    """Reads upload tuning knobs from the environment."""
+    part_size = int(os.getenv('UPLOAD_PART_SIZE', DEFAULT_PART_SIZE))
+    if part_size < MIN_PART_SIZE:
+        raise ValueError(f"UPLOAD_PART_SIZE must be at least {MIN_PART_SIZE} bytes")
+    return {
+        'part_size': part_size,
+        'spool_max_size': int(os.getenv('UPLOAD_SPOOL_MAX_SIZE', DEFAULT_SPOOL_MAX_SIZE)),
+        'chunk_size': int(os.getenv('UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)),
+    }
+
+
+class TeeReader:
+    """File-like wrapper that copies everything read from `source` into `sink`.
+
+    MinIO pulls data through `read(size)`; every chunk handed to it is also
+    written to the spool and fed to the hasher, so the body is consumed
+    exactly once.
+    """
+
+    def __init__(self, source, sink, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.source = source
+        self.sink = sink
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self.hasher = hashlib.sha256()
+
+    def read(self, size=-1):
+        # Never let a caller pull an unbounded amount in one go.
+        if size is None or size < 0 or size > self.chunk_size:
+            size = self.chunk_size
+        chunk = self.source.read(size)
+        if chunk:
+            self.sink.write(chunk)
+            self.hasher.update(chunk)
+            self.bytes_read += len(chunk)
+        return chunk
+
+
+def stream_to_minio(minio_client, bucket, object_name, source,
+                    part_size=DEFAULT_PART_SIZE,
+                    spool_max_size=DEFAULT_SPOOL_MAX_SIZE,
+                    chunk_size=DEFAULT_CHUNK_SIZE,
+                    content_type='application/pdf'):
+    """Uploads `source` to MinIO as a multipart upload of unknown length.
+
+    Returns `(spool, length, sha256)`: `spool` is a `SpooledTemporaryFile`
+    rewound to the start (kept in memory up to `spool_max_size`, on disk
+    beyond that), `length` is the number of bytes uploaded and `sha256` the
+    hex digest of the body. The caller owns the spool and must close it.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+    tee = TeeReader(source, spool, chunk_size=chunk_size)
+    try:
+        minio_client.put_object(
+            bucket,
+            object_name,
+            tee,
+            length=-1,
+            part_size=part_size,
+            content_type=content_type
+        )
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, tee.bytes_read, tee.hasher.hexdigest()
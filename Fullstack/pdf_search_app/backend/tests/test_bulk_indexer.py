@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""`BulkIndexer` batching, byte limits and retries against `FakeOpenSearch`.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from bulk_indexer import BulkIndexer
+from fakes import FakeOpenSearch
+
+INDEX = 'docs'
+
+
+class RecordingOpenSearch(FakeOpenSearch):
+    """Remembers every `_bulk` body; `statuses` overrides the first replies' per-item status."""
+
+    def __init__(self, statuses=()):
+        super().__init__()
+        self.bodies = []
+        self.statuses = list(statuses)
+
+    def bulk(self, body, index=None, refresh=False):
+        self.bodies.append(body)
+        if not self.statuses:
+            return super().bulk(body, index=index, refresh=refresh)
+        status = self.statuses.pop(0)
+        if isinstance(status, Exception):
+            raise status
+        self.bulk_calls += 1
+        actions = [line for line in body.splitlines() if line.startswith('{"index"')]
+        return {'errors': True, 'items': [
+            {'index': {'status': status, 'error': {'type': f'status_{status}'}}} for _ in actions
+        ]}
+
+
+def documents(n, size=100):
+    return [(f'doc-{i}', {'content': 'x' * size}) for i in range(n)]
+
+
+def test_flushes_when_max_docs_is_reached():
+    client = RecordingOpenSearch()
+    indexer = BulkIndexer(client, INDEX, max_docs=10, flush_interval=0)
+
+    ticket = indexer.add_many(documents(25))
+
+    # A full buffer is flushed right away, in requests of at most max_docs.
+    assert ticket.wait(0)
+    assert [body.count('\n') // 2 for body in client.bodies] == [10, 10, 5]
+    indexer.close()
+    assert len(client.bodies) == 3
+    assert len(client.store[INDEX]) == 25
+    assert indexer.stats['docs_indexed'] == 25
+
+
+def test_batches_are_split_by_bytes():
+    client = RecordingOpenSearch()
+    indexer = BulkIndexer(client, INDEX, max_docs=1000, max_bytes=2000, flush_interval=0)
+
+    ticket = indexer.add_many(documents(20, size=300))
+    indexer.close()
+
+    assert ticket.wait(1)
+    assert len(client.bodies) > 1
+    assert all(len(body) <= 2000 for body in client.bodies)
+    assert sum(len(body) for body in client.bodies) == indexer.stats['bytes_sent']
+    assert len(client.store[INDEX]) == 20
+
+
+def test_document_larger_than_max_bytes_is_sent_alone():
+    client = RecordingOpenSearch()
+    indexer = BulkIndexer(client, INDEX, max_bytes=1000, flush_interval=0)
+
+    indexer.add_many(documents(1, size=50) + [('big', {'content': 'y' * 5000})] + documents(1, size=50))
+    indexer.close()
+
+    assert [body.count('\n') // 2 for body in client.bodies] == [1, 1, 1]
+    assert 'big' in client.store[INDEX]
+
+
+def test_retryable_items_are_resent():
+    client = RecordingOpenSearch(statuses=[429, ConnectionError('reset'), 503])
+    indexer = BulkIndexer(client, INDEX, flush_interval=0, max_retries=3, retry_backoff=0)
+
+    ticket = indexer.add_many(documents(5))
+    indexer.close()
+
+    assert ticket.wait(1)
+    assert len(client.store[INDEX]) == 5
+    assert indexer.stats['retries'] == 15
+    assert indexer.stats['docs_failed'] == 0
+
+
+def test_retries_give_up_after_max_retries():
+    client = RecordingOpenSearch(statuses=[429, 429, 429])
+    indexer = BulkIndexer(client, INDEX, flush_interval=0, max_retries=2, retry_backoff=0)
+
+    ticket = indexer.add_many(documents(3))
+    indexer.close()
+
+    assert ticket.wait(1) is False
+    assert [error['status'] for error in ticket.errors] == [429] * 3
+    assert len(client.bodies) == 3
+    assert client.store.get(INDEX) is None
+
+
+def test_non_retryable_items_fail_without_retry():
+    client = RecordingOpenSearch(statuses=[400])
+    indexer = BulkIndexer(client, INDEX, flush_interval=0, retry_backoff=0)
+
+    ticket = indexer.add_many(documents(2))
+    indexer.close()
+
+    assert not ticket.ok
+    assert len(ticket.errors) == 2
+    assert len(client.bodies) == 1
+    assert len(indexer.failures) == 2
+
+
+def test_delete_of_missing_document_counts_as_success():
+    client = RecordingOpenSearch()
+    indexer = BulkIndexer(client, INDEX, flush_interval=0)
+
+    indexer.add_many(documents(2))
+    ticket = indexer.write(delete_ids=['doc-0', 'never-indexed'])
+    indexer.close()
+
+    assert ticket.ok
+    assert list(client.store[INDEX]) == ['doc-1']
+    assert indexer.stats['docs_deleted'] == 2
+
+
+def test_periodic_flush_sends_a_partial_buffer():
+    client = RecordingOpenSearch()
+    indexer = BulkIndexer(client, INDEX, max_docs=100, flush_interval=0.05)
+    try:
+        assert indexer.add_many(documents(3)).wait(2)
+        assert client.bulk_calls == 1
+    finally:
+        indexer.close()
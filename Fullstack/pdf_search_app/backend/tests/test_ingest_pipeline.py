@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Upload -> extract -> chunk -> index through `IngestPipeline`, on the in-process fakes.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import io
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'benchmarks'))
+
+from bulk_indexer import BulkIndexer
+from dedup import FileRegistry
+from fakes import FakeMinio, FakeOpenSearch
+from ingest_pipeline import IngestPipeline
+from pdf_extraction import PdfExtractor
+from search_index import INDEX_BODY, build_chunk_documents
+from streaming_upload import stream_to_minio
+from synthetic_pdf import write_synthetic_pdf
+
+BUCKET = 'pdfs'
+INDEX = 'pdf_documents'
+FILES_INDEX = 'pdf_documents-files'
+
+
+@pytest.fixture
+def env(tmp_path):
+    minio = FakeMinio(str(tmp_path / 'minio'))
+    minio.make_bucket(BUCKET)
+    client = FakeOpenSearch()
+    client.indices.create(index=INDEX, body=INDEX_BODY)
+    registry = FileRegistry(client, FILES_INDEX)
+    registry.ensure_index()
+    indexer = BulkIndexer(client, INDEX, flush_interval=0.05)
+    extractor = PdfExtractor(max_workers=1)
+    pipeline = IngestPipeline(minio, indexer, extractor, BUCKET,
+                              build_documents=build_chunk_documents, registry=registry)
+    yield minio, client, registry, pipeline
+    pipeline.shutdown()
+    indexer.close()
+    extractor.shutdown()
+
+
+def pdf_bytes(tmp_path, num_pages, seed=0):
+    # Pages come from one RNG in order, so a shorter PDF is a prefix of a longer one.
+    path = tmp_path / f'synthetic-{num_pages}-{seed}.pdf'
+    write_synthetic_pdf(str(path), num_pages=num_pages, words_per_page=150, seed=seed)
+    return path.read_bytes()
+
+
+def upload(minio, pipeline, file_name, data):
+    """What `/api/upload` does in stream mode: store in MinIO, then submit."""
+    spool, length, sha256 = stream_to_minio(minio, BUCKET, file_name, io.BytesIO(data))
+    job_id = pipeline.submit(file_name, length, spool, sha256=sha256)
+    job = pipeline.wait(job_id, timeout=10)
+    assert job['status'] not in ('queued', 'extracting', 'chunking', 'indexing'), job
+    return job
+
+
+def chunks_of(client, file_name):
+    return sorted(doc_id for doc_id, source in client.store[INDEX].items()
+                  if source['file_name'] == file_name)
+
+
+def test_upload_is_stored_and_indexed_as_chunks(tmp_path, env):
+    minio, client, registry, pipeline = env
+    data = pdf_bytes(tmp_path, 3)
+
+    job = upload(minio, pipeline, 'report.pdf', data)
+
+    assert job['status'] == 'completed', job
+    assert minio.get_object(BUCKET, 'report.pdf').read() == data
+    ids = chunks_of(client, 'report.pdf')
+    assert job['chunks_written'] == len(ids) > 0
+    assert {doc_id.split(':')[1] for doc_id in ids} == {'1', '2', '3'}
+    record = registry.get('report.pdf')
+    assert record['sha256'] == job['sha256']
+    assert record['page_count'] == 3
+    assert sum(record['page_chunks']) == len(ids)
+
+
+def test_job_without_stream_is_fetched_from_minio(tmp_path, env):
+    minio, client, registry, pipeline = env
+    data = pdf_bytes(tmp_path, 2)
+    minio.put_object(BUCKET, 'stored.pdf', io.BytesIO(data), len(data))
+
+    job = pipeline.wait(pipeline.submit('stored.pdf', len(data)), timeout=10)
+
+    assert job['status'] == 'completed', job
+    assert job['sha256'] == registry.get('stored.pdf')['sha256']
+    assert len(chunks_of(client, 'stored.pdf')) == job['chunks_written'] > 0
+
+
+def test_reupload_of_same_bytes_is_skipped(tmp_path, env):
+    minio, client, registry, pipeline = env
+    data = pdf_bytes(tmp_path, 2)
+    upload(minio, pipeline, 'a.pdf', data)
+    bulk_calls = client.bulk_calls
+
+    again = upload(minio, pipeline, 'a.pdf', data)
+
+    assert again['status'] == 'skipped'
+    assert again['skipped_reason'] == 'unchanged'
+    assert client.bulk_calls == bulk_calls
+
+
+def test_same_bytes_under_another_name_point_at_the_original(tmp_path, env):
+    minio, client, registry, pipeline = env
+    data = pdf_bytes(tmp_path, 2)
+    upload(minio, pipeline, 'original.pdf', data)
+
+    copy = upload(minio, pipeline, 'copy.pdf', data)
+
+    assert copy['status'] == 'skipped'
+    assert copy['duplicate_of'] == 'original.pdf'
+    assert chunks_of(client, 'copy.pdf') == []
+    assert registry.get('copy.pdf')['duplicate_of'] == 'original.pdf'
+    assert registry.find_by_hash(copy['sha256'])['file_name'] == 'original.pdf'
+
+
+def test_changed_file_reindexes_only_changed_pages(tmp_path, env):
+    minio, client, registry, pipeline = env
+    upload(minio, pipeline, 'doc.pdf', pdf_bytes(tmp_path, 3))
+    before = chunks_of(client, 'doc.pdf')
+
+    # Page 4 is new; pages 1-3 are byte-for-byte the same text.
+    grown = upload(minio, pipeline, 'doc.pdf', pdf_bytes(tmp_path, 4))
+    after = chunks_of(client, 'doc.pdf')
+    added = [doc_id for doc_id in after if doc_id.split(':')[1] == '4']
+    assert grown['status'] == 'completed', grown
+    assert grown['chunks_written'] == len(added) > 0
+    assert grown['chunks_deleted'] == 0
+    assert sorted(before + added) == after
+
+    # Dropping page 4 again deletes its chunks and writes nothing.
+    shrunk = upload(minio, pipeline, 'doc.pdf', pdf_bytes(tmp_path, 3))
+    assert shrunk['status'] == 'completed', shrunk
+    assert shrunk['chunks_written'] == 0
+    assert shrunk['chunks_deleted'] == len(added)
+    assert chunks_of(client, 'doc.pdf') == before
+    assert registry.get('doc.pdf')['page_count'] == 3
+
+
+def test_rejected_chunks_fail_the_job(tmp_path, env):
+    minio, client, registry, pipeline = env
+
+    def reject(body, index=None, refresh=False):
+        actions = [line for line in body.splitlines() if line.startswith('{"index"')]
+        return {'errors': True, 'items': [
+            {'index': {'status': 400, 'error': {'type': 'mapper_parsing_exception'}}} for _ in actions
+        ]}
+
+    client.bulk = reject
+    job = upload(minio, pipeline, 'bad.pdf', pdf_bytes(tmp_path, 1))
+
+    assert job['status'] == 'failed'
+    assert 'mapper_parsing_exception' in job['error']
+    assert registry.get('bad.pdf') is None
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""`/api/search` pagination and highlighting, with `app.opensearch_client` swapped for `FakeOpenSearch`.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ.setdefault('MINIO_ENDPOINT', 'localhost:9000')
+os.environ['OPENSEARCH_INDEX'] = 'test_pdf_documents'
+os.environ['PDF_EXTRACT_WORKERS'] = '1'
+
+import app as backend
+from bulk_indexer import BulkIndexer
+from fakes import FakeOpenSearch
+from ingest_pipeline import IngestJob
+from pdf_extraction import _join_pages
+from search_index import INDEX_BODY, build_chunk_documents, encode_cursor
+
+INDEX = os.environ['OPENSEARCH_INDEX']
+
+
+@pytest.fixture
+def client(monkeypatch):
+    opensearch = FakeOpenSearch()
+    opensearch.indices.create(index=INDEX, body=INDEX_BODY)
+    indexer = BulkIndexer(opensearch, INDEX, flush_interval=0)
+    for n in range(3):
+        name = f'doc-{n}.pdf'
+        pages = [f"alpha beta page {page} of {name}\n" + "gamma " * page for page in range(1, 6)]
+        job = IngestJob(name, f'/pdfs/{name}', 0)
+        indexer.add_many(build_chunk_documents(job, _join_pages(pages), max_chars=40))
+    indexer.close()
+    monkeypatch.setattr(backend, 'opensearch_client', opensearch)
+    return backend.app.test_client()
+
+
+def search(client, **params):
+    response = client.get('/api/search', query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_pages_cover_every_match_exactly_once(client):
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {'q': 'gamma', 'size': 4}
+        if cursor:
+            params['cursor'] = cursor
+        payload = search(client, **params)
+        pages += 1
+        seen.extend((r['file_name'], r['page'], r['chunk']) for r in payload['results'])
+        scores = [r['score'] for r in payload['results']]
+        assert scores == sorted(scores, reverse=True)
+        cursor = payload['next_cursor']
+        if cursor is None:
+            break
+
+    everything = search(client, q='gamma', size=50)
+    assert everything['next_cursor'] is None
+    assert len(seen) == len(set(seen)) == everything['total'] == len(everything['results'])
+    # A full last page still gets a cursor; the page after it comes back empty.
+    assert pages == len(seen) // 4 + 1
+
+
+def test_results_carry_metadata_and_highlights_only(client):
+    payload = search(client, q='beta', size=2, fragment_size=30)
+
+    result = payload['results'][0]
+    assert set(result) == {'file_name', 'minio_path', 'page', 'chunk', 'score', 'highlights'}
+    assert result['minio_path'] == f"/pdfs/{result['file_name']}"
+    assert any('<em>beta</em>' in fragment for fragment in result['highlights'])
+    assert payload['next_cursor'] is not None
+
+
+def test_file_name_filter(client):
+    payload = search(client, q='alpha', size=50, file_name='doc-1.pdf')
+
+    assert {r['file_name'] for r in payload['results']} == {'doc-1.pdf'}
+    assert len(payload['results']) == 5
+
+
+def test_page_size_is_capped(client):
+    payload = search(client, q='gamma', size=10000)
+
+    assert len(payload['results']) <= 50
+
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'q': '  '},
+    {'q': 'gamma', 'cursor': 'not a cursor'},
+    {'q': 'gamma', 'cursor': encode_cursor([1.0])},
+])
+def test_bad_requests(client, params):
+    assert client.get('/api/search', query_string=params).status_code == 400
@@ -1,8 +1,13 @@
 
-from flask import Flask, jsonify, request
+import json
+
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import redis
-import uuid
+
+from scheduler import DEFAULT_PRIORITY, DEFAULT_TENANT
+from status_events import StatusHub
+from task_queue import task_queue_from_env
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from the React frontend
@@ -10,39 +15,183 @@ CORS(app)  # Allow requests from the React frontend
 # Connect to our Redis instance
 # Make sure to use the correct port if you changed it
 redis_client = redis.Redis(host='localhost', port=6380, db=0, decode_responses=True)
+# Status TTLs / compact results come from the environment, like in worker.py
+task_queue = task_queue_from_env(redis_client)
+# One pub/sub subscription for all the clients of this process (see status_events.py)
+status_hub = StatusHub(redis_client, task_queue.events_channel)
+
+MAX_STATUS_IDS = 1000
+SSE_KEEPALIVE_SECONDS = 15
+MAX_BATCH_TASKS = 1000
+MAX_IDEMPOTENCY_KEY_LENGTH = 200
+TASK_TYPES = ("default", "checksum") # The handlers registered in worker.py
+MAX_CHECKSUM_ROUNDS = 1_000_000 # Same bound as worker.py
+
+
+def _invalid_task_ids(task_ids):
+    """Returns an error response unless `task_ids` is a non-empty list of at most MAX_STATUS_IDS strings."""
+    if not isinstance(task_ids, list) or not task_ids or not all(isinstance(i, str) for i in task_ids):
+        return jsonify({"error": "Expected a non-empty list of task ids"}), 400
+    if len(task_ids) > MAX_STATUS_IDS:
+        return jsonify({"error": f"At most {MAX_STATUS_IDS} task ids per request"}), 400
+    return None
+
+
+def _invalid_idempotency_key(key):
+    return key is not None and (not isinstance(key, str) or not 0 < len(key) <= MAX_IDEMPOTENCY_KEY_LENGTH)
+
+
+def _json_object():
+    """The request's JSON body (`{}` if there is none), or None if it is not an object."""
+    body = request.get_json(silent=True)
+    if body is None:
+        return {}
+    return body if isinstance(body, dict) else None
+
+
+def _invalid_payload(task_type, payload):
+    """Returns an error message for a payload the task type's handler cannot run."""
+    if not isinstance(payload, dict):
+        return "A task payload must be an object"
+    if task_type == "checksum":
+        rounds = payload.get("rounds", 0)
+        if not isinstance(rounds, int) or isinstance(rounds, bool) or not 0 <= rounds <= MAX_CHECKSUM_ROUNDS:
+            return f"checksum rounds must be an integer from 0 to {MAX_CHECKSUM_ROUNDS}"
+    return None
 
 @app.route('/api/start-task', methods=['POST'])
 def start_task():
-    # 1. Generate a unique ID for the task
-    task_id = str(uuid.uuid4())
+    # 1. Queue the task and set its initial status in one round trip
+    #    (a versioned JSON envelope in the tenant's lane, status in a hash; see task_queue.py).
+    #    The tenant comes from the X-Tenant-Id header; the optional JSON body may set
+    #    "priority" (high / normal / low) and "cost" (relative work, for fair share).
+    #    A retry that sends the same Idempotency-Key header gets the first task's ID back.
+    body = _json_object()
+    if body is None:
+        return jsonify({"error": "The request body must be a JSON object"}), 400
+    key = request.headers.get('Idempotency-Key')
+    if _invalid_idempotency_key(key):
+        return jsonify({"error": f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters"}), 400
+    try:
+        [(task_id, _)] = task_queue.enqueue_idempotent(
+            [("default", {"message": "Starting a new background task..."})], [key],
+            tenant=request.headers.get('X-Tenant-Id', DEFAULT_TENANT),
+            priority=body.get('priority', DEFAULT_PRIORITY), cost=body.get('cost', 1))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # 2. Create a task object (can be more complex)
-    task_data = {
-        "id": task_id,
-        "message": "Starting a new background task..."
-    }
+    # 2. Immediately return the task ID to the client
+    return jsonify({"task_id": task_id}), 202
 
-    # 3. Push the task to the Redis queue (a list)
-    redis_client.lpush('tasks:queue', str(task_data))
+@app.route('/api/tasks/batch', methods=['POST'])
+def start_tasks():
+    # Many tasks in one request and one Redis round trip:
+    #   {"tasks": [{"type": "default", "payload": {...}, "idempotency_key": "..."}, ...],
+    #    "priority": "normal", "cost": 1}
+    # Every field but "tasks" is optional. A task whose idempotency key this tenant already
+    # used is not queued again: its entry gets the ID of the first task and "duplicate": true.
+    body = _json_object()
+    if body is None:
+        return jsonify({"error": "The request body must be a JSON object"}), 400
+    tasks = body.get('tasks')
+    if not isinstance(tasks, list) or not tasks or not all(isinstance(t, dict) for t in tasks):
+        return jsonify({"error": "Expected a non-empty list of tasks"}), 400
+    if len(tasks) > MAX_BATCH_TASKS:
+        return jsonify({"error": f"At most {MAX_BATCH_TASKS} tasks per request"}), 400
+    for task in tasks:
+        if task.get('type', 'default') not in TASK_TYPES:
+            return jsonify({"error": f"Unknown task type, expected one of {TASK_TYPES}"}), 400
+        error = _invalid_payload(task.get('type', 'default'), task.get('payload', {}))
+        if error:
+            return jsonify({"error": error}), 400
+        if _invalid_idempotency_key(task.get('idempotency_key')):
+            return jsonify({"error": f"idempotency_key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters"}), 400
 
-    # 4. Set the initial status in Redis (a hash)
-    redis_client.hset(f"task_status:{task_id}", mapping={
-        "status": "queued",
-        "message": "Task is waiting in the queue."
-    })
+    try:
+        queued = task_queue.enqueue_idempotent(
+            [(task.get('type', 'default'), task.get('payload', {})) for task in tasks],
+            [task.get('idempotency_key') for task in tasks],
+            tenant=request.headers.get('X-Tenant-Id', DEFAULT_TENANT),
+            priority=body.get('priority', DEFAULT_PRIORITY), cost=body.get('cost', 1))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # 5. Immediately return the task ID to the client
-    return jsonify({"task_id": task_id}), 202
+    return jsonify({"tasks": [{"task_id": task_id, "duplicate": not new} for task_id, new in queued]}), 202
 
 @app.route('/api/task-status/<task_id>', methods=['GET'])
 def get_task_status(task_id):
     # Query Redis for the status of the given task ID
-    status_data = redis_client.hgetall(f"task_status:{task_id}")
+    status_data = task_queue.get_status(task_id)
 
     if not status_data:
         return jsonify({"error": "Task not found"}), 404
 
     return jsonify(status_data)
 
+@app.route('/api/task-status', methods=['POST'])
+def get_task_statuses():
+    # Batch status for clients that must poll: {"task_ids": [...]}, all read in one round trip
+    task_ids = (_json_object() or {}).get("task_ids")
+    error = _invalid_task_ids(task_ids)
+    if error:
+        return error
+
+    statuses = task_queue.get_statuses(task_ids)
+    return jsonify({"statuses": {task_id: status or None for task_id, status in zip(task_ids, statuses)}})
+
+@app.route('/api/tasks', methods=['GET'])
+def list_finished_tasks():
+    # Finished tasks, newest first: ?limit=50, then ?before=<next_before> for the next page.
+    # The cursor is "<finished_at>:<task_id>"; a bare number lists tasks finished before it.
+    try:
+        limit = min(int(request.args.get('limit', 50)), MAX_STATUS_IDS)
+        before = request.args.get('before')
+        if before is not None:
+            finished_at, _, task_id = before.partition(':')
+            before = (float(finished_at), task_id) if task_id else float(finished_at)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer and before a cursor from next_before"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+
+    page, cursor = task_queue.list_finished(limit, before)
+    statuses = task_queue.get_statuses([task_id for task_id, _ in page])
+    # Index entries can outlive their status by up to one sweep
+    tasks = [dict(status, id=task_id) for (task_id, _), status in zip(page, statuses) if status]
+    next_before = f"{cursor[0]!r}:{cursor[1]}" if cursor else None
+    return jsonify({"tasks": tasks, "next_before": next_before})
+
+@app.route('/api/queue-metrics', methods=['GET'])
+def queue_metrics():
+    # Ready tasks per priority / tenant: depth and age of the oldest, for dashboards and alerts
+    return jsonify({"lanes": task_queue.scheduler.metrics()})
+
+@app.route('/api/task-events', methods=['GET'])
+def task_events():
+    # Server-Sent Events for ?task_id=...&task_id=...: the current status of each task, then
+    # every change pushed by the worker, until all of them have completed or failed
+    task_ids = request.args.getlist('task_id')
+    error = _invalid_task_ids(task_ids)
+    if error:
+        return error
+
+    updates = status_hub.watch(task_ids, task_queue.get_statuses, keepalive=SSE_KEEPALIVE_SECONDS)
+    try:
+        first = next(updates) # Subscribes and reads the current statuses before answering
+    except redis.ConnectionError:
+        return jsonify({"error": "Status events are unavailable, poll /api/task-status instead"}), 503
+
+    def stream():
+        try:
+            yield f"data: {json.dumps(first)}\n\n"
+            for update in updates:
+                # A comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n" if update is None else f"data: {json.dumps(update)}\n\n"
+        finally:
+            updates.close() # Client gone: stop watching
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001) # Running on a different port than default 5000
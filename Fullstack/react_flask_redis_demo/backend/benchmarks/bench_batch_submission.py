@@ -0,0 +1,108 @@
+"""
+Tasks/sec submitted through the Flask app: `POST /api/start-task` per task vs. `POST
+/api/tasks/batch`, and retries of a batch with idempotency keys.
+
+`--clients` threads submit `--tasks` tasks between them through the app's test client
+(no sockets, so this measures the app and Redis, not HTTP):
+
+- single: one `POST /api/start-task` per task;
+- batch:  `POST /api/tasks/batch` with `--batch-size` tasks per request, each with an
+  idempotency key;
+- retry:  every batch sent again (a client that timed out and retried), which must return
+  the same ids and queue nothing.
+
+Checks that the queue then holds exactly one task per submitted task.
+
+Runs against an in-process fakeredis by default (`pip install fakeredis lupa`), or a real
+Redis with `--redis-url` (the keys used are deleted afterwards).
+
+Usage:
+    python benchmarks/bench_batch_submission.py --tasks 20000 --batch-size 500
+    python benchmarks/bench_batch_submission.py --redis-url redis://localhost:6380/15
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as backend
+from task_queue import TaskQueue
+
+QUEUE = "bench:tasks:queue"
+STATUS_PREFIX = "bench:task_status:"
+
+
+def reset(redis_client):
+    for key in redis_client.scan_iter(match="bench:*", count=1000):
+        redis_client.delete(key)
+
+
+def submit_single(n):
+    client = backend.app.test_client()
+    ids = []
+    for _ in range(n):
+        response = client.post("/api/start-task")
+        assert response.status_code == 202
+        ids.append(response.get_json()["task_id"])
+    return ids
+
+
+def submit_batch(keys):
+    client = backend.app.test_client()
+    tasks = [{"payload": {"message": "Starting a new background task..."}, "idempotency_key": key} for key in keys]
+    response = client.post("/api/tasks/batch", json={"tasks": tasks})
+    assert response.status_code == 202
+    return [task["task_id"] for task in response.get_json()["tasks"]]
+
+
+def timed(label, fn, jobs, clients, n, requests):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(fn, jobs))
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<8} {n:>8} {requests:>9} {n / elapsed:>10.0f} {elapsed:>8.2f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single vs. batch task submission benchmark.")
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        import fakeredis
+        redis_client = fakeredis.FakeRedis(decode_responses=True)
+    task_queue = TaskQueue(redis_client, queue_key=QUEUE, status_prefix=STATUS_PREFIX)
+    backend.redis_client = redis_client
+    backend.task_queue = task_queue
+
+    clients = args.clients
+    n = args.tasks // clients * clients
+    print(f"{n} tasks from {clients} clients")
+    print(f"  {'mode':<8} {'tasks':>8} {'requests':>9} {'tasks/s':>10} {'seconds':>8}")
+    reset(redis_client)
+    timed("single", submit_single, [n // clients] * clients, clients, n, n)
+    assert task_queue.scheduler.depth() == n
+
+    reset(redis_client)
+    keys = [f"job-{i}" for i in range(n)]
+    batches = [keys[start:start + args.batch_size] for start in range(0, n, args.batch_size)]
+    first = timed("batch", submit_batch, batches, clients, n, len(batches))
+    again = timed("retry", submit_batch, batches, clients, n, len(batches))
+    assert again == first, "a retry returned different task ids"
+    assert task_queue.scheduler.depth() == n, "a retry queued duplicates"
+    print(f"  retried batches returned the same {n} ids and queued nothing")
+    reset(redis_client)
+
+
+if __name__ == "__main__":
+    main()
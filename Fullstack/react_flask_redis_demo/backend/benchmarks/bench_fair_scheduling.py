@@ -0,0 +1,140 @@
+"""
+Per-tenant latency under a skewed load: one FIFO queue vs. fair-share scheduling.
+
+Tenant "bulk" queues a burst of `--bulk-tasks` long tasks (cost `--bulk-cost`, each
+sleeping `--bulk-cost` x `--task-ms`) just before tenants "a" and "b" queue
+`--small-tasks` short ones (cost 1) each, and a few "high" priority tasks arrive last.
+A `WorkerRuntime` with `--concurrency` handlers runs them all:
+
+- fifo: every task in one tenant, so the short tasks wait behind the whole burst;
+- fair: each tenant in its own lane; tenants take turns by cost (`scheduler.py`).
+
+Reports enqueue -> finished latency percentiles per tenant, and checks that in fair mode
+the short tasks finish well before the bulk burst does and the high priority tasks run
+first.
+
+Runs against an in-process fakeredis by default (`pip install fakeredis lupa`), or a real
+Redis >= 6.2 with `--redis-url` (the keys used are deleted afterwards).
+
+Usage:
+    python benchmarks/bench_fair_scheduling.py --bulk-tasks 400 --small-tasks 100
+    python benchmarks/bench_fair_scheduling.py --redis-url redis://localhost:6380/15
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import DEFAULT_TENANT
+from task_queue import TaskQueue
+from worker_runtime import HandlerRegistry, WorkerRuntime
+
+QUEUE = "bench:tasks:queue"
+STATUS_PREFIX = "bench:task_status:"
+HIGH_TASKS = 10
+
+
+async def run_until(runtime, done):
+    async def monitor():
+        while not done(runtime):
+            await asyncio.sleep(0.01)
+        runtime.stop()
+
+    watcher = asyncio.create_task(monitor())
+    await runtime.serve()
+    await watcher
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def reset(redis_client):
+    for key in redis_client.scan_iter(match="bench:*", count=1000):
+        redis_client.delete(key)
+
+
+def make_registry(task_seconds):
+    registry = HandlerRegistry()
+
+    @registry.handler("work")
+    async def work(task):
+        # Takes time in proportion to its declared cost
+        await asyncio.sleep(task.payload["cost"] * task_seconds)
+
+    return registry
+
+
+def run(mode, redis_client, task_queue, args):
+    reset(redis_client)
+    # (tenant, priority, cost, count), queued in this order
+    load = [("bulk", "normal", args.bulk_cost, args.bulk_tasks),
+            ("a", "normal", 1, args.small_tasks),
+            ("b", "normal", 1, args.small_tasks),
+            ("c", "high", 1, HIGH_TASKS)]
+    tenant_of = {}
+    enqueued_at = time.time()
+    for tenant, priority, cost, count in load:
+        ids = task_queue.enqueue_many([("work", {"cost": cost})] * count,
+                                      tenant=DEFAULT_TENANT if mode == "fifo" else tenant,
+                                      priority="normal" if mode == "fifo" else priority, cost=cost)
+        tenant_of.update((task_id, tenant) for task_id in ids)
+
+    runtime = WorkerRuntime(task_queue, make_registry(args.task_ms / 1000), concurrency=args.concurrency)
+    start = time.perf_counter()
+    asyncio.run(run_until(runtime, lambda r: r.stats["completed"] >= len(tenant_of)))
+    elapsed = time.perf_counter() - start
+
+    latencies = {}
+    for task_id, status in zip(tenant_of, task_queue.get_statuses(list(tenant_of))):
+        assert status["status"] == "completed"
+        latencies.setdefault(tenant_of[task_id], []).append(float(status["finished_at"]) - enqueued_at)
+    for tenant, _, cost, count in load:
+        values = sorted(latencies[tenant])
+        print(f"  {mode:<5} {tenant:<5} {cost:>5} {count:>6} {percentile(values, 0.5) * 1000:>9.0f} "
+              f"{percentile(values, 0.95) * 1000:>9.0f} {percentile(values, 0.99) * 1000:>9.0f} "
+              f"{values[-1] * 1000:>9.0f}")
+    print(f"  {mode:<5} all {len(tenant_of)} tasks in {elapsed:.1f}s")
+    return {tenant: sorted(values) for tenant, values in latencies.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fair-share scheduling benchmark.")
+    parser.add_argument("--bulk-tasks", type=int, default=400)
+    parser.add_argument("--bulk-cost", type=int, default=10)
+    parser.add_argument("--small-tasks", type=int, default=100)
+    parser.add_argument("--task-ms", type=float, default=5.0, help="duration of one cost unit")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        import fakeredis
+        redis_client = fakeredis.FakeRedis(decode_responses=True)
+    task_queue = TaskQueue(redis_client, queue_key=QUEUE, status_prefix=STATUS_PREFIX)
+
+    print(f"{args.bulk_tasks} bulk tasks of {args.bulk_cost * args.task_ms:.0f} ms, then "
+          f"{args.small_tasks} tasks of {args.task_ms:.0f} ms from each of a and b, "
+          f"{HIGH_TASKS} high priority from c; concurrency {args.concurrency}")
+    print(f"  {'mode':<5} {'tenant':<5} {'cost':>5} {'tasks':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'max ms':>9}")
+    fifo = run("fifo", redis_client, task_queue, args)
+    fair = run("fair", redis_client, task_queue, args)
+
+    for tenant in ("a", "b"):
+        assert percentile(fair[tenant], 0.99) < percentile(fair["bulk"], 0.5), f"{tenant} waited for the burst"
+    assert fair["c"][-1] < percentile(fair["a"], 0.5), "high priority tasks did not run first"
+    print(f"  short tasks p99: {percentile(fifo['a'], 0.99) * 1000:.0f} ms fifo -> "
+          f"{percentile(fair['a'], 0.99) * 1000:.0f} ms fair; bulk max "
+          f"{fifo['bulk'][-1] * 1000:.0f} -> {fair['bulk'][-1] * 1000:.0f} ms")
+    reset(redis_client)
+
+
+if __name__ == "__main__":
+    main()
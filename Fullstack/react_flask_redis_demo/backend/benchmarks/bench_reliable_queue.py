@@ -0,0 +1,175 @@
+"""
+Reliability check for the task queue: crashed workers, flaky handlers, hung handlers.
+
+1. Crash: a worker takes `--crash-batch` tasks and dies without finishing them. With an
+   at-most-once pop (`dequeue()`, like the old `BRPOP` consumer) those tasks are gone; with
+   `reserve()` they sit in
+   the dead worker's processing list until its heartbeat expires and a healthy worker's
+   reaper re-queues them. Reports lost tasks and how long recovery took.
+2. Flaky handlers: every attempt fails with probability `--fail-rate` (and `--hang-rate`
+   of the attempts hang past `task_timeout`). Every task must end up either completed or
+   dead-lettered after `max_attempts` attempts; reports retries and the dead-letter count
+   against the count predicted from the (seeded) failure rolls.
+
+Runs against an in-process fakeredis by default (`pip install fakeredis lupa`), or a real
+Redis >= 6.2 with `--redis-url` (the keys used are deleted afterwards).
+
+Usage:
+    python benchmarks/bench_reliable_queue.py --tasks 2000 --fail-rate 0.3
+    python benchmarks/bench_reliable_queue.py --redis-url redis://localhost:6380/15
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_queue import TaskQueue
+from worker_runtime import HandlerRegistry, WorkerRuntime
+
+QUEUE = "bench:tasks:queue"
+STATUS_PREFIX = "bench:task_status:"
+
+
+async def run_until(runtime, done, limit=120):
+    async def monitor():
+        deadline = time.monotonic() + limit
+        while not done(runtime) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        runtime.stop()
+
+    watcher = asyncio.create_task(monitor())
+    await runtime.serve()
+    await watcher
+
+
+def reset(redis_client):
+    for key in redis_client.scan_iter(match="bench:*", count=1000):
+        redis_client.delete(key)
+
+
+def statuses(redis_client, task_queue, ids):
+    pipe = redis_client.pipeline(transaction=False)
+    for task_id in ids:
+        pipe.hget(task_queue.status_key(task_id), "status")
+    return pipe.execute()
+
+
+def ok_registry():
+    registry = HandlerRegistry()
+
+    @registry.handler("io")
+    async def io_task(task):
+        await asyncio.sleep(0.001)
+
+    return registry
+
+
+def check_crash_brpop(redis_client, task_queue, args):
+    reset(redis_client)
+    ids = task_queue.enqueue_many([("io", {})] * args.tasks)
+    for _ in range(args.crash_batch):
+        task_queue.dequeue(timeout=1) # Popped, then the worker dies
+    runtime = WorkerRuntime(task_queue, ok_registry(), concurrency=64)
+    asyncio.run(run_until(runtime, lambda r: task_queue.scheduler.depth() == 0
+                          and r.stats["fetched"] == r.stats["completed"]))
+    lost = sum(1 for status in statuses(redis_client, task_queue, ids) if status != "completed")
+    print(f"  {'pop (dequeue)':<18} {lost:>6} of {args.tasks} tasks lost")
+
+
+def check_crash_reliable(redis_client, task_queue, args):
+    reset(redis_client)
+    ids = task_queue.enqueue_many([("io", {})] * args.tasks)
+    task_queue.register_worker("crashed", args.visibility_timeout)
+    task_queue.reserve("crashed", args.crash_batch) # Reserved, then the worker dies
+    crashed_at = time.monotonic()
+    runtime = WorkerRuntime(task_queue, ok_registry(), concurrency=64, maintenance_interval=0.1,
+                            visibility_timeout=args.visibility_timeout)
+    asyncio.run(run_until(runtime, lambda r: r.stats["completed"] >= len(ids)))
+    recovered_after = time.monotonic() - crashed_at
+    lost = sum(1 for status in statuses(redis_client, task_queue, ids) if status != "completed")
+    assert lost == 0, f"{lost} tasks lost"
+    assert runtime.stats["reaped"] == args.crash_batch
+    assert redis_client.llen(task_queue.processing_key("crashed")) == 0
+    print(f"  {'reserve':<18} {lost:>6} of {args.tasks} tasks lost, {runtime.stats['reaped']} reaped, "
+          f"all done {recovered_after:.1f}s after the crash (visibility timeout {args.visibility_timeout}s)")
+
+
+def roll(task_id, attempt):
+    # Deterministic per (task, attempt), so the dead letters can be predicted exactly.
+    return random.Random(f"{task_id}:{attempt}").random()
+
+
+def flaky_task(fail_rate, hang_rate):
+    async def handler(task):
+        roll_ = roll(task.id, task.attempt)
+        if roll_ < hang_rate:
+            await asyncio.sleep(3600)
+        if roll_ < hang_rate + fail_rate:
+            raise RuntimeError("flaky dependency")
+        await asyncio.sleep(0.001)
+    return handler
+
+
+def check_flaky(redis_client, task_queue, args):
+    reset(redis_client)
+    registry = HandlerRegistry()
+    registry.handler("flaky")(flaky_task(args.fail_rate, args.hang_rate))
+    ids = task_queue.enqueue_many([("flaky", {})] * args.tasks)
+    runtime = WorkerRuntime(task_queue, registry, concurrency=64, maintenance_interval=0.05,
+                            max_attempts=args.max_attempts, retry_base_delay=0.02, retry_max_delay=0.5,
+                            task_timeout=args.task_timeout)
+    start = time.perf_counter()
+    asyncio.run(run_until(runtime, lambda r: r.stats["completed"] + r.stats["dead_lettered"] >= len(ids)))
+    elapsed = time.perf_counter() - start
+
+    final = statuses(redis_client, task_queue, ids)
+    completed, failed = final.count("completed"), final.count("failed")
+    dead = redis_client.llen(task_queue.dead_key)
+    assert completed + failed == len(ids), f"{len(ids) - completed - failed} tasks neither completed nor failed"
+    assert dead == failed == runtime.stats["dead_lettered"]
+    assert redis_client.zcard(task_queue.delayed_key) == 0
+    p = args.fail_rate + args.hang_rate
+    expected = sum(all(roll(task_id, attempt) < p for attempt in range(args.max_attempts)) for task_id in ids)
+    assert dead == expected, f"{dead} dead-lettered, the rolls say {expected}"
+    print(f"  {completed} completed, {runtime.stats['retried']} retries, {dead} dead-lettered "
+          f"(as the rolls predict; ~{len(ids) * p ** args.max_attempts:.0f} on average), {elapsed:.1f}s")
+    sample = task_queue.dead_letters(0, 0)
+    if sample:
+        print(f"  dead letter: {sample[0]['error']!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reliable task queue check.")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--crash-batch", type=int, default=100, help="tasks held by the crashed worker")
+    parser.add_argument("--visibility-timeout", type=int, default=2)
+    parser.add_argument("--fail-rate", type=float, default=0.3)
+    parser.add_argument("--hang-rate", type=float, default=0.02)
+    parser.add_argument("--task-timeout", type=float, default=0.2)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        import fakeredis
+        redis_client = fakeredis.FakeRedis(decode_responses=True)
+    task_queue = TaskQueue(redis_client, queue_key=QUEUE, status_prefix=STATUS_PREFIX)
+
+    print(f"worker crash holding {args.crash_batch} of {args.tasks} tasks:")
+    check_crash_brpop(redis_client, task_queue, args)
+    check_crash_reliable(redis_client, task_queue, args)
+    print(f"flaky handlers ({args.fail_rate:.0%} fail, {args.hang_rate:.0%} hang, "
+          f"max {args.max_attempts} attempts, timeout {args.task_timeout}s):")
+    check_flaky(redis_client, task_queue, args)
+    reset(redis_client)
+
+
+if __name__ == "__main__":
+    main()
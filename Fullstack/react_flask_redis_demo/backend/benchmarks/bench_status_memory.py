@@ -0,0 +1,172 @@
+"""
+Redis memory held by finished tasks: plain status hashes vs. `compact_results`, and retention.
+
+For each configuration `--tasks` tasks are queued with `enqueue_many()`, reserved,
+marked processing and completed through `TaskQueue`, exactly the writes the worker makes.
+With `--redis-url` the report is `INFO memory` `used_memory` before / after (plus
+`MEMORY USAGE` of one status key); fakeredis cannot report memory, so there the report is
+the bytes of keys, fields and values stored, which is the part compaction changes.
+
+Then checks retention: every status key has a TTL, `list_finished()` pages through every
+task exactly once, `sweep()` gives a TTL to status keys written without one, and with a
+short `result_ttl` the keys and index entries are gone after it passed.
+
+Usage:
+    python benchmarks/bench_status_memory.py --tasks 20000
+    python benchmarks/bench_status_memory.py --redis-url redis://localhost:6380/15 --tasks 1000000
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_queue import TaskQueue, completed_message, decode_task
+
+QUEUE = "bench:tasks:queue"
+STATUS_PREFIX = "bench:task_status:"
+RESULT_PREFIX = "bench:task_result:"
+BATCH = 1000
+
+
+def reset(redis_client):
+    for key in redis_client.scan_iter(match="bench:*", count=1000):
+        redis_client.delete(key)
+
+
+def make_queue(redis_client, **kwargs):
+    return TaskQueue(redis_client, queue_key=QUEUE, status_prefix=STATUS_PREFIX, result_prefix=RESULT_PREFIX, **kwargs)
+
+
+def run_batch(task_queue, worker_id):
+    task_queue.enqueue_many([("default", {"message": "Starting a new background task..."})] * BATCH)
+    # Completes as many tasks as it queued, whichever batch queued them.
+    ids = []
+    while len(ids) < BATCH:
+        for raw in task_queue.reserve(worker_id, BATCH - len(ids)):
+            task_id = decode_task(raw).id
+            started_at = time.time()
+            task_queue.set_status(task_id, "processing", "Task is being processed.", started_at=started_at)
+            task_queue.complete(worker_id, raw, task_id, completed_message(task_id),
+                                started_at=started_at, finished_at=time.time())
+            ids.append(task_id)
+    return ids
+
+
+def run_tasks(task_queue, n):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        batches = pool.map(lambda b: run_batch(task_queue, f"bench-{b}"), range(max(1, n // BATCH)))
+        return [task_id for ids in batches for task_id in ids]
+
+
+def stored_bytes(redis_client):
+    """Bytes of every bench key name, field and value (fakeredis has no memory reporting)."""
+    total = 0
+    keys = list(redis_client.scan_iter(match="bench:task_*", count=1000))
+    for start in range(0, len(keys), 1000):
+        chunk = keys[start:start + 1000]
+        pipe = redis_client.pipeline(transaction=False)
+        for key in chunk:
+            pipe.type(key)
+        types = pipe.execute()
+        pipe = redis_client.pipeline(transaction=False)
+        for key, kind in zip(chunk, types):
+            pipe.hgetall(key) if kind == "hash" else pipe.get(key)
+        for key, value in zip(chunk, pipe.execute()):
+            items = value.items() if isinstance(value, dict) else [("", value)]
+            total += len(key) + sum(len(f) + len(v) for f, v in items)
+    return total
+
+
+def used_memory(redis_client):
+    return redis_client.info("memory")["used_memory"]
+
+
+def measure(label, redis_client, real, n, **kwargs):
+    reset(redis_client)
+    task_queue = make_queue(redis_client, **kwargs)
+    before = used_memory(redis_client) if real else 0
+    start = time.perf_counter()
+    ids = run_tasks(task_queue, n)
+    elapsed = time.perf_counter() - start
+    if real:
+        key = task_queue.result_key(ids[0]) if kwargs.get("compact_results") else task_queue.status_key(ids[0])
+        used = used_memory(redis_client) - before
+        print(f"  {label:<22} {used / 2 ** 20:>9.1f} MiB used_memory  {used / len(ids):>6.0f} B/task  "
+              f"MEMORY USAGE {redis_client.memory_usage(key)} B  ({len(ids) / elapsed:.0f} tasks/s)")
+    else:
+        stored = stored_bytes(redis_client)
+        print(f"  {label:<22} {stored / 2 ** 20:>9.1f} MiB stored  {stored / len(ids):>6.0f} B/task  "
+              f"({len(ids) / elapsed:.0f} tasks/s)")
+    return task_queue, ids
+
+
+def check_retention(redis_client, task_queue, ids):
+    pipe = redis_client.pipeline(transaction=False)
+    for task_id in ids:
+        pipe.ttl(task_queue.result_key(task_id) if task_queue.compact_results else task_queue.status_key(task_id))
+    assert all(ttl > 0 for ttl in pipe.execute()), "a finished task has no TTL"
+
+    listed, before = [], None
+    while True:
+        page, before = task_queue.list_finished(limit=500, before=before)
+        listed.extend(page)
+        if before is None:
+            break
+    assert sorted(task_id for task_id, _ in listed) == sorted(ids), "paging lost or repeated tasks"
+    assert all(a[1] >= b[1] for a, b in zip(listed, listed[1:])), "pages not newest first"
+    print(f"  every status key has a TTL; {len(listed)} tasks listed in {len(ids) // 500 + 1} pages")
+
+    # Status hashes left by the old code, without a TTL.
+    legacy = [f"{STATUS_PREFIX}legacy-{i}" for i in range(2000)]
+    pipe = redis_client.pipeline(transaction=False)
+    for key in legacy:
+        pipe.hset(key, mapping={"status": "completed", "message": "done"})
+    pipe.execute()
+    added = 0
+    while True:
+        added += task_queue.sweep(batch=1000)[1]
+        if int(redis_client.get(task_queue.sweep_cursor_key)) == 0:
+            break
+    assert added == len(legacy) and all(redis_client.ttl(key) > 0 for key in legacy)
+    print(f"  one sweep pass gave {added} legacy status keys a TTL")
+
+
+def check_expiry(redis_client):
+    reset(redis_client)
+    task_queue = make_queue(redis_client, status_ttl=60, result_ttl=1, compact_results=True)
+    ids = run_tasks(task_queue, BATCH)
+    time.sleep(1.5)
+    trimmed, _ = task_queue.sweep()
+    remaining = sum(task_queue.redis.exists(task_queue.result_key(task_id)) for task_id in ids)
+    assert remaining == 0 and trimmed == len(ids) and task_queue.list_finished()[0] == []
+    print(f"  result_ttl=1s: all {len(ids)} results expired, sweep trimmed {trimmed} index entries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task status memory benchmark.")
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        import fakeredis
+        redis_client = fakeredis.FakeRedis(decode_responses=True)
+
+    print(f"{args.tasks} finished tasks:")
+    measure("hash, no TTL (before)", redis_client, args.redis_url, args.tasks)
+    measure("hash + TTL", redis_client, args.redis_url, args.tasks, status_ttl=7 * 86400, result_ttl=86400)
+    task_queue, ids = measure("compact + TTL", redis_client, args.redis_url, args.tasks,
+                              status_ttl=7 * 86400, result_ttl=86400, compact_results=True)
+    check_retention(redis_client, task_queue, ids)
+    check_expiry(redis_client)
+    reset(redis_client)
+
+
+if __name__ == "__main__":
+    main()
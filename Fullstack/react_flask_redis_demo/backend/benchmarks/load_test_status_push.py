@@ -0,0 +1,177 @@
+"""
+Redis load of task status polling vs. push (Server-Sent Events), through the Flask app.
+
+`--clients` clients each start a task with `POST /api/start-task` and wait for it to
+complete, while a `WorkerRuntime` runs the tasks (`--task-seconds` each):
+
+- poll:  `GET /api/task-status/<id>` every `--poll-ms` (one `HGETALL` each);
+- batch: clients watching `--batch-size` tasks each poll `POST /api/task-status` (one round
+  trip per poll instead of one per task, but still one `HGETALL` per task);
+- push:  `GET /api/task-events?task_id=<id>` and read the stream until "completed".
+
+Reports the Redis commands executed during each run (total, per second, status reads and
+publishes; the worker's own commands are included and the same in every mode) and how
+long after the worker finished a task its client noticed.
+
+Commands are counted inside fakeredis by default (`pip install fakeredis lupa`), or from
+`INFO commandstats` with `--redis-url` (the keys used are deleted afterwards).
+
+Usage:
+    python benchmarks/load_test_status_push.py --clients 200 --task-seconds 2 --poll-ms 500
+    python benchmarks/load_test_status_push.py --redis-url redis://localhost:6380/15
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as backend
+from status_events import StatusHub
+from task_queue import TaskQueue
+from worker_runtime import HandlerRegistry, WorkerRuntime
+
+QUEUE = "bench:tasks:queue"
+STATUS_PREFIX = "bench:task_status:"
+
+
+class CommandCounter:
+    """Redis commands executed, by name: counted in fakeredis, or read from INFO commandstats."""
+
+    def __init__(self, redis_client, fake):
+        self.redis = redis_client
+        self.fake = fake
+        self.counts = Counter()
+        if fake:
+            from fakeredis._socket._base import BaseFakeSocket
+            original = BaseFakeSocket._process_command
+            counts, lock = self.counts, threading.Lock()
+
+            def process_command(sock, fields):
+                if fields:
+                    with lock:
+                        counts[fields[0].decode().lower()] += 1
+                return original(sock, fields)
+
+            BaseFakeSocket._process_command = process_command
+
+    def snapshot(self):
+        if self.fake:
+            return Counter(self.counts)
+        stats = self.redis.info("commandstats")
+        return Counter({name[len("cmdstat_"):]: value["calls"] for name, value in stats.items()})
+
+
+def start_task(client):
+    return client.post("/api/start-task").get_json()["task_id"]
+
+
+def poll_client(args, seen):
+    client = backend.app.test_client()
+    task_id = start_task(client)
+    while client.get(f"/api/task-status/{task_id}").get_json()["status"] != "completed":
+        time.sleep(args.poll_ms / 1000)
+    seen[task_id] = time.time()
+
+
+def batch_client(args, seen):
+    client = backend.app.test_client()
+    task_ids = [start_task(client) for _ in range(args.batch_size)]
+    pending = set(task_ids)
+    while pending:
+        time.sleep(args.poll_ms / 1000)
+        statuses = client.post("/api/task-status", json={"task_ids": task_ids}).get_json()["statuses"]
+        for task_id, status in statuses.items():
+            if task_id in pending and status["status"] == "completed":
+                pending.discard(task_id)
+                seen[task_id] = time.time()
+
+
+def push_client(args, seen):
+    client = backend.app.test_client()
+    task_id = start_task(client)
+    response = client.get(f"/api/task-events?task_id={task_id}", buffered=False)
+    try:
+        for chunk in response.response:
+            for line in chunk.decode().splitlines():
+                if line.startswith("data: ") and json.loads(line[6:]).get("status") == "completed":
+                    seen[task_id] = time.time()
+                    return
+    finally:
+        response.close()
+
+
+def run(mode, client_fn, n_clients, args, task_queue, counter):
+    seen = {}
+    before = counter.snapshot()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client_fn, args=(args, seen)) for _ in range(n_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    commands = counter.snapshot() - before
+    total = sum(commands.values())
+    # Read after counting, so the measurement does not add status reads.
+    finished = task_queue.get_statuses(list(seen))
+    delays = sorted(seen_at - float(status["finished_at"]) for seen_at, status in zip(seen.values(), finished))
+    print(f"  {mode:<6} {len(delays):>6} {total:>9} {total / elapsed:>8.0f} {commands['hgetall']:>8} "
+          f"{commands['publish']:>8} {statistics.median(delays) * 1000:>9.1f} "
+          f"{delays[int(len(delays) * 0.95)] * 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task status polling vs. push load test.")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--task-seconds", type=float, default=2.0)
+    parser.add_argument("--poll-ms", type=float, default=500.0)
+    parser.add_argument("--batch-size", type=int, default=50, help="tasks per client in batch mode")
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        import fakeredis
+        redis_client = fakeredis.FakeRedis(decode_responses=True, max_connections=4096)
+    counter = CommandCounter(redis_client, fake=not args.redis_url)
+    task_queue = TaskQueue(redis_client, queue_key=QUEUE, status_prefix=STATUS_PREFIX)
+    backend.redis_client = redis_client
+    backend.task_queue = task_queue
+    backend.status_hub = StatusHub(redis_client, task_queue.events_channel)
+
+    registry = HandlerRegistry()
+
+    @registry.handler("default")
+    async def task(task):
+        await asyncio.sleep(args.task_seconds)
+
+    runtime = WorkerRuntime(task_queue, registry, concurrency=args.clients)
+    worker = threading.Thread(target=asyncio.run, args=(runtime.serve(),))
+    worker.start()
+
+    print(f"{args.clients} tasks of {args.task_seconds}s, polling every {args.poll_ms:.0f} ms")
+    print(f"  {'mode':<6} {'tasks':>6} {'commands':>9} {'cmds/s':>8} {'HGETALL':>8} {'PUBLISH':>8} "
+          f"{'seen p50':>9} {'seen p95':>9}")
+    run("poll", poll_client, args.clients, args, task_queue, counter)
+    run("batch", batch_client, max(1, args.clients // args.batch_size), args, task_queue, counter)
+    run("push", push_client, args.clients, args, task_queue, counter)
+    print(f"  (seen: ms from the worker finishing a task to its client noticing; "
+          f"hub delivered {backend.status_hub.stats['delivered']} events over one subscription)")
+
+    runtime.stop()
+    worker.join()
+    for key in redis_client.scan_iter(match="bench:*", count=1000):
+        redis_client.delete(key)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Load test for `worker_runtime`: tasks/sec and latency percentiles by concurrency.
+
+Enqueues `--tasks` tasks with `enqueue_many()`, then runs a `WorkerRuntime` until all of
+them are completed, once per `--concurrency` level. The "io" handler awaits
+`--task-ms` (a network call); with `--cpu-share` part of the tasks are "cpu" tasks that
+hash in the process pool instead. Latency is enqueue -> `finished_at` from the status
+hash, queue wait is enqueue -> `started_at`. A last run stops the runtime half-way and
+checks that every task is either completed or back in the queue (none left in the
+worker's processing list).
+
+Runs against an in-process fakeredis by default (`pip install fakeredis`), or a real Redis
+with `--redis-url` (the keys used are deleted afterwards).
+
+Usage:
+    python benchmarks/load_test_worker.py --tasks 5000 --concurrency 1 8 64 256
+    python benchmarks/load_test_worker.py --redis-url redis://localhost:6380/15 --cpu-share 0.2
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_queue import TaskQueue
+from worker_runtime import HandlerRegistry, WorkerRuntime
+
+QUEUE = "bench:tasks:queue"
+STATUS_PREFIX = "bench:task_status:"
+
+
+def cpu_task(task):
+    digest = b"x"
+    for _ in range(task.payload["rounds"]):
+        digest = hashlib.sha256(digest).digest()
+    return None
+
+
+def make_registry(task_seconds):
+    registry = HandlerRegistry()
+
+    @registry.handler("io")
+    async def io_task(task):
+        await asyncio.sleep(task_seconds)
+
+    registry.handler("cpu", kind="process")(cpu_task)
+    return registry
+
+
+async def run_until(runtime, done):
+    async def monitor():
+        while not done(runtime):
+            await asyncio.sleep(0.01)
+        runtime.stop()
+
+    watcher = asyncio.create_task(monitor())
+    await runtime.serve()
+    await watcher
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def reset(redis_client):
+    for key in redis_client.scan_iter(match="bench:*", count=1000):
+        redis_client.delete(key)
+
+
+def run(redis_client, task_queue, registry, args, concurrency):
+    reset(redis_client)
+    n_cpu = int(args.tasks * args.cpu_share)
+    tasks = [("cpu", {"rounds": args.cpu_rounds})] * n_cpu + [("io", {})] * (args.tasks - n_cpu)
+    enqueued_at = time.time()
+    ids = []
+    for start in range(0, len(tasks), 500):
+        ids.extend(task_queue.enqueue_many(tasks[start:start + 500]))
+
+    runtime = WorkerRuntime(task_queue, registry, concurrency=concurrency, processes=args.processes)
+    start = time.perf_counter()
+    asyncio.run(run_until(runtime, lambda r: r.stats["completed"] + r.stats["dead_lettered"] >= len(ids)))
+    elapsed = time.perf_counter() - start
+
+    pipe = redis_client.pipeline(transaction=False)
+    for task_id in ids:
+        pipe.hmget(task_queue.status_key(task_id), "status", "started_at", "finished_at")
+    statuses = pipe.execute()
+    assert all(status == "completed" for status, _, _ in statuses), "not every task completed"
+    latencies = sorted(float(finished) - enqueued_at for _, _, finished in statuses)
+    waits = sorted(float(started) - enqueued_at for _, started, _ in statuses)
+    print(f"  {concurrency:>11} {len(ids) / elapsed:>9.0f} {statistics.median(latencies) * 1000:>9.0f} "
+          f"{percentile(latencies, 0.95) * 1000:>9.0f} {percentile(latencies, 0.99) * 1000:>9.0f} "
+          f"{statistics.median(waits) * 1000:>10.0f}")
+
+
+def check_graceful_stop(redis_client, task_queue, registry, args):
+    reset(redis_client)
+    n = max(200, args.tasks // 10)
+    ids = task_queue.enqueue_many([("io", {})] * n)
+    runtime = WorkerRuntime(task_queue, registry, concurrency=16, prefetch=64)
+    asyncio.run(run_until(runtime, lambda r: r.stats["completed"] >= n // 2))
+    completed = sum(1 for task_id in ids if redis_client.hget(task_queue.status_key(task_id), "status") == "completed")
+    queued = task_queue.scheduler.depth()
+    assert redis_client.llen(task_queue.processing_key(runtime.worker_id)) == 0
+    assert redis_client.scard(task_queue.workers_key) == 0
+    assert completed + queued == n, f"lost tasks: {completed} completed + {queued} queued != {n}"
+    assert runtime.stats["completed"] == completed
+    print(f"graceful stop: {completed} completed, {runtime.stats['requeued']} prefetched tasks requeued, "
+          f"{queued} left queued, none lost")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker runtime load test.")
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64, 256])
+    parser.add_argument("--task-ms", type=float, default=20.0, help="duration of an io task")
+    parser.add_argument("--cpu-share", type=float, default=0.0)
+    parser.add_argument("--cpu-rounds", type=int, default=20_000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        import fakeredis
+        redis_client = fakeredis.FakeRedis(decode_responses=True)
+    task_queue = TaskQueue(redis_client, queue_key=QUEUE, status_prefix=STATUS_PREFIX)
+    registry = make_registry(args.task_ms / 1000)
+
+    print(f"{args.tasks} tasks ({args.cpu_share:.0%} cpu), io tasks take {args.task_ms} ms")
+    print(f"  {'concurrency':>11} {'tasks/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'wait p50':>10}")
+    for concurrency in args.concurrency:
+        run(redis_client, task_queue, registry, args, concurrency)
+    check_graceful_stop(redis_client, task_queue, registry, args)
+
+    reset(redis_client)
+
+
+if __name__ == "__main__":
+    main()
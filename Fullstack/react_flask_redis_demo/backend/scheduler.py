@@ -0,0 +1,267 @@
+"""
+Priority and per-tenant fair-share scheduling of the ready tasks of a `TaskQueue`.
+
+Ready tasks wait in one list per (priority, tenant), `tasks:queue:lane:<priority>:<tenant>`,
+instead of all in `tasks:queue`. Priorities are strict: "high" lanes are served before
+"normal" ones, "normal" before "low". Within a priority, tenants take turns by deficit
+round-robin: the tenants with ready tasks form a ring (`tasks:queue:ring:<priority>`), the
+tenant at the head has QUANTUM times its weight (`set_weight()`, default 1) added to its
+deficit once per turn and is served while the deficit covers the `cost` of its next task,
+then the ring rotates. A tenant's share is of worker time (cost), not of tasks, so a burst of long
+tasks from one tenant cannot starve the short tasks of the others.
+
+`take()` picks and moves a whole batch in one Lua script, so it stays one round trip.
+`tasks:queue` itself remains a shared lane, served first, for envelopes that name no
+tenant (written before the scheduler existed). Every push also adds a few tokens to
+`tasks:queue:wakeup`, which idle workers block on (`wait()`) instead of polling the lanes.
+
+The scripts get every key they touch in KEYS, except the tenant lanes `take()` finds in
+the rings. On Redis Cluster, put a hash tag in the prefix (`{tasks}:queue`) so all of a
+queue's keys share one slot.
+
+Usage:
+    scheduler = FairScheduler(redis_client, "tasks:queue")
+    scheduler.push([encode_task(...)])            # TaskQueue.enqueue() routes in its own script
+    scheduler.take(10, dest="tasks:queue:processing:w1")
+    scheduler.metrics()                           # depth / oldest task age per lane
+"""
+
+import json
+import time
+
+PRIORITIES = ("high", "normal", "low")
+DEFAULT_PRIORITY = "normal"
+DEFAULT_TENANT = "default"
+MAX_WAKEUP_TOKENS = 256
+# Cost units a weight-1 tenant may spend per turn. Several cost-1 tasks per turn keep
+# the script from rotating the ring (and re-reading its state) after every task.
+QUANTUM = 10
+# Bounds on task cost and tenant weight: a turn that cannot afford the next task just
+# rotates, so the script loops at most MAX_COST / (QUANTUM * MIN_WEIGHT) times per tenant.
+MAX_COST = 100
+MIN_WEIGHT, MAX_WEIGHT = 0.1, 1000
+
+# Shared by the scripts that queue tasks (see task_queue.py). route() pushes an envelope
+# to its lane (front = next to be taken) and, for a tenant lane, activates the tenant in its
+# priority's ring; wake() adds doorbell tokens for blocked workers. The keys come from
+# `FairScheduler.route_keys()` / `wakeup_key`, passed in KEYS by the caller.
+ROUTE_LUA = """
+local function route(lane, ring, active, tenant, raw, front)
+    if tenant ~= '' and redis.call('SADD', active, tenant) == 1 then
+        redis.call('RPUSH', ring, tenant)
+    end
+    if front then
+        redis.call('RPUSH', lane, raw)
+    else
+        redis.call('LPUSH', lane, raw)
+    end
+end
+
+local function wake(wakeup, n)
+    for _ = 1, math.min(n, """ + str(MAX_WAKEUP_TOKENS) + """) do
+        redis.call('LPUSH', wakeup, 1)
+    end
+    redis.call('LTRIM', wakeup, 0, """ + str(MAX_WAKEUP_TOKENS - 1) + """)
+end
+"""
+
+# KEYS: wakeup, then (lane, ring, active) per envelope. ARGV: front (0/1), then
+# (tenant or '', envelope) per envelope.
+_PUSH = ROUTE_LUA + """
+local n = (#ARGV - 1) / 2
+for i = 0, n - 1 do
+    local k = 2 + 3 * i
+    route(KEYS[k], KEYS[k + 1], KEYS[k + 2], ARGV[2 + 2 * i], ARGV[3 + 2 * i], ARGV[1] == '1')
+end
+wake(KEYS[1], n)
+return n
+"""
+
+# KEYS: shared lane, weights, then (ring, active, deficits, head) per priority, then the
+# destination list (none = just pop). ARGV: max tasks, then the lane key prefix per priority.
+# Deficit round-robin per priority; the head key remembers which tenant has already been
+# credited for the current turn, so a turn can span several calls. Tenant lanes are the
+# only keys not in KEYS: they are named by the tenants found in the ring.
+_TAKE = """
+local max, quantum = tonumber(ARGV[1]), """ + str(QUANTUM) + """
+local shared, weights = KEYS[1], KEYS[2]
+
+local dest = KEYS[3 + 4 * (#ARGV - 1)]
+local taken = {}
+local function take(lane)
+    local raw
+    if dest then
+        raw = redis.call('LMOVE', lane, dest, 'RIGHT', 'LEFT')
+    else
+        raw = redis.call('RPOP', lane)
+    end
+    taken[#taken + 1] = raw
+end
+local function cost_of(raw)
+    local ok, task = pcall(cjson.decode, raw)
+    if ok and type(task) == 'table' and tonumber(task['cost']) then
+        return tonumber(task['cost'])
+    end
+    return 1
+end
+
+while #taken < max and redis.call('LLEN', shared) > 0 do
+    take(shared)
+end
+for i = 2, #ARGV do
+    local k = 3 + 4 * (i - 2)
+    local ring, active, deficits, head_key = KEYS[k], KEYS[k + 1], KEYS[k + 2], KEYS[k + 3]
+    while #taken < max do
+        local tenant = redis.call('LINDEX', ring, 0)
+        if not tenant then break end
+        local lane = ARGV[i] .. tenant
+        local deficit = tonumber(redis.call('HGET', deficits, tenant) or '0')
+        if redis.call('GET', head_key) ~= tenant then
+            deficit = deficit + quantum * tonumber(redis.call('HGET', weights, tenant) or '1')
+            redis.call('SET', head_key, tenant)
+        end
+        -- Serve the tenant while its deficit covers its next task.
+        while true do
+            local head = redis.call('LINDEX', lane, -1)
+            if not head then
+                -- Out of tasks: leave the ring and forfeit the deficit.
+                redis.call('LPOP', ring)
+                redis.call('SREM', active, tenant)
+                redis.call('HDEL', deficits, tenant)
+                redis.call('DEL', head_key)
+                break
+            end
+            local cost = cost_of(head)
+            if deficit < cost then
+                -- Turn over: keep the deficit for the next one.
+                redis.call('HSET', deficits, tenant, deficit)
+                redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+                redis.call('DEL', head_key)
+                break
+            end
+            take(lane)
+            deficit = deficit - cost
+            if #taken >= max then
+                redis.call('HSET', deficits, tenant, deficit)
+                break
+            end
+        end
+    end
+end
+return taken
+"""
+
+
+class FairScheduler:
+    """The ready-task lanes under `prefix` (a TaskQueue's `queue_key`)."""
+
+    def __init__(self, redis_client, prefix):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.wakeup_key = f"{prefix}:wakeup"
+        self.weights_key = f"{prefix}:weights"
+        self._push = redis_client.register_script(_PUSH)
+        self._take = redis_client.register_script(_TAKE)
+
+    def lane_key(self, priority, tenant):
+        return f"{self.prefix}:lane:{priority}:{tenant}"
+
+    def ring_key(self, priority):
+        return f"{self.prefix}:ring:{priority}"
+
+    def active_key(self, priority):
+        return f"{self.prefix}:active:{priority}"
+
+    def deficit_key(self, priority):
+        return f"{self.prefix}:deficit:{priority}"
+
+    def head_key(self, priority):
+        return f"{self.prefix}:head:{priority}"
+
+    def route_keys(self, tenant, priority=DEFAULT_PRIORITY):
+        """`([lane, ring, active], tenant or '')` for route(); no tenant means the shared lane."""
+        if not tenant or not isinstance(tenant, str):
+            # Never activated; any ring / active key of the queue will do.
+            return [self.prefix, self.ring_key(DEFAULT_PRIORITY), self.active_key(DEFAULT_PRIORITY)], ''
+        return [self.lane_key(priority, tenant), self.ring_key(priority), self.active_key(priority)], tenant
+
+    def push(self, raw_tasks, front=False):
+        """Routes envelopes to the back of their lanes, or with `front` to the front (the last
+        one is taken first)."""
+        keys, args = [self.wakeup_key], [int(front)]
+        for raw in raw_tasks:
+            task = envelope_fields(raw)
+            route_keys, tenant = self.route_keys(task.get("tenant"), task.get("priority") or DEFAULT_PRIORITY)
+            keys += route_keys
+            args += [tenant, raw]
+        if len(keys) > 1:
+            self._push(keys=keys, args=args)
+
+    def take(self, max_tasks, dest=None):
+        """Takes up to `max_tasks` envelopes in scheduling order, moving them onto `dest`."""
+        keys = [self.prefix, self.weights_key]
+        for priority in PRIORITIES:
+            keys += [self.ring_key(priority), self.active_key(priority), self.deficit_key(priority),
+                     self.head_key(priority)]
+        if dest:
+            keys.append(dest)
+        return self._take(keys=keys, args=[max_tasks, *(self.lane_key(priority, "") for priority in PRIORITIES)])
+
+    def wait(self, timeout):
+        """Blocks until a push rang the doorbell or `timeout` seconds passed (0 = forever)."""
+        return self.redis.blpop(self.wakeup_key, timeout) is not None
+
+    def set_weight(self, tenant, weight):
+        """A tenant's share relative to the others (QUANTUM cost units per turn each, default 1)."""
+        if not MIN_WEIGHT <= weight <= MAX_WEIGHT:
+            raise ValueError(f"weight must be between {MIN_WEIGHT} and {MAX_WEIGHT}")
+        self.redis.hset(self.weights_key, tenant, weight)
+
+    def metrics(self):
+        """Ready tasks per lane: `[{"priority", "tenant", "depth", "oldest_age"}, ...]`.
+
+        The shared lane is reported with priority and tenant None; `oldest_age` is the
+        seconds since the oldest waiting task was created (None for an empty lane).
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for priority in PRIORITIES:
+            pipe.lrange(self.ring_key(priority), 0, -1)
+        lanes = [(None, None, self.prefix)]
+        for priority, tenants in zip(PRIORITIES, pipe.execute()):
+            lanes.extend((priority, _text(tenant), self.lane_key(priority, _text(tenant))) for tenant in tenants)
+        pipe = self.redis.pipeline(transaction=False)
+        for _, _, lane in lanes:
+            pipe.llen(lane)
+            pipe.lindex(lane, -1)
+        replies = pipe.execute()
+        now = time.time()
+        metrics = []
+        for (priority, tenant, _), depth, oldest in zip(lanes, replies[::2], replies[1::2]):
+            if depth or tenant is not None:
+                metrics.append({"priority": priority, "tenant": tenant, "depth": depth,
+                                "oldest_age": _age(oldest, now)})
+        return metrics
+
+    def depth(self):
+        return sum(lane["depth"] for lane in self.metrics())
+
+
+def envelope_fields(raw):
+    """A queued envelope as a dict (`{}` if it is not a JSON object), to read its routing fields."""
+    try:
+        task = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    return task if isinstance(task, dict) else {}
+
+
+def _text(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _age(raw, now):
+    try:
+        created_at = json.loads(raw).get("created_at")
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return round(now - created_at, 3) if isinstance(created_at, (int, float)) else None
@@ -0,0 +1,145 @@
+"""
+Fans task status events out to the clients of this process.
+
+The worker publishes every status change on one Redis pub/sub channel (see
+`task_queue.py`). A `StatusHub` keeps a single subscription per Flask process, however many
+clients are watching, and hands each event to the clients watching that task id, so a
+watching client costs Redis one status read when it connects instead of one per poll.
+
+Pub/sub does not keep messages. `watch()` subscribes before it reads the current status,
+so no change can fall in between, and when the subscription drops the hub reconnects and
+every watcher reads the current status again.
+
+Usage:
+    hub = StatusHub(redis_client, task_queue.events_channel)
+    for update in hub.watch(task_ids, task_queue.get_statuses):
+        ...  # a status dict with "id", or None when nothing happened for `keepalive` seconds
+"""
+
+import json
+import queue
+import threading
+import time
+
+import redis
+
+TERMINAL_STATUSES = ("completed", "failed")
+RESYNC = object() # Put on every watcher's queue after a reconnect
+
+
+class StatusHub:
+    def __init__(self, redis_client, channel, reconnect_delay=1.0, subscribe_timeout=5.0):
+        self.redis = redis_client
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.subscribe_timeout = subscribe_timeout
+        self.lock = threading.Lock()
+        self.watchers = {} # task id -> set of queue.Queue
+        self.stats = {"events": 0, "delivered": 0, "reconnects": 0}
+        self._subscribed = threading.Event()
+        self._thread = None
+
+    def subscribe(self, task_ids):
+        """Returns a queue that receives the events of `task_ids` (and RESYNC after a reconnect).
+
+        Raises redis.ConnectionError if the hub cannot subscribe within `subscribe_timeout`.
+        """
+        events = queue.Queue()
+        with self.lock:
+            for task_id in task_ids:
+                self.watchers.setdefault(task_id, set()).add(events)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name="status-hub", daemon=True)
+                self._thread.start()
+        # Events published before Redis confirmed the subscription would be missed.
+        if not self._subscribed.wait(self.subscribe_timeout):
+            self.unsubscribe(task_ids, events)
+            raise redis.ConnectionError("Could not subscribe to task status events")
+        return events
+
+    def unsubscribe(self, task_ids, events):
+        with self.lock:
+            for task_id in task_ids:
+                watching = self.watchers.get(task_id)
+                if watching is not None:
+                    watching.discard(events)
+                    if not watching:
+                        del self.watchers[task_id]
+
+    def watch(self, task_ids, read_statuses, keepalive=15.0):
+        """Yields the current status of each task, then every change, until all have finished.
+
+        `read_statuses(task_ids)` returns the status hashes in order (`TaskQueue.get_statuses`).
+        Unknown ids yield `{"id": ..., "error": "Task not found"}` once and are not watched.
+        """
+        events = self.subscribe(task_ids)
+        try:
+            pending = set(task_ids)
+            event = RESYNC
+            while pending:
+                if event is RESYNC:
+                    ids = [task_id for task_id in task_ids if task_id in pending]
+                    updates = [dict(status, id=task_id) if status else {"id": task_id, "error": "Task not found"}
+                               for task_id, status in zip(ids, read_statuses(ids))]
+                elif event is None:
+                    updates = [None]
+                else:
+                    updates = [event]
+                for update in updates:
+                    yield update
+                    if update is not None and (update.get("status") in TERMINAL_STATUSES or "error" in update):
+                        pending.discard(update["id"])
+                if pending:
+                    try:
+                        event = events.get(timeout=keepalive)
+                    except queue.Empty:
+                        event = None
+        finally:
+            self.unsubscribe(task_ids, events)
+
+    # --- Internals ---
+
+    def _listen(self):
+        reconnecting = False
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                pubsub.subscribe(self.channel)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    if message["type"] == "subscribe":
+                        self._subscribed.set()
+                        if reconnecting:
+                            # Changes made while disconnected were missed: re-read them.
+                            self._broadcast(RESYNC)
+                            reconnecting = False
+                    elif message["type"] == "message":
+                        self._dispatch(message["data"])
+            except redis.RedisError as e:
+                print(f"Status event subscription lost: {e}")
+                self._subscribed.clear()
+                self.stats["reconnects"] += 1
+                reconnecting = True
+                time.sleep(self.reconnect_delay)
+            finally:
+                pubsub.close()
+
+    def _dispatch(self, data):
+        try:
+            event = json.loads(data)
+        except ValueError:
+            return
+        with self.lock:
+            watching = list(self.watchers.get(event.get("id"), ()))
+        for events in watching:
+            events.put(event)
+        self.stats["events"] += 1
+        self.stats["delivered"] += len(watching)
+
+    def _broadcast(self, item):
+        with self.lock:
+            watching = {events for queues in self.watchers.values() for events in queues}
+        for events in watching:
+            events.put(item)
@@ -0,0 +1,601 @@
+"""
+Task protocol shared by the Flask app and the worker.
+
+Tasks travel as a versioned JSON envelope:
+
+    {"v": 1, "id": "<uuid>", "type": "default", "payload": {...}, "created_at": 1718000000.0, "attempt": 0,
+     "tenant": "default", "priority": "normal", "cost": 1}
+
+Ready tasks wait in per-(priority, tenant) lanes under `tasks:queue`, picked by priority
+and weighted fair share across tenants (see `scheduler.py`).
+
+`json.loads` parses it 4-5x faster than `ast.literal_eval` parses `str(dict)`, and other
+languages can produce and consume it. Envelopes written by the old app (`str(dict)`) are
+still accepted so a queue can be drained across the upgrade.
+
+Status lives in the `task_status:<id>` hash. Every operation on the producer and worker
+paths is a single round trip: `enqueue()` writes the initial status and routes the task in
+one script call (the worker can never pop a task whose status does not exist yet),
+`enqueue_many()` does the same for a whole batch, `set_status()` writes all fields with one
+`HSET`, and `get_statuses()` reads any number of tasks with one pipeline. Scripts are called
+directly rather than inside a pipeline, where redis-py would add a `SCRIPT EXISTS` round trip.
+
+`enqueue_idempotent()` takes a client-chosen idempotency key per task: one script
+claims each key with `SET NX` (`tasks:queue:idempotency:<tenant>:<key>`, kept for
+`idempotency_ttl`) and queues the task only if the claim succeeded, so a retried request
+returns the ids of the first one instead of queueing duplicates.
+
+Every status change after the task was queued is also published, in the same transaction,
+as JSON (`{"id", "status", "message", ...}`) on the `tasks:queue:events` pub/sub channel;
+`status_events.StatusHub` fans these out to the clients watching a task.
+
+Reliable delivery (used by `worker_runtime`; `dequeue()` is the simple, at-most-once pop):
+
+- `reserve()` moves tasks from the lanes to the worker's own processing list
+  (`tasks:queue:processing:<worker id>`) in one script call, so a task is never only in
+  the worker's memory; an idle worker blocks on the scheduler's doorbell list.
+- `complete()` / `fail()` remove the task from the processing list in the same
+  transaction as its final status. A failed task is retried up to `max_attempts` times,
+  after an exponential backoff spent in the `tasks:queue:delayed` sorted set (scored by
+  due time; `promote_delayed()` moves due tasks back), then lands in the dead-letter list
+  `tasks:queue:dead`.
+- Workers register in `tasks:queue:workers` and keep a heartbeat key alive with a TTL of
+  `visibility_timeout`. `reap_dead_workers()` gives the tasks of a worker whose heartbeat
+  expired back to the queue.
+
+Retention (see `task_queue_from_env()` for the settings):
+
+- Every status write sets the key's TTL in the same transaction: `status_ttl` while the
+  task is queued / running / retrying, `result_ttl` once it has completed or failed.
+- With `compact_results`, a finished task's hash is replaced by one `task_result:<id>`
+  string of packed JSON, without the default completion message and with timestamps
+  rounded to the millisecond. `get_status()` reads either form.
+- Finished tasks are indexed by `finished_at` in `index_shards` sorted sets
+  (`tasks:queue:finished:<n>`, by CRC32 of the id) so no single key grows huge;
+  `list_finished()` pages through them newest first.
+- `sweep()` (run by the worker's maintenance thread) trims index entries older than
+  `result_ttl` and, a `SCAN` batch at a time, gives a TTL to status keys written without
+  one (before the TTLs existed).
+
+Every script gets the keys it touches in KEYS (see `scheduler.py` for the one exception). A
+script or transaction writes status keys together with queue keys, so on Redis Cluster both
+prefixes need the same hash tag (e.g. `{tasks}:queue` and `{tasks}:task_status:`).
+"""
+
+import ast
+import json
+import os
+import random
+import time
+import uuid
+import zlib
+from collections import namedtuple
+
+from scheduler import (DEFAULT_PRIORITY, DEFAULT_TENANT, MAX_COST, PRIORITIES, ROUTE_LUA, FairScheduler,
+                       envelope_fields)
+
+PROTOCOL_VERSION = 1
+QUEUE_KEY = 'tasks:queue'
+STATUS_PREFIX = 'task_status:'
+RESULT_PREFIX = 'task_result:'
+QUEUED_MESSAGE = "Task is waiting in the queue."
+FINISHED_STATUSES = ("completed", "failed")
+
+Task = namedtuple('Task', 'id type payload created_at version attempt tenant priority cost',
+                  defaults=(0, DEFAULT_TENANT, DEFAULT_PRIORITY, 1))
+
+
+class TaskDecodeError(ValueError):
+    pass
+
+
+def encode_task(task_id, task_type='default', payload=None, created_at=None, attempt=0,
+                tenant=DEFAULT_TENANT, priority=DEFAULT_PRIORITY, cost=1):
+    return json.dumps({
+        "v": PROTOCOL_VERSION,
+        "id": task_id,
+        "type": task_type,
+        "payload": payload if payload is not None else {},
+        "created_at": created_at if created_at is not None else time.time(),
+        "attempt": attempt,
+        "tenant": tenant,
+        "priority": priority,
+        "cost": cost,
+    }, separators=(',', ':'))
+
+
+def decode_task(raw):
+    """Parses a queued task; raises TaskDecodeError for anything that is not a valid task."""
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8')
+    try:
+        if raw.startswith("{'"):
+            # Legacy `str(dict)` envelope from before the JSON protocol (version 0).
+            data = ast.literal_eval(raw)
+            return Task(data['id'], 'default', {'message': data.get('message')}, None, 0)
+        data = json.loads(raw)
+    except (ValueError, SyntaxError, KeyError, TypeError) as e:
+        raise TaskDecodeError(f"Invalid task data: {raw[:100]!r}") from e
+    if not isinstance(data, dict) or data.get('v') != PROTOCOL_VERSION or not data.get('id'):
+        raise TaskDecodeError(f"Unsupported task envelope: {raw[:100]!r}")
+    return Task(data['id'], data.get('type', 'default'), data.get('payload') or {}, data.get('created_at'),
+                data['v'], data.get('attempt', 0), data.get('tenant', DEFAULT_TENANT),
+                data.get('priority', DEFAULT_PRIORITY), data.get('cost', 1))
+
+
+def completed_message(task_id):
+    return f"Task {task_id} completed successfully!"
+
+
+def pack_result(task_id, mapping):
+    """Packed JSON for a finished task's status (`compact_results`)."""
+    packed = {k: round(v, 3) if isinstance(v, float) else v for k, v in mapping.items()}
+    if packed.get("message") == completed_message(task_id):
+        del packed["message"]
+    return json.dumps(packed, separators=(',', ':'))
+
+
+def unpack_result(task_id, packed):
+    """The status hash `pack_result()` stands for, with string values like `HGETALL`."""
+    mapping = {k: str(v) for k, v in json.loads(packed).items()}
+    mapping.setdefault("message", completed_message(task_id))
+    return mapping
+
+
+def task_queue_from_env(redis_client, **kwargs):
+    """A TaskQueue with the retention settings shared by the app and the worker.
+
+    TASK_STATUS_TTL (default 7 days) and TASK_RESULT_TTL (default 1 day) are in seconds,
+    0 keeps the keys forever; TASK_COMPACT_RESULTS=1 stores finished tasks packed.
+    TASK_IDEMPOTENCY_TTL (default 1 day, 0 = forever) is how long an idempotency key is
+    remembered.
+    """
+    return TaskQueue(redis_client,
+                     status_ttl=int(os.getenv("TASK_STATUS_TTL", 7 * 24 * 3600)) or None,
+                     result_ttl=int(os.getenv("TASK_RESULT_TTL", 24 * 3600)) or None,
+                     compact_results=os.getenv("TASK_COMPACT_RESULTS", "0") == "1",
+                     idempotency_ttl=int(os.getenv("TASK_IDEMPOTENCY_TTL", 24 * 3600)) or None,
+                     **kwargs)
+
+
+def _check_scheduling(tenant, priority, cost):
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}', expected one of {PRIORITIES}")
+    if not tenant or not isinstance(tenant, str):
+        raise ValueError("tenant must be a non-empty string")
+    if not isinstance(cost, (int, float)) or not 0 < cost <= MAX_COST:
+        raise ValueError(f"cost must be in (0, {MAX_COST}]")
+
+
+def retry_delay(attempt, base_delay, max_delay):
+    """Exponential backoff with jitter: ~base * 2^attempt, capped at max_delay."""
+    return min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+# KEYS: wakeup, then (status, lane, ring, active) per task, then the idempotency key of each
+# task that has one, in task order. ARGV: status TTL (0 = none), idempotency TTL (0 = none),
+# message, then (task id, envelope, tenant, has an idempotency key 0/1) per task. Queues a task
+# only if `SET NX` claims its idempotency key (if any); returns (task id, 1) for a queued
+# task, (id of the first, 0) otherwise.
+_ENQUEUE = ROUTE_LUA + """
+local status_ttl, key_ttl, message = tonumber(ARGV[1]), tonumber(ARGV[2]), ARGV[3]
+local n = (#ARGV - 3) / 4
+local claim = 1 + 4 * n
+local result, queued = {}, 0
+for i = 0, n - 1 do
+    local k, a = 2 + 4 * i, 4 + 4 * i
+    local id, claimed, key = ARGV[a], true, nil
+    if ARGV[a + 3] == '1' then
+        claim = claim + 1
+        key = KEYS[claim]
+        if key_ttl > 0 then
+            claimed = redis.call('SET', key, id, 'NX', 'EX', key_ttl)
+        else
+            claimed = redis.call('SET', key, id, 'NX')
+        end
+    end
+    if claimed then
+        redis.call('HSET', KEYS[k], 'status', 'queued', 'message', message)
+        if status_ttl > 0 then
+            redis.call('EXPIRE', KEYS[k], status_ttl)
+        end
+        route(KEYS[k + 1], KEYS[k + 2], KEYS[k + 3], ARGV[a + 2], ARGV[a + 1], false)
+        queued = queued + 1
+        result[#result + 1] = {id, 1}
+    else
+        result[#result + 1] = {redis.call('GET', key), 0}
+    end
+end
+if queued > 0 then
+    wake(KEYS[1], queued)
+end
+return result
+"""
+
+# Puts envelopes back at the front of their lanes, in order (the last one is taken first).
+# KEYS[1]: wakeup, KEYS[2]: the source, then (lane, ring, active, status) per envelope from
+# KEYS[first_key]. ARGV[1]: source type ('list', 'zset', or '' when already removed),
+# ARGV[2]: status message ('' = leave the status alone), ARGV[3]: status TTL (0 = none),
+# ARGV[4]: events channel, ARGV[5]: worker id (reaper only), then (tenant or '', envelope,
+# task id or '') per envelope. An envelope no longer in its source was already put back by
+# someone else and is skipped.
+_REQUEUE_LUA = ROUTE_LUA + """
+local function requeue(first_key)
+    local n = 0
+    for i = 0, (#ARGV - 5) / 3 - 1 do
+        local k, a = first_key + 4 * i, 6 + 3 * i
+        local raw, removed = ARGV[a + 1], 1
+        if ARGV[1] == 'list' then
+            removed = redis.call('LREM', KEYS[2], 1, raw)
+        elseif ARGV[1] == 'zset' then
+            removed = redis.call('ZREM', KEYS[2], raw)
+        end
+        if removed > 0 then
+            route(KEYS[k], KEYS[k + 1], KEYS[k + 2], ARGV[a], raw, true)
+            n = n + 1
+            if ARGV[2] ~= '' and ARGV[a + 2] ~= '' then
+                redis.call('HSET', KEYS[k + 3], 'status', 'queued', 'message', ARGV[2])
+                if tonumber(ARGV[3]) > 0 then
+                    redis.call('EXPIRE', KEYS[k + 3], ARGV[3])
+                end
+                redis.call('PUBLISH', ARGV[4], cjson.encode({id = ARGV[a + 2], status = 'queued', message = ARGV[2]}))
+            end
+        end
+    end
+    wake(KEYS[1], n)
+    return n
+end
+"""
+
+_REQUEUE = _REQUEUE_LUA + "return requeue(3)"
+
+# KEYS[3]: heartbeat, KEYS[4]: workers set; envelopes from KEYS[5] (see _REQUEUE_LUA). Gives a
+# dead worker's tasks back (unless its heartbeat is alive) and marks them queued.
+_REAP_WORKER = _REQUEUE_LUA + """
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    return -1
+end
+local n = requeue(5)
+if redis.call('LLEN', KEYS[2]) == 0 then
+    redis.call('SREM', KEYS[4], ARGV[5])
+end
+return n
+"""
+
+
+class TaskQueue:
+    """Enqueue / dequeue / status operations on the scheduled task lanes + status hashes."""
+
+    def __init__(self, redis_client, queue_key=QUEUE_KEY, status_prefix=STATUS_PREFIX, result_prefix=RESULT_PREFIX,
+                 status_ttl=None, result_ttl=None, compact_results=False, index_shards=16,
+                 idempotency_ttl=24 * 3600):
+        self.redis = redis_client
+        self.queue_key = queue_key
+        self.status_prefix = status_prefix
+        self.result_prefix = result_prefix
+        self.status_ttl = status_ttl
+        self.result_ttl = result_ttl or status_ttl
+        self.compact_results = compact_results
+        self.index_shards = index_shards
+        self.idempotency_ttl = idempotency_ttl
+        self.delayed_key = f"{queue_key}:delayed"
+        self.dead_key = f"{queue_key}:dead"
+        self.workers_key = f"{queue_key}:workers"
+        self.events_channel = f"{queue_key}:events"
+        self.sweep_cursor_key = f"{queue_key}:sweep-cursor"
+        self.scheduler = FairScheduler(redis_client, queue_key)
+        self._enqueue = redis_client.register_script(_ENQUEUE)
+        self._requeue = redis_client.register_script(_REQUEUE)
+        self._reap_worker = redis_client.register_script(_REAP_WORKER)
+
+    def status_key(self, task_id):
+        return f"{self.status_prefix}{task_id}"
+
+    def result_key(self, task_id):
+        return f"{self.result_prefix}{task_id}"
+
+    def finished_index_key(self, shard):
+        return f"{self.queue_key}:finished:{shard}"
+
+    def idempotency_key(self, tenant, key):
+        return f"{self.queue_key}:idempotency:{tenant}:{key}"
+
+    def processing_key(self, worker_id):
+        return f"{self.queue_key}:processing:{worker_id}"
+
+    def heartbeat_key(self, worker_id):
+        return f"{self.queue_key}:heartbeat:{worker_id}"
+
+    # --- Producer side ---
+
+    def enqueue(self, task_type='default', payload=None, message=QUEUED_MESSAGE, tenant=DEFAULT_TENANT,
+                priority=DEFAULT_PRIORITY, cost=1):
+        """Queues one task; returns its id."""
+        return self.enqueue_many([(task_type, payload)], message, tenant, priority, cost)[0]
+
+    def enqueue_many(self, tasks, message=QUEUED_MESSAGE, tenant=DEFAULT_TENANT, priority=DEFAULT_PRIORITY, cost=1):
+        """Queues `(task_type, payload)` pairs in one round trip; returns their ids in order.
+
+        `cost` is the relative work of each task (e.g. expected seconds, up to MAX_COST):
+        the fair-share scheduler charges it to the tenant's turn.
+        """
+        tasks = list(tasks)
+        return [task_id for task_id, _ in self._enqueue_tasks(tasks, [None] * len(tasks), message,
+                                                              tenant, priority, cost)]
+
+    def enqueue_idempotent(self, tasks, idempotency_keys, message=QUEUED_MESSAGE, tenant=DEFAULT_TENANT,
+                           priority=DEFAULT_PRIORITY, cost=1):
+        """Like `enqueue_many()`, skipping the tasks whose idempotency key the tenant already used.
+
+        `idempotency_keys` pairs a key (or None, always queued) with each task. Returns
+        `[(task_id, queued), ...]` in order, where a task not queued has the id of the task
+        first queued under its key (including an earlier one in the same batch).
+        """
+        tasks, idempotency_keys = list(tasks), list(idempotency_keys)
+        if len(tasks) != len(idempotency_keys):
+            raise ValueError("Expected one idempotency key per task")
+        return self._enqueue_tasks(tasks, idempotency_keys, message, tenant, priority, cost)
+
+    def _enqueue_tasks(self, tasks, idempotency_keys, message, tenant, priority, cost):
+        _check_scheduling(tenant, priority, cost)
+        if not tasks:
+            return []
+        now = time.time()
+        route_keys, _ = self.scheduler.route_keys(tenant, priority)
+        keys, claims = [self.scheduler.wakeup_key], []
+        args = [self.status_ttl or 0, self.idempotency_ttl or 0, message]
+        for (task_type, payload), key in zip(tasks, idempotency_keys):
+            task_id = str(uuid.uuid4())
+            # Not published: nobody can be watching an id that has not been returned yet.
+            keys += [self.status_key(task_id), *route_keys]
+            args += [task_id, encode_task(task_id, task_type, payload, now, 0, tenant, priority, cost), tenant,
+                     int(key is not None)]
+            if key is not None:
+                claims.append(self.idempotency_key(tenant, key))
+        return [(task_id.decode() if isinstance(task_id, bytes) else task_id, queued == 1)
+                for task_id, queued in self._enqueue(keys=keys + claims, args=args)]
+
+    # --- Worker side ---
+
+    def dequeue(self, timeout=0):
+        """Blocks until a task is available (or `timeout` seconds pass: returns None)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            raw_tasks = self.scheduler.take(1)
+            if raw_tasks:
+                return decode_task(raw_tasks[0])
+            remaining = deadline - time.monotonic()
+            if timeout and remaining <= 0:
+                return None
+            self.scheduler.wait(max(remaining, 0.01) if timeout else 0)
+
+    def set_status(self, task_id, status, message, **fields):
+        pipe = self.redis.pipeline(transaction=True)
+        self._write_status(pipe, task_id, status, message, fields)
+        pipe.execute()
+
+    def _write_status(self, pipe, task_id, status, message, fields):
+        """Queues the status write (with its TTL and index entry) and its event `PUBLISH` on `pipe`."""
+        mapping = dict(fields, status=status, message=message)
+        key = self.status_key(task_id)
+        if status not in FINISHED_STATUSES:
+            pipe.hset(key, mapping=mapping)
+            if self.status_ttl:
+                pipe.expire(key, self.status_ttl)
+        else:
+            if self.compact_results:
+                pipe.delete(key)
+                pipe.set(self.result_key(task_id), pack_result(task_id, mapping), ex=self.result_ttl)
+            else:
+                pipe.hset(key, mapping=mapping)
+                if self.result_ttl:
+                    pipe.expire(key, self.result_ttl)
+            shard = zlib.crc32(task_id.encode()) % self.index_shards
+            pipe.zadd(self.finished_index_key(shard), {task_id: float(fields.get("finished_at") or time.time())})
+        pipe.publish(self.events_channel, json.dumps(dict(mapping, id=task_id), separators=(',', ':')))
+
+    # --- Reliable delivery (worker_runtime) ---
+
+    def register_worker(self, worker_id, visibility_timeout):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.sadd(self.workers_key, worker_id)
+        pipe.set(self.heartbeat_key(worker_id), time.time(), ex=visibility_timeout)
+        pipe.execute()
+
+    def heartbeat(self, worker_id, visibility_timeout):
+        """Refreshes the heartbeat and re-registers the worker, in case the reaper dropped it
+        after a missed beat (its tasks then only come back if it is registered)."""
+        self.register_worker(worker_id, visibility_timeout)
+
+    def unregister_worker(self, worker_id):
+        """Removes a stopped worker; anything left in its processing list goes back to the queue."""
+        self.redis.delete(self.heartbeat_key(worker_id))
+        return self._reap(worker_id)
+
+    def reserve(self, worker_id, max_tasks, timeout=1):
+        """Moves up to `max_tasks` envelopes, in scheduling order, into the worker's processing
+        list and returns them (Redis >= 6.2 for `LMOVE`).
+
+        When nothing is ready, blocks up to `timeout` seconds on the doorbell and tries once more.
+        """
+        processing = self.processing_key(worker_id)
+        raw_tasks = self.scheduler.take(max_tasks, processing)
+        if not raw_tasks and self.scheduler.wait(timeout):
+            raw_tasks = self.scheduler.take(max_tasks, processing)
+        return raw_tasks
+
+    def release(self, worker_id, raw_tasks):
+        """Puts reserved but unstarted envelopes back at the front of their lanes, in their original order."""
+        self._put_back(self.processing_key(worker_id), 'list', list(reversed(raw_tasks)))
+
+    def complete(self, worker_id, raw, task_id, message, **fields):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrem(self.processing_key(worker_id), 1, raw)
+        self._write_status(pipe, task_id, "completed", message, fields)
+        pipe.execute()
+
+    def fail(self, worker_id, raw, task, error, max_attempts=5, base_delay=1.0, max_delay=300.0, **fields):
+        """Schedules a retry with backoff, or dead-letters the task; returns the new status.
+
+        `task` is None for an envelope that could not be decoded (dead-lettered at once).
+        """
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrem(self.processing_key(worker_id), 1, raw)
+        if task is not None and task.attempt + 1 < max_attempts:
+            delay = retry_delay(task.attempt, base_delay, max_delay)
+            retry = encode_task(task.id, task.type, task.payload, task.created_at, task.attempt + 1,
+                                task.tenant, task.priority, task.cost)
+            pipe.zadd(self.delayed_key, {retry: time.time() + delay})
+            status = "retrying"
+            message = f"Attempt {task.attempt + 1} failed: {error}; retrying in {delay:.1f}s."
+        else:
+            raw_text = raw.decode('utf-8', 'replace') if isinstance(raw, bytes) else raw
+            pipe.lpush(self.dead_key, json.dumps({"raw": raw_text, "error": str(error), "failed_at": time.time()}))
+            status = "failed"
+            message = f"Task failed after {task.attempt + 1 if task else 1} attempt(s): {error}"
+        if task is not None:
+            self._write_status(pipe, task.id, status, message, fields)
+        pipe.execute()
+        return status
+
+    def promote_delayed(self, limit=500):
+        """Moves retries whose backoff has elapsed back to the queue; returns how many."""
+        due = self.redis.zrangebyscore(self.delayed_key, "-inf", time.time(), start=0, num=limit)
+        return self._put_back(self.delayed_key, 'zset', due)
+
+    def reap_dead_workers(self):
+        """Re-queues the tasks of every registered worker whose heartbeat expired; returns how many."""
+        worker_ids = [worker_id.decode() if isinstance(worker_id, bytes) else worker_id
+                      for worker_id in self.redis.smembers(self.workers_key)]
+        pipe = self.redis.pipeline(transaction=False)
+        for worker_id in worker_ids:
+            pipe.exists(self.heartbeat_key(worker_id))
+        requeued = 0
+        # Only the lists of workers without a heartbeat are read; the script checks it again.
+        for worker_id, alive in zip(worker_ids, pipe.execute() if worker_ids else []):
+            if not alive:
+                requeued += max(0, self._reap(worker_id))
+        return requeued
+
+    def _reap(self, worker_id):
+        worker_id = worker_id.decode() if isinstance(worker_id, bytes) else worker_id
+        processing = self.processing_key(worker_id)
+        message = f"Re-queued after worker {worker_id} stopped responding."
+        # Newest first, so the oldest ends up at the very front.
+        raw_tasks = self.redis.lrange(processing, 0, -1)
+        return self._put_back(processing, 'list', raw_tasks, message, worker_id)
+
+    def _put_back(self, source, source_type, raw_tasks, message='', worker_id=None):
+        """Runs _REQUEUE (or _REAP_WORKER for `worker_id`) on envelopes in `source`; returns how many moved."""
+        keys = [self.scheduler.wakeup_key, source]
+        args = [source_type, message, self.status_ttl or 0, self.events_channel, worker_id or '']
+        if worker_id is not None:
+            keys += [self.heartbeat_key(worker_id), self.workers_key]
+        elif not raw_tasks:
+            return 0
+        for raw in raw_tasks:
+            task = envelope_fields(raw)
+            task_id = task.get('id') if isinstance(task.get('id'), str) else ''
+            route_keys, tenant = self.scheduler.route_keys(task.get('tenant'), task.get('priority') or DEFAULT_PRIORITY)
+            keys += [*route_keys, self.status_key(task_id)]
+            args += [tenant, raw, task_id]
+        script = self._reap_worker if worker_id is not None else self._requeue
+        return script(keys=keys, args=args)
+
+    def sweep(self, batch=1000):
+        """One cleanup step; returns `(index entries trimmed, TTLs added)`.
+
+        Trims index entries older than `result_ttl`, then scans the next `batch` status keys
+        (the cursor is kept in Redis, so workers take turns) and sets a TTL on those without.
+        """
+        trimmed = added = 0
+        if self.result_ttl:
+            pipe = self.redis.pipeline(transaction=False)
+            for shard in range(self.index_shards):
+                pipe.zremrangebyscore(self.finished_index_key(shard), "-inf", time.time() - self.result_ttl)
+            trimmed = sum(pipe.execute())
+        if not self.status_ttl:
+            return trimmed, added
+
+        cursor, keys = self.redis.scan(int(self.redis.get(self.sweep_cursor_key) or 0),
+                                       match=f"{self.status_prefix}*", count=batch)
+        self.redis.set(self.sweep_cursor_key, cursor)
+        if keys:
+            pipe = self.redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.ttl(key)
+                pipe.hget(key, "status")
+            replies = pipe.execute(raise_on_error=False)
+            pipe = self.redis.pipeline(transaction=False)
+            for key, ttl, status in zip(keys, replies[::2], replies[1::2]):
+                if ttl == -1: # Exists without a TTL
+                    finished = (status.decode() if isinstance(status, bytes) else status) in FINISHED_STATUSES
+                    pipe.expire(key, self.result_ttl if finished else self.status_ttl)
+                    added += 1
+            pipe.execute()
+        return trimmed, added
+
+    def dead_letters(self, start=0, stop=99):
+        """Dead-lettered tasks, newest first: `{"raw", "error", "failed_at"}`."""
+        return [json.loads(item) for item in self.redis.lrange(self.dead_key, start, stop)]
+
+    def replay_dead_letters(self, count=100):
+        """Moves up to `count` dead-lettered tasks back to the queue with a fresh retry budget."""
+        items = self.redis.rpop(self.dead_key, count) or []
+        raw_tasks = []
+        for item in items:
+            try:
+                task = decode_task(json.loads(item)["raw"])
+            except TaskDecodeError:
+                continue # Undecodable envelopes stay dropped
+            raw_tasks.append(encode_task(task.id, task.type, task.payload, task.created_at, 0,
+                                         task.tenant, task.priority, task.cost))
+        return self._put_back(self.dead_key, '', raw_tasks, QUEUED_MESSAGE)
+
+    # --- Status reads ---
+
+    def get_status(self, task_id):
+        return self.get_statuses([task_id])[0]
+
+    def get_statuses(self, task_ids):
+        """Status hashes of many tasks in one round trip, in order (`{}` for unknown ids)."""
+        pipe = self.redis.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.hgetall(self.status_key(task_id))
+            if self.compact_results:
+                pipe.get(self.result_key(task_id))
+        replies = pipe.execute()
+        if not self.compact_results:
+            return replies
+        return [unpack_result(task_id, packed) if packed else status
+                for task_id, status, packed in zip(task_ids, replies[::2], replies[1::2])]
+
+    def list_finished(self, limit=50, before=None):
+        """Newest finished tasks: `([(task_id, finished_at), ...], cursor)`.
+
+        Pass the cursor, a `(finished_at, task_id)` pair, back as `before` for the next page; it
+        is None after the last one. Tasks that finished at the same time are ordered by id, so a
+        page boundary between them skips none. A plain number as `before` lists the tasks that
+        finished strictly before it.
+        """
+        if before is None:
+            score, after_id = None, None
+        elif isinstance(before, (int, float)):
+            score, after_id = before, None
+        else:
+            score, after_id = float(before[0]), before[1]
+        pipe = self.redis.pipeline(transaction=False)
+        for shard in range(self.index_shards):
+            key = self.finished_index_key(shard)
+            if after_id is not None:
+                # Ties at the cursor's score; rare, as `finished_at` has microseconds.
+                pipe.zrevrangebyscore(key, score, score, withscores=True)
+            pipe.zrevrangebyscore(key, "+inf" if score is None else f"({score}", "-inf",
+                                  start=0, num=limit, withscores=True)
+        entries = [(task_id.decode() if isinstance(task_id, bytes) else task_id, finished_at)
+                   for shard in pipe.execute() for task_id, finished_at in shard]
+        if after_id is not None:
+            entries = [(task_id, finished_at) for task_id, finished_at in entries
+                       if finished_at < score or task_id < after_id]
+        page = sorted(entries, key=lambda e: (e[1], e[0]), reverse=True)[:limit]
+        return page, ((page[-1][1], page[-1][0]) if len(page) == limit else None)
@@ -1,42 +1,59 @@
+import asyncio
+import hashlib
+import os
 
 import redis
-import time
-import ast
+
+from task_queue import task_queue_from_env
+from worker_runtime import HandlerRegistry, WorkerRuntime
 
 # Connect to our Redis instance
 redis_client = redis.Redis(host='localhost', port=6380, db=0, decode_responses=True)
-
-print("Worker started. Waiting for tasks...")
-
-while True:
-    try:
-        # 1. Wait for a task to appear in the queue
-        # BRPOP is a blocking command, it will wait until a task is available
-        _, task_string = redis_client.brpop('tasks:queue')
-
-        # Convert the string representation of the dictionary back to a dictionary
-        task_data = ast.literal_eval(task_string)
-        task_id = task_data.get('id')
-
-        if not task_id:
-            print("Skipping invalid task data.")
-            continue
-
-        print(f"Processing task {task_id}...")
-
-        # 2. Update task status to 'processing'
-        redis_client.hset(f"task_status:{task_id}", "status", "processing")
-        redis_client.hset(f"task_status:{task_id}", "message", "Task is being processed.")
-
-        # 3. Simulate a long-running task
-        time.sleep(10)
-
-        # 4. Update task status to 'completed'
-        redis_client.hset(f"task_status:{task_id}", "status", "completed")
-        redis_client.hset(f"task_status:{task_id}", "message", f"Task {task_id} completed successfully!")
-
-        print(f"Task {task_id} finished.")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        time.sleep(5) # Wait a bit before retrying
+# Status TTLs / compact results come from TASK_STATUS_TTL, TASK_RESULT_TTL and
+# TASK_COMPACT_RESULTS (see task_queue.py); set them the same for the app and the worker
+task_queue = task_queue_from_env(redis_client)
+
+# How many tasks run at once, how many are fetched ahead, and the size of the process pool
+# for CPU-bound handlers (see worker_runtime.py)
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 32))
+WORKER_PREFETCH = int(os.getenv("WORKER_PREFETCH", WORKER_CONCURRENCY))
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", os.cpu_count() or 1))
+
+# Reliability: a worker silent for WORKER_VISIBILITY_TIMEOUT seconds has its tasks re-queued,
+# a failed task is retried WORKER_MAX_ATTEMPTS times in all (exponential backoff), then
+# dead-lettered; WORKER_TASK_TIMEOUT (seconds, 0 = none) fails a handler that runs too long
+WORKER_VISIBILITY_TIMEOUT = int(os.getenv("WORKER_VISIBILITY_TIMEOUT", 30))
+WORKER_MAX_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", 5))
+WORKER_TASK_TIMEOUT = float(os.getenv("WORKER_TASK_TIMEOUT", 0)) or None
+
+# Upper bound on the "rounds" of a checksum task (app.py rejects larger ones)
+MAX_CHECKSUM_ROUNDS = 1_000_000
+
+registry = HandlerRegistry()
+
+
+@registry.handler("default")
+async def simulate_long_task(task):
+    # Simulate a long-running, I/O-bound task; other tasks keep running meanwhile
+    await asyncio.sleep(10)
+    return f"Task {task.id} completed successfully!"
+
+
+@registry.handler("checksum", kind="process")
+def checksum(task):
+    # CPU-bound example: runs in the process pool
+    digest = str(task.payload.get("data", "")).encode()
+    rounds = min(max(int(task.payload.get("rounds", 100_000)), 0), MAX_CHECKSUM_ROUNDS)
+    for _ in range(rounds):
+        digest = hashlib.sha256(digest).digest()
+    return f"Task {task.id} checksum {digest.hex()}"
+
+
+if __name__ == '__main__':
+    runtime = WorkerRuntime(task_queue, registry, concurrency=WORKER_CONCURRENCY,
+                            prefetch=WORKER_PREFETCH, processes=WORKER_PROCESSES,
+                            visibility_timeout=WORKER_VISIBILITY_TIMEOUT, max_attempts=WORKER_MAX_ATTEMPTS,
+                            task_timeout=WORKER_TASK_TIMEOUT)
+    print(f"Worker {runtime.worker_id} started ({WORKER_CONCURRENCY} concurrent tasks). Waiting for tasks...")
+    runtime.run()
+    print(f"Worker stopped: {runtime.stats}")
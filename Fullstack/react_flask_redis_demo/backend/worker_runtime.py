@@ -0,0 +1,262 @@
+"""
+Concurrent worker runtime for the Redis task queue.
+
+One process runs many tasks at once:
+
+- a fetcher thread reserves up to `prefetch` tasks ahead of the handlers (in scheduling
+  order into this worker's processing list, see `task_queue.py` and `scheduler.py`) into
+  an in-memory queue;
+- `concurrency` asyncio workers take tasks from it and run the handler registered for the
+  task's `type`, keeping the `task_status:<id>` hash up to date;
+- a maintenance thread refreshes the worker's heartbeat, moves retries whose backoff has
+  elapsed back to the queue and re-queues the tasks of workers whose heartbeat expired
+  (so a crashed worker's tasks run again after at most `visibility_timeout` seconds), and
+  every `sweep_interval` seconds runs one `TaskQueue.sweep()` step.
+
+Failed tasks (including a handler running longer than `task_timeout`) are retried with
+exponential backoff up to `max_attempts` times, then dead-lettered.
+
+Redis errors never end the fetcher or a worker: reserving, acknowledging and failing a task
+are retried with backoff until Redis answers, and a status update that fails is only
+logged. A task whose acknowledgement is given up on at shutdown stays in the processing list
+and is re-queued by `unregister_worker()` or the reaper.
+
+Handlers are registered per task type with `@registry.handler(task_type, kind=...)`:
+
+- "async":   `async def handler(task)`, for I/O-bound work; runs on the event loop.
+- "thread":  a blocking function, run in a thread pool.
+- "process": a CPU-bound top-level function, run in a process pool (`processes`).
+
+A handler returns the completion message (or None for the default one) and raises to fail
+the task. `stop()` (also bound to SIGINT / SIGTERM by `run()`) shuts down gracefully:
+fetching stops, tasks that were prefetched but not started go back to the front of the
+queue, running tasks are finished and the worker unregisters.
+"""
+
+import asyncio
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from redis.exceptions import RedisError
+
+from task_queue import TaskDecodeError, completed_message, decode_task
+
+HANDLER_KINDS = ("async", "thread", "process")
+# Backoff between attempts of a Redis call that failed (doubling up to the max), and how many
+# attempts an acknowledgement still gets once the worker is stopping.
+REDIS_RETRY_DELAY = 0.1
+REDIS_RETRY_MAX_DELAY = 5.0
+REDIS_ATTEMPTS_WHEN_STOPPING = 3
+_GAVE_UP = object()
+
+
+class HandlerRegistry:
+    """Maps task types to handlers."""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def handler(self, task_type, kind="async"):
+        if kind not in HANDLER_KINDS:
+            raise ValueError(f"Unknown handler kind '{kind}', expected one of {HANDLER_KINDS}")
+
+        def register(fn):
+            self.handlers[task_type] = (fn, kind)
+            return fn
+        return register
+
+    def get(self, task_type):
+        return self.handlers.get(task_type)
+
+
+class WorkerRuntime:
+    def __init__(self, task_queue, registry, concurrency=8, prefetch=None, processes=None, threads=None,
+                 visibility_timeout=30, max_attempts=5, retry_base_delay=1.0, retry_max_delay=300.0,
+                 task_timeout=None, maintenance_interval=1.0, sweep_interval=60.0, worker_id=None):
+        self.task_queue = task_queue
+        self.registry = registry
+        self.concurrency = concurrency
+        self.prefetch = prefetch or concurrency
+        self.processes = processes
+        self.threads = threads or min(concurrency, 32)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.task_timeout = task_timeout
+        self.maintenance_interval = maintenance_interval
+        self.sweep_interval = sweep_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats = {"fetched": 0, "completed": 0, "retried": 0, "dead_lettered": 0, "requeued": 0,
+                      "promoted": 0, "reaped": 0, "index_trimmed": 0, "ttls_added": 0}
+        self._stopping = threading.Event()
+        self._loop = None
+
+    def stop(self):
+        """Stops fetching; `run()` returns once the running tasks have finished."""
+        self._stopping.set()
+
+    def run(self):
+        """Runs until `stop()`, SIGINT or SIGTERM."""
+        asyncio.run(self.serve(install_signal_handlers=True))
+
+    async def serve(self, install_signal_handlers=False):
+        self._loop = asyncio.get_running_loop()
+        if install_signal_handlers:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                self._loop.add_signal_handler(signum, self.stop)
+        pending = asyncio.Queue(maxsize=self.prefetch)
+        thread_pool = ThreadPoolExecutor(max_workers=self.threads + 2, thread_name_prefix="task-worker")
+        process_pool = ProcessPoolExecutor(max_workers=self.processes) if self._needs_processes() else None
+        self.task_queue.register_worker(self.worker_id, self.visibility_timeout)
+        maintenance = threading.Thread(target=self._maintain, name="task-maintenance", daemon=True)
+        maintenance.start()
+        try:
+            fetcher = self._loop.run_in_executor(thread_pool, self._fetch, pending)
+            workers = [asyncio.create_task(self._work(pending, thread_pool, process_pool))
+                       for _ in range(self.concurrency)]
+            await fetcher
+            # The fetcher only returns once stopping: hand unstarted tasks back, then drain.
+            await self._requeue(pending, thread_pool)
+            for _ in workers:
+                await pending.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            self._stopping.set()
+            maintenance.join()
+            self.task_queue.unregister_worker(self.worker_id)
+            thread_pool.shutdown(wait=True)
+            if process_pool:
+                process_pool.shutdown(wait=True)
+
+    # --- Internals ---
+
+    def _needs_processes(self):
+        return any(kind == "process" for _, kind in self.registry.handlers.values())
+
+    def _fetch(self, pending):
+        """Fetcher thread: keeps up to `prefetch` tasks queued for the workers."""
+        delay = REDIS_RETRY_DELAY
+        while not self._stopping.is_set():
+            free = self.prefetch - pending.qsize()
+            if free <= 0:
+                time.sleep(0.001)
+                continue
+            try:
+                raw_tasks = self.task_queue.reserve(self.worker_id, free, timeout=1)
+            except RedisError as e:
+                print(f"Reserving tasks failed, retrying in {delay:.1f}s: {e}")
+                self._stopping.wait(delay)
+                delay = min(2 * delay, REDIS_RETRY_MAX_DELAY)
+                continue
+            delay = REDIS_RETRY_DELAY
+            self.stats["fetched"] += len(raw_tasks)
+            for raw in raw_tasks:
+                asyncio.run_coroutine_threadsafe(pending.put(raw), self._loop).result()
+
+    async def _requeue(self, pending, thread_pool):
+        unstarted = []
+        while not pending.empty():
+            unstarted.append(pending.get_nowait())
+        # If this gives up, unregister_worker() re-queues them from the processing list.
+        if unstarted and await self._call_redis(thread_pool, lambda: self.task_queue.release(
+                self.worker_id, unstarted), "releasing unstarted tasks") is not _GAVE_UP:
+            self.stats["requeued"] += len(unstarted)
+
+    def _maintain(self):
+        """Maintenance thread: heartbeat, delayed retries, dead workers, sweeping."""
+        last_heartbeat = last_sweep = 0.0
+        while not self._stopping.wait(self.maintenance_interval):
+            try:
+                if time.monotonic() - last_heartbeat >= self.visibility_timeout / 3:
+                    self.task_queue.heartbeat(self.worker_id, self.visibility_timeout)
+                    last_heartbeat = time.monotonic()
+                self.stats["promoted"] += self.task_queue.promote_delayed()
+                self.stats["reaped"] += self.task_queue.reap_dead_workers()
+                if self.sweep_interval and time.monotonic() - last_sweep >= self.sweep_interval:
+                    trimmed, added = self.task_queue.sweep()
+                    self.stats["index_trimmed"] += trimmed
+                    self.stats["ttls_added"] += added
+                    last_sweep = time.monotonic()
+            except Exception as e:
+                print(f"Maintenance error: {e}")
+
+    async def _work(self, pending, thread_pool, process_pool):
+        loop = self._loop
+        queue = self.task_queue
+        while True:
+            raw = await pending.get()
+            if raw is None:
+                return
+            try:
+                task = decode_task(raw)
+            except TaskDecodeError as e:
+                print(f"Dead-lettering invalid task data: {e}")
+                if await self._call_redis(thread_pool, lambda: queue.fail(self.worker_id, raw, None, e),
+                                          "dead-lettering an invalid task") is not _GAVE_UP:
+                    self.stats["dead_lettered"] += 1
+                continue
+
+            entry = self.registry.get(task.type)
+            started_at = time.time()
+            # Only informational: the task runs even if Redis missed this update.
+            await self._call_redis(thread_pool, lambda: self._set_status(
+                task.id, "processing", "Task is being processed.", {"started_at": started_at}),
+                f"marking task {task.id} as processing", attempts=1)
+            try:
+                if entry is None:
+                    raise LookupError(f"No handler registered for task type '{task.type}'")
+                fn, kind = entry
+                if kind == "async":
+                    running = fn(task)
+                elif kind == "thread":
+                    running = loop.run_in_executor(thread_pool, fn, task)
+                else:
+                    running = loop.run_in_executor(process_pool, fn, task)
+                # A timed-out thread / process handler keeps running, but its result is ignored.
+                message = await asyncio.wait_for(running, self.task_timeout)
+            except Exception as e:
+                error = "timed out" if isinstance(e, asyncio.TimeoutError) else e
+                finished_at = time.time()
+                status = await self._call_redis(thread_pool, lambda: queue.fail(
+                    self.worker_id, raw, task, error, self.max_attempts, self.retry_base_delay,
+                    self.retry_max_delay, started_at=started_at, finished_at=finished_at),
+                    f"failing task {task.id}")
+                if status is not _GAVE_UP:
+                    self.stats["retried" if status == "retrying" else "dead_lettered"] += 1
+                continue
+            finished_at = time.time()
+            if await self._call_redis(thread_pool, lambda: queue.complete(
+                    self.worker_id, raw, task.id, message or completed_message(task.id),
+                    started_at=started_at, finished_at=finished_at),
+                    f"completing task {task.id}") is not _GAVE_UP:
+                self.stats["completed"] += 1
+
+    async def _call_redis(self, thread_pool, fn, action, attempts=None):
+        """Runs `fn()` in the thread pool, retrying Redis errors with backoff; returns its result.
+
+        Retries until Redis answers, or `attempts` times; once stopping, at most
+        REDIS_ATTEMPTS_WHEN_STOPPING times. Returns `_GAVE_UP` if every attempt failed.
+        """
+        delay = REDIS_RETRY_DELAY
+        attempt = 0
+        while True:
+            try:
+                return await self._loop.run_in_executor(thread_pool, fn)
+            except RedisError as e:
+                attempt += 1
+                limit = attempts or (REDIS_ATTEMPTS_WHEN_STOPPING if self._stopping.is_set() else None)
+                if limit is not None and attempt >= limit:
+                    print(f"Redis error while {action}, giving up after {attempt} attempt(s): {e}")
+                    return _GAVE_UP
+                print(f"Redis error while {action}, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(2 * delay, REDIS_RETRY_MAX_DELAY)
+
+    def _set_status(self, task_id, status, message, fields):
+        self.task_queue.set_status(task_id, status, message, **fields)